@@ -4,10 +4,14 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import geopandas as gpd
 import numpy as np
-from scipy.interpolate import griddata
 from matplotlib.patches import Circle
 import matplotlib.patches as patches
 
+from core.data.interpolation import get_surface
+from core.data.regions import STATION_REGIONS, load_regions
+from core.data.panel import build_panel, corr_frame
+from core.data.station_store import get_station_store
+
 '''
 PHÂN TÍCH MỐI QUAN HỆ KHÔNG GIAN:
 - Sự ảnh hưởng của vĩ độ lên các đặc trưng: TMP_2, DEW_2, RH, AT mean, AT max
@@ -22,6 +26,7 @@ PHÂN TÍCH MỐI QUAN HỆ KHÔNG GIAN:
     
 - PLOT 1: Sự ảnh hưởng của vĩ độ lên các đặc trưng
 - PLOT 2: Sự tương quan giữa các trạm theo các đặc trưng
+- PLOT 3: Bề mặt nội suy liên tục (IDW / tuyến tính) của một đặc trưng trên lãnh thổ
 '''
 
 
@@ -37,18 +42,9 @@ def get_station_info(station_df):
 
 
 def get_corr(station_df, feature):
-    data = {
-        'Nội Bài': list(station_df['Nội Bài'][feature]),
-        'Lạng Sơn': list(station_df['Lạng Sơn'][feature]),
-        'Lào Cai': list(station_df['Lào Cai'][feature]),
-        'Vinh': list(station_df['Vinh'][feature]),
-        'Phú Bài': list(station_df['Phú Bài'][feature]),
-        'Quy Nhơn': list(station_df['Quy Nhơn'][feature]),
-        'TPHCM': list(station_df['TPHCM'][feature]),
-        'Cà Mau': list(station_df['Cà Mau'][feature]),
-    }
-    data = pd.DataFrame(data)
-    corr = data.corr(method='pearson')
+    # Căn các trạm theo ngày thực tế (NaN ở ngày thiếu) rồi tính tương quan theo từng cặp
+    panel = build_panel(station_df, [feature])
+    corr = corr_frame(panel, feature)
 
     return round(corr, 2)
 
@@ -86,7 +82,7 @@ def plot_2(station_df, feature, feature_name):
     plt.show()
 
 
-def plot_1(station_df, station_info, station_name, region_dict, feature, feature_name):
+def plot_1(station_df, station_info, station_name, feature, feature_name):
     colors = {
         'Tây Bắc': '#fee5d9',
         'Đông Bắc': '#fcae91',
@@ -98,14 +94,20 @@ def plot_1(station_df, station_info, station_name, region_dict, feature, feature
         'Đồng bằng sông Cửu Long': '#756bb1'
     }
 
-    vietnam = gpd.read_file('.\gadm41_VNM_shp', layer='gadm41_VNM_1')
+    # 8 vùng đã gộp và đơn giản hóa (core/data/regions.py) thay cho shapefile cấp tỉnh;
+    # copy vì GeoDataFrame trong cache dùng chung, bên dưới còn thêm cột mean_feature
+    vietnam = load_regions()
+    if vietnam is None:
+        print("Không có dữ liệu vùng (Data_geo/vietnam_regions.npz hoặc shapefile GADM), bỏ qua bản đồ {}".format(
+            feature_name))
+        return
+    vietnam = vietnam.copy()
     mean_feature_dict = get_mean(station_df, feature)
     stations = pd.DataFrame({
         'name': station_name,
         'lat': [station_info[name][0] for name in station_name],
         'lon': [station_info[name][1] for name in station_name],
-        'region': ['Đồng bằng sông Hồng', 'Đông Bắc', 'Tây Bắc', 'Bắc Trung Bộ', 'Bắc Trung Bộ',
-                   'Duyên hải Nam Trung Bộ', 'Đông Nam Bộ', 'Đồng bằng sông Cửu Long'],
+        'region': [STATION_REGIONS[name] for name in station_name],
         'feature_values': [mean_feature_dict[name] for name in station_name]
     })
     stations_gdf = gpd.GeoDataFrame(
@@ -114,8 +116,6 @@ def plot_1(station_df, station_info, station_name, region_dict, feature, feature
         crs="EPSG:4326"
     )
 
-    vietnam['region'] = vietnam['NAME_1'].map(region_dict)
-
     region_mean_values = {}
     for region in stations['region'].unique():
         region_stations = stations[stations['region'] == region]
@@ -247,26 +247,40 @@ def plot_1(station_df, station_info, station_name, region_dict, feature, feature
     plt.show()
 
 
+def plot_3(feature, feature_name, period=None, method='idw'):
+    # Bề mặt được cache theo (đặc trưng, giai đoạn, phương pháp), vẽ lại chỉ là tra cứu
+    surface = get_surface(feature, period, method)
+
+    fig, ax = plt.subplots(figsize=(8, 8))
+    cmap = 'Reds' if feature == 'RH' else 'coolwarm'
+    mesh = ax.pcolormesh(surface.lon, surface.lat, surface.values, cmap=cmap, shading='auto')
+    colorbar = fig.colorbar(mesh, ax=ax, orientation='vertical', shrink=0.8, pad=0.02, fraction=0.03, aspect=20)
+    colorbar.ax.tick_params(labelsize=10)
+
+    station_info = get_station_info(get_station_store().as_dict())
+    for name, value in zip(surface.stations, surface.station_values):
+        lat, lon = station_info[name]
+        ax.scatter(lon, lat, c='green', s=50, marker='o', edgecolor='green', linewidth=1.5, zorder=5)
+        ax.annotate(f"{name}: ({value:.2f})", (lon, lat), xytext=(10, 5), textcoords='offset points',
+                    fontsize=12, fontfamily='Times New Roman',
+                    bbox=dict(facecolor='white', alpha=0.5, edgecolor='gray'))
+
+    period_text = 'TOÀN BỘ DỮ LIỆU' if period is None else f'GIAI ĐOẠN {period[0]} - {period[1]}'
+    plt.title(f"{feature_name[feature].upper()} \nNỘI SUY {method.upper()} - {period_text}",
+              fontfamily='Times New Roman', fontsize=14, pad=20, fontweight='bold')
+    plt.xlabel('Kinh độ', fontfamily='Times New Roman', color='#0d0c1d', fontsize=12, fontweight='bold')
+    plt.ylabel('Vĩ độ', fontfamily='Times New Roman', color='#0d0c1d', fontsize=12, fontweight='bold')
+    plt.xticks(fontfamily='Times New Roman', fontsize=12)
+    plt.yticks(fontfamily='Times New Roman', fontsize=12)
+
+    ax.set_aspect('equal')
+    plt.tight_layout()
+    plt.show()
+
+
 if __name__ == "__main__":
-    df_CaMau = pd.read_csv('../Data_AT_FilteredDate/CaMau_FilteredDate.csv')
-    df_LangSon = pd.read_csv('../Data_AT_FilteredDate/LangSon_FilteredDate.csv')
-    df_LaoCai = pd.read_csv('../Data_AT_FilteredDate/LaoCai_FilteredDate.csv')
-    df_NoiBai = pd.read_csv('../Data_AT_FilteredDate/NoiBai_FilteredDate.csv')
-    df_PhuBai = pd.read_csv('../Data_AT_FilteredDate/PhuBai_FilteredDate.csv')
-    df_QuyNhon = pd.read_csv('../Data_AT_FilteredDate/QuyNhon_FilteredDate.csv')
-    df_TPHCM = pd.read_csv('../Data_AT_FilteredDate/TPHCM_FilteredDate.csv')
-    df_Vinh = pd.read_csv('../Data_AT_FilteredDate/Vinh_FilteredDate.csv')
-
-    station_df = {
-        'Cà Mau': df_CaMau,
-        'Lạng Sơn': df_LangSon,
-        'Lào Cai': df_LaoCai,
-        'Nội Bài': df_NoiBai,
-        'Phú Bài': df_PhuBai,
-        'Quy Nhơn': df_QuyNhon,
-        'TPHCM': df_TPHCM,
-        'Vinh': df_Vinh
-    }
+    # Mở dữ liệu các trạm từ kho nhị phân (memory-map), tự động dùng CSV nếu chưa build kho
+    station_df = get_station_store().as_dict()
 
     station_order = ['Nội Bài', 'Lạng Sơn', 'Lào Cai', 'Vinh', 'Phú Bài', 'Quy Nhơn', 'TPHCM', 'Cà Mau']
 
@@ -281,59 +295,11 @@ if __name__ == "__main__":
         'AT max': 'Nhiệt độ cảm nhận cực đại trong ngày'
     }
 
-    region_dict = {
-        # Tây Bắc
-        'Sơn La': 'Tây Bắc', 'Điện Biên': 'Tây Bắc', 'Lai Châu': 'Tây Bắc',
-        'Lào Cai': 'Tây Bắc', 'Yên Bái': 'Tây Bắc', 'Hoà Bình': 'Tây Bắc',
-
-        # Đông Bắc
-        'Lạng Sơn': 'Đông Bắc', 'Cao Bằng': 'Đông Bắc', 'Bắc Kạn': 'Đông Bắc',
-        'Thái Nguyên': 'Đông Bắc', 'Quảng Ninh': 'Đông Bắc', 'Bắc Giang': 'Đông Bắc',
-        'Phú Thọ': 'Đông Bắc', 'Tuyên Quang': 'Đông Bắc', 'Hà Giang': 'Đông Bắc',
-
-        # Đồng bằng sông Hồng
-        'Hà Nội': 'Đồng bằng sông Hồng', 'Hải Phòng': 'Đồng bằng sông Hồng',
-        'Hải Dương': 'Đồng bằng sông Hồng', 'Hưng Yên': 'Đồng bằng sông Hồng',
-        'Thái Bình': 'Đồng bằng sông Hồng', 'Hà Nam': 'Đồng bằng sông Hồng',
-        'Nam Định': 'Đồng bằng sông Hồng', 'Ninh Bình': 'Đồng bằng sông Hồng',
-        'Vĩnh Phúc': 'Đồng bằng sông Hồng', 'Bắc Ninh': 'Đồng bằng sông Hồng',
-
-        # Bắc Trung Bộ
-        'Thanh Hóa': 'Bắc Trung Bộ', 'Nghệ An': 'Bắc Trung Bộ',
-        'Hà Tĩnh': 'Bắc Trung Bộ', 'Quảng Bình': 'Bắc Trung Bộ',
-        'Quảng Trị': 'Bắc Trung Bộ', 'Thừa Thiên Huế': 'Bắc Trung Bộ',
-
-        # Duyên hải Nam Trung Bộ
-        'Đà Nẵng': 'Duyên hải Nam Trung Bộ', 'Quảng Nam': 'Duyên hải Nam Trung Bộ',
-        'Quảng Ngãi': 'Duyên hải Nam Trung Bộ', 'Bình Định': 'Duyên hải Nam Trung Bộ',
-        'Phú Yên': 'Duyên hải Nam Trung Bộ', 'Khánh Hòa': 'Duyên hải Nam Trung Bộ',
-        'Ninh Thuận': 'Duyên hải Nam Trung Bộ', 'Bình Thuận': 'Duyên hải Nam Trung Bộ',
-
-        # Tây Nguyên
-        'Kon Tum': 'Tây Nguyên', 'Gia Lai': 'Tây Nguyên',
-        'Đắk Lắk': 'Tây Nguyên', 'Đắk Nông': 'Tây Nguyên',
-        'Lâm Đồng': 'Tây Nguyên',
-
-        # Đông Nam Bộ
-        'Bình Phước': 'Đông Nam Bộ', 'Tây Ninh': 'Đông Nam Bộ',
-        'Bình Dương': 'Đông Nam Bộ', 'Đồng Nai': 'Đông Nam Bộ',
-        'Bà Rịa - Vũng Tàu': 'Đông Nam Bộ', 'Hồ Chí Minh': 'Đông Nam Bộ',
-
-        # Đồng bằng sông Cửu Long
-        'Long An': 'Đồng bằng sông Cửu Long', 'Tiền Giang': 'Đồng bằng sông Cửu Long',
-        'Bến Tre': 'Đồng bằng sông Cửu Long', 'Trà Vinh': 'Đồng bằng sông Cửu Long',
-        'Vĩnh Long': 'Đồng bằng sông Cửu Long', 'Đồng Tháp': 'Đồng bằng sông Cửu Long',
-        'An Giang': 'Đồng bằng sông Cửu Long', 'Kiên Giang': 'Đồng bằng sông Cửu Long',
-        'Cần Thơ': 'Đồng bằng sông Cửu Long', 'Hậu Giang': 'Đồng bằng sông Cửu Long',
-        'Sóc Trăng': 'Đồng bằng sông Cửu Long', 'Bạc Liêu': 'Đồng bằng sông Cửu Long',
-        'Cà Mau': 'Đồng bằng sông Cửu Long'
-    }
-
-    plot_1(station_df, station_info, station_order, region_dict, 'TMP_2', feature_name)
-    plot_1(station_df, station_info, station_order, region_dict, 'DEW_2', feature_name)
-    plot_1(station_df, station_info, station_order, region_dict, 'RH', feature_name)
-    plot_1(station_df, station_info, station_order, region_dict, 'AT mean', feature_name)
-    plot_1(station_df, station_info, station_order, region_dict, 'AT max', feature_name)
+    plot_1(station_df, station_info, station_order, 'TMP_2', feature_name)
+    plot_1(station_df, station_info, station_order, 'DEW_2', feature_name)
+    plot_1(station_df, station_info, station_order, 'RH', feature_name)
+    plot_1(station_df, station_info, station_order, 'AT mean', feature_name)
+    plot_1(station_df, station_info, station_order, 'AT max', feature_name)
 
     # plot_2(station_df, 'TMP_2', feature_name)
     # plot_2(station_df, 'DEW_2', feature_name)
@@ -341,4 +307,7 @@ if __name__ == "__main__":
     # plot_2(station_df, 'AT mean', feature_name)
     # plot_2(station_df, 'AT max', feature_name)
 
+    # plot_3('AT mean', feature_name)
+    # plot_3('AT max', feature_name, period=(2014, 2023), method='linear')
+
     exit()
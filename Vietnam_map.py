@@ -1,9 +1,15 @@
-import geopandas as gpd
+import sys
+
 import matplotlib.pyplot as plt
 import pandas as pd
 
-# Đọc shapefile cấp tỉnh của Việt Nam
-vietnam = gpd.read_file('.\gadm41_VNM_shp', layer='gadm41_VNM_1')
+from core.data.regions import load_regions
+
+# 8 vùng đã gộp và đơn giản hóa từ shapefile cấp tỉnh (python -m core.data.regions)
+vietnam = load_regions()
+if vietnam is None:
+    sys.exit("Không có dữ liệu vùng (Data_geo/vietnam_regions.npz hoặc shapefile GADM), "
+             "chạy python -m core.data.regions trước khi vẽ bản đồ")
 
 # Dữ liệu các điểm
 stations = pd.DataFrame({
@@ -14,58 +20,6 @@ stations = pd.DataFrame({
                'Duyên hải Nam Trung Bộ', 'Đông Nam Bộ', 'Đồng bằng sông Cửu Long']
 })
 
-# Mapping tỉnh thành với vùng
-region_dict = {
-    # Tây Bắc
-    'Sơn La': 'Tây Bắc', 'Điện Biên': 'Tây Bắc', 'Lai Châu': 'Tây Bắc',
-    'Lào Cai': 'Tây Bắc', 'Yên Bái': 'Tây Bắc', 'Hoà Bình': 'Tây Bắc',
-
-    # Đông Bắc
-    'Lạng Sơn': 'Đông Bắc', 'Cao Bằng': 'Đông Bắc', 'Bắc Kạn': 'Đông Bắc',
-    'Thái Nguyên': 'Đông Bắc', 'Quảng Ninh': 'Đông Bắc', 'Bắc Giang': 'Đông Bắc',
-    'Phú Thọ': 'Đông Bắc', 'Tuyên Quang': 'Đông Bắc', 'Hà Giang': 'Đông Bắc',
-
-    # Đồng bằng sông Hồng
-    'Hà Nội': 'Đồng bằng sông Hồng', 'Hải Phòng': 'Đồng bằng sông Hồng',
-    'Hải Dương': 'Đồng bằng sông Hồng', 'Hưng Yên': 'Đồng bằng sông Hồng',
-    'Thái Bình': 'Đồng bằng sông Hồng', 'Hà Nam': 'Đồng bằng sông Hồng',
-    'Nam Định': 'Đồng bằng sông Hồng', 'Ninh Bình': 'Đồng bằng sông Hồng',
-    'Vĩnh Phúc': 'Đồng bằng sông Hồng', 'Bắc Ninh': 'Đồng bằng sông Hồng',
-
-    # Bắc Trung Bộ
-    'Thanh Hóa': 'Bắc Trung Bộ', 'Nghệ An': 'Bắc Trung Bộ',
-    'Hà Tĩnh': 'Bắc Trung Bộ', 'Quảng Bình': 'Bắc Trung Bộ',
-    'Quảng Trị': 'Bắc Trung Bộ', 'Thừa Thiên Huế': 'Bắc Trung Bộ',
-
-    # Duyên hải Nam Trung Bộ
-    'Đà Nẵng': 'Duyên hải Nam Trung Bộ', 'Quảng Nam': 'Duyên hải Nam Trung Bộ',
-    'Quảng Ngãi': 'Duyên hải Nam Trung Bộ', 'Bình Định': 'Duyên hải Nam Trung Bộ',
-    'Phú Yên': 'Duyên hải Nam Trung Bộ', 'Khánh Hòa': 'Duyên hải Nam Trung Bộ',
-    'Ninh Thuận': 'Duyên hải Nam Trung Bộ', 'Bình Thuận': 'Duyên hải Nam Trung Bộ',
-
-    # Tây Nguyên
-    'Kon Tum': 'Tây Nguyên', 'Gia Lai': 'Tây Nguyên',
-    'Đắk Lắk': 'Tây Nguyên', 'Đắk Nông': 'Tây Nguyên',
-    'Lâm Đồng': 'Tây Nguyên',
-
-    # Đông Nam Bộ
-    'Bình Phước': 'Đông Nam Bộ', 'Tây Ninh': 'Đông Nam Bộ',
-    'Bình Dương': 'Đông Nam Bộ', 'Đồng Nai': 'Đông Nam Bộ',
-    'Bà Rịa - Vũng Tàu': 'Đông Nam Bộ', 'Hồ Chí Minh': 'Đông Nam Bộ',
-
-    # Đồng bằng sông Cửu Long
-    'Long An': 'Đồng bằng sông Cửu Long', 'Tiền Giang': 'Đồng bằng sông Cửu Long',
-    'Bến Tre': 'Đồng bằng sông Cửu Long', 'Trà Vinh': 'Đồng bằng sông Cửu Long',
-    'Vĩnh Long': 'Đồng bằng sông Cửu Long', 'Đồng Tháp': 'Đồng bằng sông Cửu Long',
-    'An Giang': 'Đồng bằng sông Cửu Long', 'Kiên Giang': 'Đồng bằng sông Cửu Long',
-    'Cần Thơ': 'Đồng bằng sông Cửu Long', 'Hậu Giang': 'Đồng bằng sông Cửu Long',
-    'Sóc Trăng': 'Đồng bằng sông Cửu Long', 'Bạc Liêu': 'Đồng bằng sông Cửu Long',
-    'Cà Mau': 'Đồng bằng sông Cửu Long'
-}
-
-# Thêm cột region vào GeoDataFrame
-vietnam['region'] = vietnam['NAME_1'].map(region_dict)
-
 # Màu cho từng vùng
 colors = {
     'Tây Bắc': '#fee5d9',
@@ -81,15 +35,11 @@ colors = {
 # Vẽ bản đồ
 fig, ax = plt.subplots(figsize=(15, 20))
 
-# Vẽ từng vùng với màu khác nhau
-for region in colors.keys():
-    region_data = vietnam[vietnam['region'] == region]
-    if not region_data.empty:
-        region_data.plot(ax=ax,
-                         color=colors[region],
-                         edgecolor='white',
-                         linewidth=0.5,
-                         label=region)
+# Vẽ tất cả các vùng trong một lần, mỗi vùng một màu
+vietnam.plot(ax=ax,
+             color=[colors[region] for region in vietnam['region']],
+             edgecolor='white',
+             linewidth=0.5)
 
 # THÊM QUẦN ĐẢO HOÀNG SA VÀ TRƯỜNG SA
     # Tọa độ quần đảo
@@ -0,0 +1,35 @@
+/*
+ * Đổi trạm trên tab thời gian ngay trong trình duyệt:
+ * dữ liệu "station-payload" (graph.station_switch_payload) gồm figure mẫu của mỗi biểu đồ
+ * và bản vá [(đường dẫn, giá trị)] cho từng trạm, chỉ cần chép figure mẫu rồi áp bản vá.
+ */
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    stations: {
+        switchStation: function (station, payload) {
+            if (!payload || !payload.charts) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+            var name = payload.stations[station] || payload.default;
+            return payload.charts.map(function (chart) {
+                var figure = JSON.parse(JSON.stringify(chart.template));
+                (chart.patches[name] || []).forEach(function (entry) {
+                    var path = entry[0];
+                    var target = figure;
+                    for (var i = 0; i < path.length - 1; i++) {
+                        if (target[path[i]] === undefined || target[path[i]] === null) {
+                            target[path[i]] = typeof path[i + 1] === 'number' ? [] : {};
+                        }
+                        target = target[path[i]];
+                    }
+                    var key = path[path.length - 1];
+                    if (entry.length === 1) {
+                        delete target[key];
+                    } else {
+                        target[key] = entry[1];
+                    }
+                });
+                return figure;
+            });
+        }
+    }
+});
@@ -1,9 +1,16 @@
 import dash
-from dash import Dash, html, dash_table, dcc, Input, Output, callback
+from dash import Dash, html, dash_table, dcc, Input, Output, State, callback, ClientsideFunction
 import pandas as pd
 import dash_bootstrap_components as dbc
 from core.graphs import graph, graphs_predict
+from core.graphs.figure_cache import get_figure_cache
+from core.data.score_table import SCORE_PATH, format_score, get_score_table
+from core.data.results_store import DEFAULT_HORIZON, MODELS, get_results_store
+from core.data.station_store import CODE_BY_STATION, STATIONS, STATION_BY_CODE, STATION_BY_VALUE, get_station_store
+from core.data.versions import get_registry
 import plotly.graph_objects as go
+import numpy as np
+from core.graphs.downsample import MAX_POINTS, lttb_indices, parse_x_range, visible_window
 
 context_style = {
     "background-color": "#EAEFEF",
@@ -207,9 +214,13 @@ def settings_layout():
 
 # ===== COMPARISON CHART FUNCTIONS =====
 
-def create_comparison_chart(df, feature, forecast_horizon, station_name):
+def create_comparison_chart(df, feature, forecast_horizon, station_name, x_range=None, model_name=None):
     """
     Tạo biểu đồ so sánh dữ liệu thực tế và dự đoán cho Dash
+
+    Args:
+        x_range: Khoảng vị trí ngày (đầu, cuối) đang phóng to, None = toàn bộ giai đoạn
+        model_name: Model của dữ liệu dự đoán, đổi model thì trạng thái phóng to được đặt lại
     """
     try:
         print("DEBUG: Creating comparison chart for {} at {}".format(feature, station_name))
@@ -248,38 +259,42 @@ def create_comparison_chart(df, feature, forecast_horizon, station_name):
         else:
             raise ValueError("Feature {} không được hỗ trợ".format(feature))
 
-        # Tạo figure với Plotly
+        # Chỉ gửi các ngày trong cửa sổ đang xem, mỗi đường giảm còn tối đa MAX_POINTS điểm (LTTB)
+        start, stop = visible_window(min_length, x_range)
+        positions = np.arange(start, stop)
+        date_forecast_array = np.asarray(date_forecast_array, dtype=object)
+        hovertemplate = ('<b>%{fullData.name}</b><br>' +
+                         'Ngày: %{customdata}<br>' +
+                         'Giá trị: %{y:.2f}°C<extra></extra>')
+
+        def add_line(values, name, line):
+            values = np.asarray(values, dtype=np.float64)[start:stop]
+            keep = lttb_indices(positions, values, MAX_POINTS)
+            fig.add_trace(go.Scattergl(
+                x=positions[keep],
+                y=values[keep],
+                mode='lines',
+                name=name,
+                line=line,
+                customdata=date_forecast_array[positions[keep]],
+                hovertemplate=hovertemplate
+            ))
+
+        # Tạo figure với Plotly (WebGL)
         fig = go.Figure()
 
-        # Thêm đường thực tế
-        fig.add_trace(go.Scatter(
-            x=list(range(len(date_forecast_array))),
-            y=list(real_data),
-            mode='lines',
-            name=real_label,
-            line=dict(color='#1f77b4', width=2),
-            customdata=date_forecast_array,
-            hovertemplate='<b>%{fullData.name}</b><br>' +
-                          'Ngày: %{customdata}<br>' +
-                          'Giá trị: %{y:.2f}°C<extra></extra>'
-        ))
-
-        # Thêm đường dự đoán
-        fig.add_trace(go.Scatter(
-            x=list(range(len(date_forecast_array))),
-            y=list(pred_data),
-            mode='lines',
-            name=pred_label,
-            line=dict(color='#ff7f0e', width=2),
-            customdata=date_forecast_array,
-            hovertemplate='<b>%{fullData.name}</b><br>' +
-                          'Ngày: %{customdata}<br>' +
-                          'Giá trị: %{y:.2f}°C<extra></extra>'
-        ))
-
-        # Tạo tick labels cho trục x
-        tick_step = max(1, len(date_forecast_array) // 10)
-        tick_positions = list(range(0, len(date_forecast_array), tick_step))
+        # Thêm đường thực tế và đường dự đoán
+        add_line(real_data, real_label, dict(color='#1f77b4', width=2))
+        add_line(pred_data, pred_label, dict(color='#ff7f0e', width=2))
+
+        # Thêm đường khí hậu nền (trung bình nhiều năm của cùng ngày trong năm) làm mốc so sánh
+        baseline = get_baseline_for_station(station_name, feature, forecast_start_index, min_length)
+        if baseline is not None:
+            add_line(baseline, 'Trung bình nhiều năm (°C)', dict(color='#999999', width=1.5, dash='dash'))
+
+        # Tạo tick labels cho trục x (trong cửa sổ đang xem)
+        tick_step = max(1, (stop - start) // 10)
+        tick_positions = list(range(start, stop, tick_step))
         tick_labels = [date_forecast_array[i] for i in tick_positions]
 
         # Cập nhật layout
@@ -297,6 +312,7 @@ def create_comparison_chart(df, feature, forecast_horizon, station_name):
                 tickvals=tick_positions,
                 ticktext=tick_labels,
                 tickangle=45,
+                range=list(x_range) if x_range is not None else None,
                 showgrid=True,
                 gridcolor='lightgray',
                 gridwidth=0.5
@@ -319,7 +335,10 @@ def create_comparison_chart(df, feature, forecast_horizon, station_name):
             plot_bgcolor='white',
             paper_bgcolor='white',
             margin=dict(l=80, r=60, t=100, b=120),
-            height=400
+            height=400,
+            # Giữ trạng thái phóng to / ẩn hiện đường khi chỉ dữ liệu trong cửa sổ thay đổi;
+            # đổi model / trạm thì về toàn cảnh (figure toàn cảnh chỉ có dữ liệu đã giảm điểm)
+            uirevision='{} {} {}'.format(model_name, station_name, feature)
         )
 
         # Ẩn border trên và phải
@@ -346,105 +365,24 @@ def create_comparison_chart(df, feature, forecast_horizon, station_name):
 def get_comparison_data(model_name, station_name, forecast_horizon=7):
     """
     Lấy dữ liệu comparison cho model và station cụ thể
-    Sử dụng cấu trúc thư mục thực tế của project
+    Tra cứu trực tiếp trong ResultsStore (đã build một lần từ Data_compare)
     """
     try:
         print("DEBUG: Loading comparison data for {} at {}".format(model_name, station_name))
 
-        # Base path cho comparison data
-        base_path = "../Data_compare/"
-
-        # Mapping tên station sang format file
-        station_file_mapping = {
-            "NOI BAI": "NoiBai",
-            "LANG SON": "LangSon",
-            "LAO CAI": "LaoCai",
-            "VINH": "Vinh",
-            "PHU BAI": "PhuBai",
-            "QUY NHON": "QuyNhon",
-            "HCM": "TPHCM",
-            "CA MAU": "CaMau"
-        }
-
-        station_file_name = station_file_mapping.get(station_name, "TPHCM")
-
-        # Xác định model folder và file path
-        if model_name == 'LSTM':
-            # LSTM models
-            model_folder = "LSTM/"
-            csv_file_path = "{}{}Result_LSTM_1_{}.csv".format(base_path, model_folder, station_file_name)
-
-        elif model_name == 'BiLSTM':
-            # BiLSTM models
-            model_folder = "BiLSTM/"
-            csv_file_path = "{}{}Result_BiLSTM_1_{}.csv".format(base_path, model_folder, station_file_name)
-
-        elif model_name == 'GCN_LSTM':
-            # GCN_LSTM_baseline models - load both ATmean and ATmax files
-            model_folder = "GCN_LSTM_baseline/"
-            return load_gcn_comparison_data(base_path, model_folder, "GCN_LSTM_baseline", station_file_name)
-
-        elif model_name == 'GCN_BiLSTM':
-            # GCN_BiLSTM_baseline models
-            model_folder = "GCN_BiLSTM_baseline/"
-            return load_gcn_comparison_data(base_path, model_folder, "GCN_BiLSTM_baseline", station_file_name)
-
-        elif model_name == 'Enhanced_GCN_LSTM':
-            # GCN_LSTM_Attention models
-            model_folder = "GCN_LSTM_Attention/"
-            return load_gcn_comparison_data(base_path, model_folder, "GCN_LSTM_Attention", station_file_name)
-
-        elif model_name == 'Enhanced_GCN_BiLSTM':
-            # GCN_BiLSTM_Attention models
-            model_folder = "GCN_BiLSTM_Attention/"
-            return load_gcn_comparison_data(base_path, model_folder, "GCN_BiLSTM_Attention", station_file_name)
-
-        else:
+        if model_name not in MODELS:
             print("Model {} không được hỗ trợ".format(model_name))
             return None
 
-        print("Trying to load file: {}".format(csv_file_path))
-
-        # Kiểm tra file tồn tại (cho LSTM/BiLSTM)
-        import os
-        if not os.path.exists(csv_file_path):
-            print("File không tồn tại: {}".format(csv_file_path))
-            return None
+        # Mapping tên station sang tên dùng trong Data_compare
+        station_file_mapping = {code: file_key for _, file_key, code in STATIONS}
+        station_file_name = station_file_mapping.get(station_name, "TPHCM")
 
-        # Load data
-        df = pd.read_csv(csv_file_path)
-        print("File loaded successfully. Shape: {}".format(df.shape))
-        print("Columns: {}".format(list(df.columns)))
-
-        # Xử lý columns cho LSTM/BiLSTM
-        expected_cols = ['Real_AT_mean', 'Real_AT_max', 'Predicted_AT_mean', 'Predicted_AT_max']
-        missing_cols = [col for col in expected_cols if col not in df.columns]
-
-        if missing_cols:
-            print("Thiếu columns: {} trong file {}".format(missing_cols, csv_file_path))
-            print("Available columns: {}".format(list(df.columns)))
-
-            # Thử tìm columns tương tự
-            available_cols = list(df.columns)
-            real_cols = [col for col in available_cols if 'real' in col.lower() or 'actual' in col.lower()]
-            pred_cols = [col for col in available_cols if 'pred' in col.lower() or 'forecast' in col.lower()]
-
-            print("Found real-like columns: {}".format(real_cols))
-            print("Found pred-like columns: {}".format(pred_cols))
-
-            if len(real_cols) >= 2 and len(pred_cols) >= 2:
-                result_df = pd.DataFrame({
-                    'Real_AT_mean': df[real_cols[0]],
-                    'Real_AT_max': df[real_cols[1]] if len(real_cols) > 1 else df[real_cols[0]],
-                    'Predicted_AT_mean': df[pred_cols[0]],
-                    'Predicted_AT_max': df[pred_cols[1]] if len(pred_cols) > 1 else df[pred_cols[0]]
-                })
-                return result_df
-            else:
-                return None
-        else:
-            # Columns đầy đủ
-            return df[expected_cols]
+        # Các file kết quả hiện có đều là horizon 1
+        df = get_results_store().comparison_frame(model_name, station_file_name, horizon=DEFAULT_HORIZON)
+        if df is None:
+            print("Không có kết quả cho model {} tại trạm {}".format(model_name, station_file_name))
+        return df
 
     except Exception as e:
         print("Error loading comparison data: {}".format(str(e)))
@@ -453,147 +391,74 @@ def get_comparison_data(model_name, station_name, forecast_horizon=7):
         return None
 
 
-def load_gcn_comparison_data(base_path, model_folder, model_name, station_file_name):
+def get_date_array_for_station(station_name):
     """
-    Load dữ liệu cho GCN models từ 2 file riêng biệt (ATmean và ATmax)
+    Lấy date array cho station cụ thể
     """
     try:
-        # Đường dẫn 2 files
-        atmean_file = "{}{}Result_{}_1_ATmean_new.csv".format(base_path, model_folder, model_name)
-        atmax_file = "{}{}Result_{}_1_ATmax_new.csv".format(base_path, model_folder, model_name)
-
-        print("Loading GCN files:")
-        print("  ATmean: {}".format(atmean_file))
-        print("  ATmax: {}".format(atmax_file))
+        # Nhãn ngày đã được format sẵn trong StationStore, chỉ cắt 1177 ngày cuối (view, O(1))
+        store = get_station_store()
+        display_name = STATION_BY_CODE.get(station_name, 'Nội Bài')
+        date_array = store.date_labels(display_name, start=-1177)
 
-        import os
+        return date_array
 
-        # Kiểm tra files tồn tại
-        if not os.path.exists(atmean_file):
-            print("ATmean file không tồn tại: {}".format(atmean_file))
-            return None
+    except Exception as e:
+        print("Error getting date array: {}".format(str(e)))
+        # Return mock dates
+        import datetime
+        base_date = datetime.datetime(2020, 1, 1)
+        return [(base_date + datetime.timedelta(days=i)).strftime("%d/%m/%Y") for i in range(100)]
 
-        if not os.path.exists(atmax_file):
-            print("ATmax file không tồn tại: {}".format(atmax_file))
-            return None
 
-        # Load 2 files
-        df_mean = pd.read_csv(atmean_file)
-        df_max = pd.read_csv(atmax_file)
-
-        print("ATmean file loaded. Shape: {}, Columns: {}".format(df_mean.shape, list(df_mean.columns)))
-        print("ATmax file loaded. Shape: {}, Columns: {}".format(df_max.shape, list(df_max.columns)))
-
-        # Tìm columns cho station cụ thể trong ATmean file
-        available_cols_mean = list(df_mean.columns)
-        available_cols_max = list(df_max.columns)
-
-        # Pattern để tìm columns: Real_AT_[Station], Predicted_AT_[Station]
-        real_mean_col = None
-        pred_mean_col = None
-        real_max_col = None
-        pred_max_col = None
-
-        # Tìm trong ATmean file
-        for col in available_cols_mean:
-            if 'real' in col.lower() and station_file_name.lower() in col.lower():
-                real_mean_col = col
-            elif ('pred' in col.lower() or 'forecast' in col.lower()) and station_file_name.lower() in col.lower():
-                pred_mean_col = col
-
-        # Tìm trong ATmax file
-        for col in available_cols_max:
-            if 'real' in col.lower() and station_file_name.lower() in col.lower():
-                real_max_col = col
-            elif ('pred' in col.lower() or 'forecast' in col.lower()) and station_file_name.lower() in col.lower():
-                pred_max_col = col
-
-        print("Found columns:")
-        print("  Real ATmean: {}".format(real_mean_col))
-        print("  Pred ATmean: {}".format(pred_mean_col))
-        print("  Real ATmax: {}".format(real_max_col))
-        print("  Pred ATmax: {}".format(pred_max_col))
-
-        # Validate columns
-        if not all([real_mean_col, pred_mean_col, real_max_col, pred_max_col]):
-            print("Không tìm thấy đủ columns cho station {}".format(station_file_name))
-            print("Available ATmean columns: {}".format(available_cols_mean))
-            print("Available ATmax columns: {}".format(available_cols_max))
-
-            # Fallback: sử dụng columns đầu tiên nếu có
-            if len(available_cols_mean) >= 2 and len(available_cols_max) >= 2:
-                # Giả sử columns 0,1 là real,pred cho mỗi file
-                real_mean_col = available_cols_mean[0] if 'real' in available_cols_mean[0].lower() else \
-                available_cols_mean[1]
-                pred_mean_col = available_cols_mean[1] if 'pred' in available_cols_mean[1].lower() else \
-                available_cols_mean[0]
-                real_max_col = available_cols_max[0] if 'real' in available_cols_max[0].lower() else available_cols_max[
-                    1]
-                pred_max_col = available_cols_max[1] if 'pred' in available_cols_max[1].lower() else available_cols_max[
-                    0]
-
-                print("Using fallback columns:")
-                print("  Real ATmean: {}".format(real_mean_col))
-                print("  Pred ATmean: {}".format(pred_mean_col))
-                print("  Real ATmax: {}".format(real_max_col))
-                print("  Pred ATmax: {}".format(pred_max_col))
-            else:
-                return None
-
-        # Đảm bảo cả 2 file có cùng số rows
-        min_rows = min(len(df_mean), len(df_max))
-
-        # Tạo DataFrame kết hợp
-        result_df = pd.DataFrame({
-            'Real_AT_mean': df_mean[real_mean_col].iloc[:min_rows],
-            'Predicted_AT_mean': df_mean[pred_mean_col].iloc[:min_rows],
-            'Real_AT_max': df_max[real_max_col].iloc[:min_rows],
-            'Predicted_AT_max': df_max[pred_max_col].iloc[:min_rows]
-        })
-
-        print("Combined GCN data successfully. Final shape: {}".format(result_df.shape))
-        return result_df
+def get_baseline_for_station(station_name, feature, forecast_start_index, length):
+    """
+    Khí hậu nền của các ngày trong giai đoạn so sánh (cùng cách cắt ngày với get_date_array_for_station),
+    hoặc None nếu không tính được
+    """
+    try:
+        from core.data.climatology import get_climatology
 
+        display_name = STATION_BY_CODE.get(station_name, 'Nội Bài')
+        dates = get_station_store().dates(display_name)[-1177:]
+        dates = dates[forecast_start_index:] if forecast_start_index < len(dates) else dates[-length:]
+        clim, _ = get_climatology()
+        return clim.baseline(display_name, feature, dates[:length])
     except Exception as e:
-        print("Error loading GCN comparison data: {}".format(str(e)))
-        import traceback
-        traceback.print_exc()
+        print("Error getting climatology baseline: {}".format(str(e)))
         return None
 
-def get_date_array_for_station(station_name):
+
+def get_comparison_figure(model_name, station_name, feature):
     """
-    Lấy date array cho station cụ thể
+    Biểu đồ so sánh (dict) của một model, trạm và đặc trưng, lấy từ cache figure nếu dữ liệu trạm
+    và kết quả dự đoán chưa đổi
     """
-    try:
-        # Mapping station sang file path
-        station_file_mapping = {
-            "NOI BAI": "../Data_AT_FilteredDate/NoiBai_FilteredDate.csv",
-            "LANG SON": "../Data_AT_FilteredDate/LangSon_FilteredDate.csv",
-            "LAO CAI": "../Data_AT_FilteredDate/LaoCai_FilteredDate.csv",
-            "VINH": "../Data_AT_FilteredDate/Vinh_FilteredDate.csv",
-            "PHU BAI": "../Data_AT_FilteredDate/PhuBai_FilteredDate.csv",
-            "QUY NHON": "../Data_AT_FilteredDate/QuyNhon_FilteredDate.csv",
-            "HCM": "../Data_AT_FilteredDate/TPHCM_FilteredDate.csv",
-            "CA MAU": "../Data_AT_FilteredDate/CaMau_FilteredDate.csv"
-        }
-
-        csv_path = station_file_mapping.get(station_name, "../Data_AT_FilteredDate/NoiBai_FilteredDate.csv")
-
-        df_data = pd.read_csv(csv_path)
-        df_last_1177 = df_data.tail(1177)
-        date_array = df_last_1177.apply(
-            lambda row: "{:02d}/{:02d}/{}".format(int(row['DAY']), int(row['MONTH']), int(row['YEAR'])),
-            axis=1
-        ).tolist()
+    # Tạo ResultsStore trước để các file kết quả đã được đăng ký khi tính dấu vân tay
+    get_results_store()
 
-        return date_array
+    def build():
+        comparison_data = get_comparison_data(model_name, station_name, forecast_horizon=7)
+        if comparison_data is None:
+            return create_empty_comparison_chart(feature, station_name)
+        return create_comparison_chart(comparison_data, feature, 7, station_name, model_name=model_name)
+
+    key = ('comparison', str(model_name), str(station_name), feature)
+    return get_figure_cache().get_or_build(key, build, groups=('stations', 'results'))
 
-    except Exception as e:
-        print("Error getting date array: {}".format(str(e)))
-        # Return mock dates
-        import datetime
-        base_date = datetime.datetime(2020, 1, 1)
-        return [(base_date + datetime.timedelta(days=i)).strftime("%d/%m/%Y") for i in range(100)]
+
+def get_comparison_window_figure(model_name, station_name, feature, x_range):
+    """
+    Biểu đồ so sánh khi phóng to vào khoảng x_range: dữ liệu chi tiết chỉ của cửa sổ đó,
+    không cache (khoảng phóng to gần như không lặp lại), None = về toàn cảnh (lấy từ cache)
+    """
+    if x_range is None:
+        return get_comparison_figure(model_name, station_name, feature)
+    comparison_data = get_comparison_data(model_name, station_name, forecast_horizon=7)
+    if comparison_data is None:
+        return create_empty_comparison_chart(feature, station_name)
+    return create_comparison_chart(comparison_data, feature, 7, station_name, x_range=x_range,
+                                   model_name=model_name)
 
 
 def create_empty_comparison_chart(feature, station_name):
@@ -618,6 +483,14 @@ def create_empty_comparison_chart(feature, station_name):
     return fig
 
 
+def refresh_data():
+    """
+    Kiểm tra các file dữ liệu đã đổi chưa (tối đa 1 lần mỗi giây),
+    chỉ build lại trạm / model bị ảnh hưởng trước khi callback đọc cache
+    """
+    return get_registry().refresh()
+
+
 def register_callbacks(app):
     """Đăng ký tất cả callbacks"""
 
@@ -661,6 +534,7 @@ def register_callbacks(app):
         Input("tab-plot", "value")
     )
     def plot_type(selected_tab):
+        refresh_data()
         if selected_tab == "space-plot":
             return space_plot_layout()
         elif selected_tab == "time-plot":
@@ -673,15 +547,43 @@ def register_callbacks(app):
         return dcc.Graph(figure=graph.update_chart("TPHCM", "corr_max"))
 
     def geography_mean_layout():
+        # Bản đồ vùng tương tác khi có dữ liệu vùng, ngược lại dùng ảnh tĩnh
+        if graph.region_map_available():
+            return dcc.Graph(id="geography-mean-graph", figure=graph.update_chart("TPHCM", "geo_mean"))
         return html.Div([
             html.Img(src="../assets/temperature/atmean_geo.png")
         ])
 
     def geography_max_layout():
+        if graph.region_map_available():
+            return dcc.Graph(id="geography-max-graph", figure=graph.update_chart("TPHCM", "geo_max"))
         return html.Div([
             html.Img(src="../assets/temperature/atmax_geo.png")
         ])
 
+    @callback(
+        Output("geography-mean-graph", "figure"),
+        Input("geography-mean-graph", "relayoutData"),
+        prevent_initial_call=True
+    )
+    def update_geography_mean_zoom(relayout_data):
+        # Chỉ vẽ lại khi phóng to / thu nhỏ, GeoJSON của mức chi tiết tương ứng lấy từ cache
+        if not relayout_data or "geo.projection.scale" not in relayout_data:
+            return dash.no_update
+        refresh_data()
+        return graph.update_chart("TPHCM", "geo_mean", geo_scale=relayout_data["geo.projection.scale"])
+
+    @callback(
+        Output("geography-max-graph", "figure"),
+        Input("geography-max-graph", "relayoutData"),
+        prevent_initial_call=True
+    )
+    def update_geography_max_zoom(relayout_data):
+        if not relayout_data or "geo.projection.scale" not in relayout_data:
+            return dash.no_update
+        refresh_data()
+        return graph.update_chart("TPHCM", "geo_max", geo_scale=relayout_data["geo.projection.scale"])
+
     def space_plot_layout():
         return html.Div([
             dbc.Row([
@@ -710,61 +612,72 @@ def register_callbacks(app):
         ])
 
     @callback(
-        Output("time-year-plot", "children"),
+        Output("station-payload", "data"),
+        Input("heatmap-breakpoints", "value")
+    )
+    def update_station_payload(breakpoints_text):
+        """
+        Dữ liệu của cả 8 trạm cho biểu đồ theo năm và heatmap theo tháng, gửi một lần;
+        đổi trạm được xử lý ở trình duyệt (assets/station_switch.js), chỉ gọi lại khi đổi mốc giai đoạn
+        """
+        refresh_data()
+        breakpoints = graph.parse_breakpoints(breakpoints_text)
+        payload = graph.station_switch_payload(["annual", "monthly_mean", "monthly_max"], breakpoints=breakpoints)
+        payload["stations"] = STATION_BY_VALUE
+        return payload
+
+    app.clientside_callback(
+        ClientsideFunction(namespace="stations", function_name="switchStation"),
+        [Output("time-year-graph", "figure"),
+         Output("time-monthly-mean-graph", "figure"),
+         Output("time-monthly-max-graph", "figure")],
+        [Input("station-dropdown", "value"),
+         Input("station-payload", "data")]
+    )
+
+    @callback(
+        [Output("time-rolling-corr-mean-plot", "children"),
+         Output("time-rolling-corr-max-plot", "children")],
         Input("station-dropdown", "value")
     )
-    def update_time_year_plot(selected_station):
-        station_mapping = {
-            "NoiBai": "Nội Bài",
-            "LangSon": "Lạng Sơn",
-            "LaoCai": "Lào Cai",
-            "Vinh": "Vinh",
-            "PhuBai": "Phú Bài",
-            "QuyNhon": "Quy Nhơn",
-            "HCM": "TPHCM",
-            "CaMau": "Cà Mau"
-        }
-
-        actual_station_name = station_mapping.get(selected_station, "TPHCM")
-        return dcc.Graph(figure=graph.update_chart(actual_station_name, "annual"), className="", style={"heigth": "20rem", "width": "50rem"})
+    def update_rolling_corr_layout(selected_station):
+        refresh_data()
+        actual_station_name = STATION_BY_VALUE.get(selected_station, "TPHCM")
+        return (dcc.Graph(figure=graph.update_chart(actual_station_name, "rolling_corr_mean")),
+                dcc.Graph(figure=graph.update_chart(actual_station_name, "rolling_corr_max")))
+
+    @callback(
+        Output("time-heatwave-plot", "children"),
+        [Input("station-dropdown", "value"),
+         Input("heatwave-threshold", "value"),
+         Input("heatwave-min-length", "value")]
+    )
+    def update_heatwave_layout(selected_station, threshold, min_length):
+        refresh_data()
+        actual_station_name = STATION_BY_VALUE.get(selected_station, "TPHCM")
+        return dcc.Graph(figure=graph.update_chart(actual_station_name, "heatwave",
+                                                   heatwave_threshold=threshold,
+                                                   heatwave_min_length=min_length))
 
     @callback(
-        Output("time-monthly-mean-plot", "children"),
+        [Output("time-anomaly-plot", "children"),
+         Output("time-climatology-plot", "children")],
         Input("station-dropdown", "value")
     )
-    def update_monthly_mean_layout(selected_station):
-        station_mapping = {
-            "NoiBai": "Nội Bài",
-            "LangSon": "Lạng Sơn",
-            "LaoCai": "Lào Cai",
-            "Vinh": "Vinh",
-            "PhuBai": "Phú Bài",
-            "QuyNhon": "Quy Nhơn",
-            "HCM": "TPHCM",
-            "CaMau": "Cà Mau"
-        }
-
-        actual_station_name = station_mapping.get(selected_station, "TPHCM")
-        return dcc.Graph(figure=graph.update_chart(actual_station_name, "monthly_mean"))
+    def update_climatology_layout(selected_station):
+        refresh_data()
+        actual_station_name = STATION_BY_VALUE.get(selected_station, "TPHCM")
+        return (dcc.Graph(figure=graph.update_chart(actual_station_name, "anomaly")),
+                dcc.Graph(figure=graph.update_chart(actual_station_name, "climatology")))
 
     @callback(
-        Output("time-monthly-max-plot", "children"),
+        Output("time-trend-table", "children"),
         Input("station-dropdown", "value")
     )
-    def update_monthly_max_layout(selected_station):
-        station_mapping = {
-            "NoiBai": "Nội Bài",
-            "LangSon": "Lạng Sơn",
-            "LaoCai": "Lào Cai",
-            "Vinh": "Vinh",
-            "PhuBai": "Phú Bài",
-            "QuyNhon": "Quy Nhơn",
-            "HCM": "TPHCM",
-            "CaMau": "Cà Mau"
-        }
-
-        actual_station_name = station_mapping.get(selected_station, "TPHCM")
-        return dcc.Graph(figure=graph.update_chart(actual_station_name, "monthly_max"))
+    def update_trend_table_layout(selected_station):
+        refresh_data()
+        actual_station_name = STATION_BY_VALUE.get(selected_station, "TPHCM")
+        return dcc.Graph(figure=graph.update_chart(actual_station_name, "trend_table"))
 
     def time_plot_layout():
         return html.Div([
@@ -793,17 +706,88 @@ def register_callbacks(app):
 
                 dbc.Row([
                     dbc.Col([
-                        html.Div(id="time-monthly-mean-plot")
+                        html.Label("Các năm bắt đầu giai đoạn của heatmap (ví dụ: 1992, 2003, 2014, 2019):",
+                                   className="me-2"),
+                        dcc.Input(
+                            id="heatmap-breakpoints",
+                            type="text",
+                            value=", ".join(str(year) for year in graph.HEATMAP_BREAKPOINTS),
+                            debounce=True,
+                            style={"width": "20rem"}
+                        )
+                    ], className="d-flex align-items-center my-2", width=12)
+                ]),
+
+                # Dữ liệu của mọi trạm cho 3 biểu đồ bên dưới, đổi trạm không cần gọi server
+                dcc.Store(id="station-payload"),
+
+                dbc.Row([
+                    dbc.Col([
+                        html.Div([
+                            dcc.Graph(id="time-monthly-mean-graph")
+                        ], id="time-monthly-mean-plot")
                     ], width=6),
 
                     dbc.Col([
-                        html.Div(id="time-monthly-max-plot")
+                        html.Div([
+                            dcc.Graph(id="time-monthly-max-graph")
+                        ], id="time-monthly-max-plot")
                     ], width=6)
                 ]),
 
                 dbc.Row([
-                    html.Div(className="d-flex justify-content-center",id="time-year-plot")
-                ], align="center", justify="center")
+                    html.Div([
+                        dcc.Graph(id="time-year-graph", className="", style={"heigth": "20rem", "width": "50rem"})
+                    ], className="d-flex justify-content-center", id="time-year-plot")
+                ], align="center", justify="center"),
+
+                dbc.Row([
+                    html.Div(id="time-trend-table")
+                ]),
+
+                dbc.Row([
+                    dbc.Col([
+                        html.Div(id="time-anomaly-plot")
+                    ], width=6),
+
+                    dbc.Col([
+                        html.Div(id="time-climatology-plot")
+                    ], width=6)
+                ]),
+
+                dbc.Row([
+                    dbc.Col([
+                        html.Label("Ngưỡng đợt nóng:", className="me-2"),
+                        dcc.Dropdown(
+                            id="heatwave-threshold",
+                            options=graph.HEATWAVE_THRESHOLDS,
+                            value=graph.DEFAULT_HEATWAVE_THRESHOLD,
+                            clearable=False,
+                            style={"width": "14rem"}
+                        ),
+                        html.Label("Số ngày liên tiếp tối thiểu:", className="mx-2"),
+                        dcc.Input(
+                            id="heatwave-min-length",
+                            type="number",
+                            min=1,
+                            step=1,
+                            value=graph.DEFAULT_MIN_LENGTH,
+                            debounce=True,
+                            style={"width": "5rem"}
+                        )
+                    ], className="d-flex align-items-center my-2", width=12),
+                    html.Div(id="time-heatwave-plot")
+                ]),
+
+                dbc.Row([
+                    dbc.Col([
+                        html.Div(id="time-rolling-corr-mean-plot")
+                    ], width=6),
+
+                    dbc.Col([
+                        html.Div(id="time-rolling-corr-max-plot")
+                    ], width=6)
+                ]),
             ], className="rounded-3 my-1", style={"height": "120px"})
         ])
 
@@ -821,20 +805,10 @@ def register_callbacks(app):
         """
         Cập nhật tất cả components bao gồm comparison charts
         """
+        refresh_data()
         try:
             # Mapping station names
-            station_mapping = {
-                "NoiBai": "NOI BAI",
-                "LangSon": "LANG SON",
-                "LaoCai": "LAO CAI",
-                "Vinh": "VINH",
-                "PhuBai": "PHU BAI",
-                "QuyNhon": "QUY NHON",
-                "HCM": "HCM",
-                "CaMau": "CA MAU"
-            }
-
-            actual_station_name = station_mapping.get(selected_station, "HCM")
+            actual_station_name = CODE_BY_STATION.get(STATION_BY_VALUE.get(selected_station), "HCM")
             print("Station: {}, Model: {}".format(actual_station_name, selected_model))
 
             # 1. Get CSV file path và tạo weather forecast
@@ -853,22 +827,16 @@ def register_callbacks(app):
             weather_forecast = graphs_predict.create_7_day_forecast(csv_file_path, actual_station_name)
 
             # 2. Load metrics từ CSV và tạo cards
-            metrics_csv_path = "../DATA_Score/AT_ThucNghiemMoHinh.csv"
+            metrics_csv_path = SCORE_PATH
             mean_card, max_card = load_and_create_metrics_cards(
                 metrics_csv_path,
                 selected_model,
                 actual_station_name
             )
 
-            # 3. Tạo comparison charts
-            comparison_data = get_comparison_data(selected_model, actual_station_name, forecast_horizon=7)
-
-            if comparison_data is not None:
-                mean_chart = create_comparison_chart(comparison_data, 'AT mean', 7, actual_station_name)
-                max_chart = create_comparison_chart(comparison_data, 'AT max', 7, actual_station_name)
-            else:
-                mean_chart = create_empty_comparison_chart("AT mean", actual_station_name)
-                max_chart = create_empty_comparison_chart("AT max", actual_station_name)
+            # 3. Tạo comparison charts (qua cache figure)
+            mean_chart = get_comparison_figure(selected_model, actual_station_name, 'AT mean')
+            max_chart = get_comparison_figure(selected_model, actual_station_name, 'AT max')
 
             return weather_forecast, mean_card, max_card, mean_chart, max_chart
 
@@ -888,11 +856,42 @@ def register_callbacks(app):
 
             return error_msg, empty_mean_card, empty_max_card, empty_mean_chart, empty_max_chart
 
+    # ===== ZOOM COMPARISON CHARTS: CHỈ LẤY DỮ LIỆU CHI TIẾT CỦA CỬA SỔ ĐANG XEM =====
+    @callback(
+        Output('comparison-mean-chart', 'figure', allow_duplicate=True),
+        Input('comparison-mean-chart', 'relayoutData'),
+        [State('predict-station-dropdown', 'value'),
+         State('predict-model-dropdown', 'value')],
+        prevent_initial_call=True
+    )
+    def update_comparison_mean_zoom(relayout_data, selected_station, selected_model):
+        x_range = parse_x_range(relayout_data)
+        if x_range is False:
+            return dash.no_update
+        refresh_data()
+        actual_station_name = CODE_BY_STATION.get(STATION_BY_VALUE.get(selected_station), "HCM")
+        return get_comparison_window_figure(selected_model, actual_station_name, 'AT mean', x_range)
+
+    @callback(
+        Output('comparison-max-chart', 'figure', allow_duplicate=True),
+        Input('comparison-max-chart', 'relayoutData'),
+        [State('predict-station-dropdown', 'value'),
+         State('predict-model-dropdown', 'value')],
+        prevent_initial_call=True
+    )
+    def update_comparison_max_zoom(relayout_data, selected_station, selected_model):
+        x_range = parse_x_range(relayout_data)
+        if x_range is False:
+            return dash.no_update
+        refresh_data()
+        actual_station_name = CODE_BY_STATION.get(STATION_BY_VALUE.get(selected_station), "HCM")
+        return get_comparison_window_figure(selected_model, actual_station_name, 'AT max', x_range)
+
     # ===== METRICS FUNCTIONS (GIỮ NGUYÊN) =====
     def load_and_create_metrics_cards(csv_file_path, model_name, station_name):
         """Load metrics từ CSV và tạo 2 cards mean/max"""
         try:
-            df = pd.read_csv(csv_file_path, dtype=str)
+            table = get_score_table(csv_file_path)
 
             model_mapping = {
                 'LSTM': 'LSTM',
@@ -905,34 +904,13 @@ def register_callbacks(app):
 
             actual_model = model_mapping.get(model_name, model_name)
 
-            # Filter data cho model và station cụ thể
-            model_filter = df['Model'].str.strip() == actual_model
-            station_filter = df['Station'].str.strip() == station_name
-            filtered_df = df[model_filter & station_filter]
+            # Tra cứu O(1) theo (model, station) trong index của bảng điểm
+            metrics_data = table.lookup(actual_model, station_name)
 
-            if filtered_df.empty:
+            if metrics_data is None:
                 print("Không tìm thấy dữ liệu cho Model: {}, Station: {}".format(actual_model, station_name))
                 return create_empty_metrics_card("mean"), create_empty_metrics_card("max")
 
-            # Lấy row đầu tiên
-            row = filtered_df.iloc[0]
-
-            # Extract metrics data
-            metrics_data = {
-                'mean': {
-                    'r2': row.get('R2 mean', 0),
-                    'mse': row.get('MSE mean', 0),
-                    'rmse': row.get('RMSE mean', 0),
-                    'mae': row.get('MAE mean', 0)
-                },
-                'max': {
-                    'r2': row.get('R2 max', 0),
-                    'mse': row.get('MSE max', 0),
-                    'rmse': row.get('RMSE max', 0),
-                    'mae': row.get('MAE max', 0)
-                }
-            }
-
             # Tạo 2 cards
             mean_card = create_metrics_card(metrics_data, "mean", "📊 Chỉ số đánh giá AT Mean - {}".format(actual_model))
             max_card = create_metrics_card(metrics_data, "max", "📊 Chỉ số đánh giá AT Max - {}".format(actual_model))
@@ -948,7 +926,7 @@ def register_callbacks(app):
         return dbc.Col([
             dbc.Card([
                 dbc.CardBody([
-                    html.H4("{}".format(value), className="{} fw-bold mb-0".format(color_class)),
+                    html.H4(format_score(value), className="{} fw-bold mb-0".format(color_class)),
                     html.P(label, className="text-muted small mb-0")
                 ], className="text-center py-2")
             ], className=border_class)
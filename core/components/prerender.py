@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.data.results_store import MODELS, TARGETS, get_results_store
+from core.data.score_table import get_score_table
+from core.data.station_store import STATION_ORDER, STATIONS, get_station_store
+from core.graphs import graph
+from core.graphs.figure_cache import get_figure_cache
+
+'''
+DỰNG SẴN FIGURE KHI KHỞI ĐỘNG (TÙY CHỌN, bật bằng biến môi trường PRERENDER=1):
+- Đọc các store (trạm, kết quả dự đoán, bảng điểm) và các cấu trúc dùng chung một lần
+- Dựng mọi tổ hợp trạm x loại biểu đồ (tham số mặc định) và model x trạm x đặc trưng của
+  biểu đồ so sánh trong một ThreadPoolExecutor, kết quả nằm trong cache figure của process
+- Dùng thread thay vì process vì cache figure nằm trong bộ nhớ của process web;
+  phần lớn thời gian là numpy / pandas / JSON nên vẫn chạy song song được một phần
+- Chạy trong một thread nền, server nhận request ngay, request trùng figure đang dựng chỉ dựng lại
+  chính figure đó
+- Xong thì ghi cache xuống đĩa để lần khởi động sau không phải dựng lại
+'''
+
+PRERENDER_ENV = 'PRERENDER'
+DEFAULT_WORKERS = 4
+
+# Các loại biểu đồ của graph.update_chart đang hiển thị trên dashboard (tham số mặc định)
+CHART_TYPES = ['annual', 'monthly_mean', 'monthly_max', 'corr_mean', 'corr_max', 'anomaly', 'climatology',
+               'heatwave', 'trend_table', 'rolling_corr_mean', 'rolling_corr_max']
+GEO_CHART_TYPES = ['geo_mean', 'geo_max']
+
+
+def prerender_tasks(include_predictions=True):
+    """Danh sách (mô tả, hàm không tham số) của mọi figure cần dựng sẵn"""
+    from core.components.context import get_comparison_figure
+
+    chart_types = CHART_TYPES + (GEO_CHART_TYPES if graph.region_map_available() else [])
+    tasks = []
+    for station_name in STATION_ORDER:
+        for chart_type in chart_types:
+            tasks.append(((station_name, chart_type),
+                          lambda s=station_name, c=chart_type: graph.update_chart(s, c)))
+    if include_predictions:
+        for model_name in MODELS:
+            for _, _, code in STATIONS:
+                for feature in TARGETS:
+                    tasks.append(((model_name, code, feature),
+                                  lambda m=model_name, s=code, f=feature: get_comparison_figure(m, s, f)))
+    return tasks
+
+
+def prerender(workers=DEFAULT_WORKERS, include_predictions=True):
+    """
+    Dựng sẵn mọi figure vào cache
+
+    Returns:
+        dict: Thống kê của cache figure sau khi dựng
+    """
+    start = time.perf_counter()
+    # Các store và cấu trúc dùng chung được build một lần trước khi chia việc cho các thread
+    get_station_store().cube()
+    if include_predictions:
+        get_results_store()
+        get_score_table()
+
+    tasks = prerender_tasks(include_predictions)
+    # Trạm đầu tiên dựng tuần tự để các cache dùng chung (khí hậu nền, xu hướng, ...) được tính một lần
+    first = [task for task in tasks if task[0][0] == STATION_ORDER[0]]
+    rest = [task for task in tasks if task[0][0] != STATION_ORDER[0]]
+    for _, render in first:
+        render()
+
+    def run(task):
+        name, render = task
+        try:
+            render()
+        except Exception as e:
+            print(f"ERROR in prerender {name}: {str(e)}")
+
+    with ThreadPoolExecutor(max_workers=max(1, int(workers))) as pool:
+        list(pool.map(run, rest))
+
+    cache = get_figure_cache()
+    cache.save()
+    stats = cache.stats()
+    print(f"DEBUG: Prerendered {len(tasks)} figures in {time.perf_counter() - start:.1f}s, cache: {stats}")
+    return stats
+
+
+def prerender_enabled():
+    return os.environ.get(PRERENDER_ENV, '0') == '1'
+
+
+def start_prerender(workers=DEFAULT_WORKERS, include_predictions=True):
+    """Chạy prerender trong một thread nền (daemon), trả về thread"""
+    thread = threading.Thread(target=prerender, args=(workers, include_predictions),
+                              name='prerender', daemon=True)
+    thread.start()
+    return thread
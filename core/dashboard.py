@@ -1,12 +1,19 @@
+import os
+
 from dash import Dash, html, dash_table, dcc
 import dash_bootstrap_components as dbc
 import plotly.graph_objs as go
 import pandas as pd
 from components import sidebar, context
 from graphs import graph
+from core.data.station_store import get_station_store
+from core.components.prerender import prerender_enabled, start_prerender
 
 app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True)
 
+# Chế độ debug (có reloader) khi chạy trực tiếp python dashboard.py
+DEBUG = True
+
 container_style = {
     "background-color": "white",
     "color": "black",
@@ -34,6 +41,15 @@ app.layout = html.Div([
 # Register callbacks từ context
 context.register_callbacks(app)
 
+# Đọc dữ liệu các trạm một lần khi khởi động server
+get_station_store()
+
+# Dựng sẵn figure trong nền (PRERENDER=1) ngay khi tạo app, kể cả khi chạy dưới WSGI server;
+# với reloader của chế độ debug chỉ dựng ở process con (WERKZEUG_RUN_MAIN), không dựng hai lần
+reloader_parent = __name__ == '__main__' and DEBUG and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+if prerender_enabled() and not reloader_parent:
+    start_prerender()
+
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=DEBUG)
\ No newline at end of file
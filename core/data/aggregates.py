@@ -0,0 +1,210 @@
+import numpy as np
+import pandas as pd
+
+from core.data.panel import pairwise_moments, pearson_from_sums
+
+'''
+TỔNG HỢP CẬP NHẬT TĂNG DẦN:
+- PairSums: các tổng n, Σx, Σx², Σxy cho từng cặp trạm (tính tương quan Pearson)
+- PairPrefixSums: tổng tích lũy theo ngày của các tổng trên, tương quan của một khoảng ngày
+  bất kỳ (hoặc cửa sổ trượt) là hiệu của hai dòng tích lũy
+- Thêm một ngày mới chỉ cộng vào các tổng: O(số trạm²)
+- Khi cần tính lại toàn bộ thì dựng lại từ panel (from_panel) bằng panel.pairwise_moments,
+  cùng hàm với heatmap tĩnh (panel.nan_corr)
+- Tổng theo năm / tháng của từng trạm nằm trong khối tổng hợp (core/data/cube.py)
+'''
+
+# Đặc trưng dùng cho heatmap tương quan (tổng tích lũy theo ngày chỉ giữ các đặc trưng này)
+CORR_FEATURES = ['AT mean', 'AT max']
+
+
+def pair_delta(shift, n_stations, i, values, partners):
+    """
+    Phần cộng thêm vào các tổng (F, S, S) khi trạm i có thêm một ngày
+
+    Args:
+        shift: Mảng (S, F) hằng số đã trừ của từng trạm
+        n_stations: Số trạm S
+        i: Vị trí trạm
+        values: Mảng (F,) của trạm i
+        partners: dict {vị trí trạm j: mảng (F,)} các trạm khác đã có ngày này
+    """
+    x = np.asarray(values, dtype=np.float64) - shift[i]
+    mx = ~np.isnan(x)
+    x = np.where(mx, x, 0.0)
+    shape = (len(x), n_stations, n_stations)
+    n, sum_x, sum_xx, sum_xy = np.zeros(shape), np.zeros(shape), np.zeros(shape), np.zeros(shape)
+
+    n[:, i, i] = mx
+    sum_x[:, i, i] = x
+    sum_xx[:, i, i] = x * x
+    sum_xy[:, i, i] = x * x
+
+    for j, other in partners.items():
+        y = np.asarray(other, dtype=np.float64) - shift[j]
+        my = ~np.isnan(y)
+        y = np.where(my, y, 0.0)
+        both = mx & my
+        n[:, i, j] = both
+        n[:, j, i] = both
+        sum_x[:, i, j] = x * my
+        sum_x[:, j, i] = y * mx
+        sum_xx[:, i, j] = x * x * my
+        sum_xx[:, j, i] = y * y * mx
+        sum_xy[:, i, j] = x * y
+        sum_xy[:, j, i] = x * y
+    return n, sum_x, sum_xx, sum_xy
+
+
+class PairSums:
+    """
+    Các tổng của từng cặp trạm trên những ngày cả hai trạm cùng có dữ liệu.
+    Dữ liệu được trừ đi một hằng số cố định theo trạm (shift) để giảm sai số làm tròn,
+    tương quan không đổi khi dịch chuyển.
+    """
+
+    def __init__(self, stations, features, shift):
+        s, f = len(stations), len(features)
+        self.stations = list(stations)
+        self.features = list(features)
+        self.shift = np.asarray(shift, dtype=np.float64)  # (S, F)
+        self.n = np.zeros((f, s, s))
+        self.sum_x = np.zeros((f, s, s))    # sum_x[f, i, j]: tổng của trạm i trên ngày chung với j
+        self.sum_xx = np.zeros((f, s, s))
+        self.sum_xy = np.zeros((f, s, s))
+
+    @classmethod
+    def from_panel(cls, panel):
+        """Tính lại toàn bộ từ StationPanel"""
+        (n, sum_x, sum_xx, sum_xy), shift = pairwise_moments(panel.values)
+        sums = cls(panel.stations, panel.features, shift)
+        sums.n, sums.sum_x, sums.sum_xx, sums.sum_xy = n, sum_x, sum_xx, sum_xy
+        return sums
+
+    def add(self, i, values, partners):
+        """
+        Cộng một ngày mới của trạm i, ghép với các trạm đã có dữ liệu cùng ngày, O(S²)
+
+        Args:
+            i: Vị trí trạm
+            values: Mảng (F,) của trạm i
+            partners: dict {vị trí trạm j: mảng (F,)} các trạm khác đã có ngày này
+        """
+        n, sum_x, sum_xx, sum_xy = pair_delta(self.shift, len(self.stations), i, values, partners)
+        self.n += n
+        self.sum_x += sum_x
+        self.sum_xx += sum_xx
+        self.sum_xy += sum_xy
+
+    def corr(self, min_periods=2):
+        """Ma trận tương quan (features, stations, stations)"""
+        return pearson_from_sums(self.n, self.sum_x, self.sum_xx, self.sum_xy, min_periods)
+
+    def corr_frame(self, feature):
+        """Ma trận tương quan một đặc trưng dạng DataFrame"""
+        corr = self.corr()[self.features.index(feature)]
+        return pd.DataFrame(corr, index=self.stations, columns=self.stations)
+
+
+class PairPrefixSums:
+    """
+    Tổng tích lũy theo ngày của n, Σx, Σx², Σxy cho từng cặp trạm:
+    dòng k là tổng của các ngày trước ngày thứ k (dòng 0 bằng 0), nên tổng của
+    đoạn ngày [a, b) là prefix[b] - prefix[a]
+    """
+
+    def __init__(self, stations, features, shift, first_date, length=0):
+        s, f = len(stations), len(features)
+        self.stations = list(stations)
+        self.features = list(features)
+        self.shift = np.asarray(shift, dtype=np.float64)  # (S, F)
+        self.first_date = np.datetime64(first_date, 'D')
+        self.length = length
+        self.prefix = {name: np.zeros((length + 1, f, s, s)) for name in ('n', 'sum_x', 'sum_xx', 'sum_xy')}
+
+    @classmethod
+    def from_panel(cls, panel, features=CORR_FEATURES):
+        """Tính lại toàn bộ từ StationPanel (một lần cumsum trên trục ngày)"""
+        values = panel.values[:, :, [panel.feature_index(f) for f in features]]
+        daily, shift = pairwise_moments(values, per_day=True)
+        sums = cls(panel.stations, features, shift, panel.dates[0], len(panel.dates))
+        for name, values in zip(('n', 'sum_x', 'sum_xx', 'sum_xy'), daily):
+            np.cumsum(values, axis=0, out=sums.prefix[name][1:])
+        return sums
+
+    @property
+    def dates(self):
+        """Lịch ngày datetime64[D] tương ứng với các dòng dữ liệu"""
+        return self.first_date + np.arange(self.length)
+
+    def _grow(self, length):
+        """Mở rộng đến length ngày, các ngày mới chưa có dữ liệu nên giữ nguyên tổng tích lũy"""
+        if length <= self.length:
+            return
+        for name, prefix in self.prefix.items():
+            capacity = prefix.shape[0] - 1
+            if length > capacity:
+                grown = np.empty((max(length, 2 * capacity) + 1,) + prefix.shape[1:])
+                grown[:self.length + 1] = prefix[:self.length + 1]
+                self.prefix[name] = prefix = grown
+            prefix[self.length + 1:length + 1] = prefix[self.length]
+        self.length = length
+
+    def add(self, date, i, values, partners):
+        """
+        Cộng một ngày của trạm i vào mọi dòng tích lũy từ ngày đó trở đi
+
+        Args:
+            date: Ngày quan sát
+            i: Vị trí trạm
+            values: Mảng (F,) theo thứ tự self.features
+            partners: dict {vị trí trạm j: mảng (F,)} các trạm khác đã có ngày này
+        """
+        position = int((np.datetime64(date, 'D') - self.first_date).astype(np.int64))
+        if position < 0:
+            raise ValueError("Ngày {} trước ngày đầu tiên {}".format(date, self.first_date))
+        self._grow(position + 1)
+        delta = pair_delta(self.shift, len(self.stations), i, values, partners)
+        for name, values_delta in zip(('n', 'sum_x', 'sum_xx', 'sum_xy'), delta):
+            self.prefix[name][position + 1:self.length + 1] += values_delta
+
+    def _position(self, date, default):
+        if date is None:
+            return default
+        position = int((np.datetime64(date, 'D') - self.first_date).astype(np.int64))
+        return min(max(position, 0), self.length)
+
+    def window_corr(self, start=None, stop=None, min_periods=2):
+        """
+        Ma trận tương quan (features, stations, stations) trên đoạn ngày [start, stop]
+
+        Args:
+            start: Ngày đầu (None = từ đầu chuỗi)
+            stop: Ngày cuối, được tính vào đoạn (None = đến hết chuỗi)
+        """
+        a = self._position(start, 0)
+        b = self._position(None if stop is None else np.datetime64(stop, 'D') + 1, self.length)
+        b = max(a, b)
+        sums = [self.prefix[name][b] - self.prefix[name][a] for name in ('n', 'sum_x', 'sum_xx', 'sum_xy')]
+        return pearson_from_sums(*sums, min_periods=min_periods)
+
+    def window_frame(self, feature, start=None, stop=None):
+        """Ma trận tương quan một đặc trưng trên đoạn ngày [start, stop] dạng DataFrame"""
+        corr = self.window_corr(start, stop)[self.features.index(feature)]
+        return pd.DataFrame(corr, index=self.stations, columns=self.stations)
+
+    def rolling_corr(self, window, min_periods=None):
+        """
+        Tương quan trên mọi cửa sổ trượt window ngày, tính cùng lúc bằng hiệu hai dòng tích lũy
+
+        Returns:
+            tuple: (ngày cuối của từng cửa sổ, mảng (cửa sổ, features, stations, stations))
+        """
+        window = int(window)
+        if window > self.length:
+            return self.dates[:0], np.empty((0, len(self.features), len(self.stations), len(self.stations)))
+        end = self.length + 1
+        sums = [self.prefix[name][window:end] - self.prefix[name][:end - window]
+                for name in ('n', 'sum_x', 'sum_xx', 'sum_xy')]
+        corr = pearson_from_sums(*sums, min_periods=window // 2 if min_periods is None else min_periods)
+        return self.dates[window - 1:], corr
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+'''
+NHIỆT ĐỘ CẢM NHẬN (APPARENT TEMPERATURE) THEO STEADMAN:
+    AT = Ta + 0.33 * e - 0.70 * ws - 4.00
+    e = RH / 100 * 6.105 * exp(17.27 * Ta / (237.7 + Ta))   (áp suất hơi nước, hPa)
+- Ta: nhiệt độ không khí (°C), RH: độ ẩm tương đối (%), ws: tốc độ gió ở độ cao 10 m (m/s)
+- Nếu không có RH thì e được tính từ nhiệt độ điểm sương DEW_2 (e = áp suất hơi bão hòa tại DEW_2)
+- Tính trên cả mảng (trạm x ngày) một lần, không có vòng lặp Python theo dòng
+- Lưu ý: cột AT mean / AT max trong DATA_SENT được tính bên ngoài với dữ liệu gió không có
+  trong repo; công thức không gió cho kết quả cao hơn khoảng 4 - 11 °C nên không dùng để
+  ghi đè dữ liệu gốc, chỉ dùng cho tính toán giả định (what-if) hoặc khi có dữ liệu gió
+'''
+
+
+def saturation_vapour_pressure(temperature):
+    """Áp suất hơi nước bão hòa (hPa) tại nhiệt độ (°C), công thức Magnus"""
+    t = np.asarray(temperature, dtype=np.float64)
+    return 6.105 * np.exp(17.27 * t / (237.7 + t))
+
+
+def vapour_pressure(temperature=None, rh=None, dew=None):
+    """
+    Áp suất hơi nước (hPa), ưu tiên tính từ RH, nếu không có thì từ điểm sương
+
+    Args:
+        temperature: Nhiệt độ không khí (°C), cần khi dùng RH
+        rh: Độ ẩm tương đối (%)
+        dew: Nhiệt độ điểm sương (°C)
+    """
+    if rh is not None:
+        if temperature is None:
+            raise ValueError("Cần nhiệt độ không khí khi tính áp suất hơi nước từ RH")
+        return np.asarray(rh, dtype=np.float64) / 100.0 * saturation_vapour_pressure(temperature)
+    if dew is not None:
+        return saturation_vapour_pressure(dew)
+    raise ValueError("Cần RH hoặc DEW_2 để tính áp suất hơi nước")
+
+
+def apparent_temperature(temperature, rh=None, dew=None, wind=None):
+    """
+    Nhiệt độ cảm nhận cho cả mảng, các tham số được broadcast với nhau
+
+    Args:
+        temperature: Nhiệt độ không khí (°C), mảng bất kỳ shape (ví dụ (trạm, ngày))
+        rh: Độ ẩm tương đối (%)
+        dew: Nhiệt độ điểm sương (°C), dùng khi không có rh
+        wind: Tốc độ gió (m/s), None = không tính gió
+
+    Returns:
+        ndarray float64, NaN ở những chỗ đầu vào thiếu
+    """
+    t = np.asarray(temperature, dtype=np.float64)
+    at = vapour_pressure(t, rh, dew)
+    at *= 0.33
+    at += t
+    at -= 4.0
+    if wind is not None:
+        at -= 0.70 * np.asarray(wind, dtype=np.float64)
+    return at
+
+
+def panel_apparent_temperature(panel, wind=None, temperature_feature='TMP_2'):
+    """
+    Nhiệt độ cảm nhận (trạm, ngày) tính từ StationPanel (cần TMP_2 và RH hoặc DEW_2)
+
+    Args:
+        panel: StationPanel
+        wind: Tốc độ gió, số hoặc mảng broadcast được với (trạm, ngày)
+        temperature_feature: Đặc trưng dùng làm nhiệt độ không khí
+    """
+    t = panel.feature_values(temperature_feature)
+    rh = panel.feature_values('RH') if 'RH' in panel.features else None
+    dew = panel.feature_values('DEW_2') if rh is None and 'DEW_2' in panel.features else None
+    return apparent_temperature(t, rh=rh, dew=dew, wind=wind).astype(np.float32)
+
+
+def recompute_frame(df, wind=None, tmp_max=None):
+    """
+    Tính lại AT mean (và AT max nếu có nhiệt độ cực đại) cho DataFrame một trạm,
+    dùng cho tính toán giả định; DataFrame gốc không bị sửa
+
+    Args:
+        df: DataFrame có TMP_2, RH (hoặc DEW_2)
+        wind: Tốc độ gió trung bình ngày (m/s), số hoặc mảng theo dòng
+        tmp_max: Nhiệt độ cực đại ngày (°C), mảng theo dòng
+
+    Returns:
+        DataFrame: Bản sao với cột AT mean / AT max mới
+    """
+    rh = df['RH'].to_numpy() if 'RH' in df else None
+    dew = df['DEW_2'].to_numpy() if rh is None else None
+    out = df.copy()
+    at_mean = apparent_temperature(df['TMP_2'].to_numpy(), rh=rh, dew=dew, wind=wind)
+    out['AT mean'] = pd.Series(at_mean, index=df.index).astype(df['AT mean'].dtype if 'AT mean' in df else np.float64)
+    if tmp_max is not None:
+        # Độ ẩm tương đối lúc nóng nhất được suy từ điểm sương của ngày
+        tmp_max = np.asarray(tmp_max, dtype=np.float64)
+        dew_day = df['DEW_2'].to_numpy() if 'DEW_2' in df else None
+        if dew_day is not None:
+            at_max = apparent_temperature(tmp_max, dew=dew_day, wind=wind)
+        else:
+            at_max = apparent_temperature(tmp_max, rh=rh, wind=wind)
+        out['AT max'] = pd.Series(at_max, index=df.index).astype(df['AT max'].dtype if 'AT max' in df else np.float64)
+    return out
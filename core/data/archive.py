@@ -0,0 +1,188 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from core.data.station_store import BASE_DIR, FEATURES, STATIONS, source_paths, read_station_csv
+
+'''
+KHO NHỊ PHÂN DẠNG CỘT CHO DỮ LIỆU TRẠM:
+- Build một lần từ CSV: python -m core.data.archive build
+- Mỗi cột là một file .npy: đặc trưng float32, ngày datetime64[D], trạm là mã int8
+- Các dòng được sắp theo trạm rồi theo ngày nên mỗi trạm là một đoạn liên tục
+- Khi đọc dùng np.load(mmap_mode='r'): các worker dùng chung page cache của hệ điều hành
+  thay vì mỗi worker tự parse ~16 MB văn bản
+'''
+
+ARCHIVE_DIR = os.path.join(BASE_DIR, 'Data_archive')
+ARCHIVE_VERSION = 1
+SOURCES = ['filtered', 'sent']
+
+CALENDAR_COLUMNS = {
+    'YEAR': np.int16,
+    'MONTH': np.int8,
+    'DAY': np.int8,
+}
+
+
+def column_file_name(column):
+    """Tên file .npy của một cột (bỏ khoảng trắng: 'AT mean' -> 'AT_mean.npy')"""
+    return '{}.npy'.format(column.replace(' ', '_'))
+
+
+def file_fingerprint(path):
+    """Dấu vân tay đơn giản của file nguồn: kích thước và thời gian sửa đổi"""
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def build_archive(source='filtered', archive_dir=ARCHIVE_DIR):
+    """
+    Chuyển các file CSV của một nguồn dữ liệu thành kho nhị phân dạng cột
+
+    Args:
+        source: 'filtered' hoặc 'sent'
+        archive_dir: Thư mục gốc chứa kho
+
+    Returns:
+        str: Thư mục kho vừa được ghi
+    """
+    out_dir = os.path.join(archive_dir, source)
+    os.makedirs(out_dir, exist_ok=True)
+
+    frames = []
+    stations_meta = []
+    start = 0
+    for code, (station_name, csv_path) in enumerate(source_paths(source)):
+        df = read_station_csv(csv_path)
+        frames.append((code, df))
+        stations_meta.append({
+            'name': station_name,
+            'code': STATIONS[code][2],
+            'latitude': float(df['LATITUDE'].iloc[0]),
+            'longitude': float(df['LONGITUDE'].iloc[0]),
+            'start': start,
+            'stop': start + len(df),
+            'csv': os.path.relpath(csv_path, BASE_DIR),
+            **file_fingerprint(csv_path),
+        })
+        start += len(df)
+
+    columns = {
+        'DATE': np.concatenate([df.index.values.astype('datetime64[D]') for _, df in frames]),
+        'STATION': np.concatenate([np.full(len(df), code, dtype=np.int8) for code, df in frames]),
+    }
+    for column, dtype in CALENDAR_COLUMNS.items():
+        columns[column] = np.concatenate([df[column].to_numpy(dtype=dtype) for _, df in frames])
+    for feature in FEATURES:
+        columns[feature] = np.concatenate([df[feature].to_numpy(dtype=np.float32) for _, df in frames])
+
+    for column, values in columns.items():
+        np.save(os.path.join(out_dir, column_file_name(column)), values)
+
+    meta = {
+        'version': ARCHIVE_VERSION,
+        'source': source,
+        'rows': start,
+        'columns': list(columns),
+        'features': FEATURES,
+        'stations': stations_meta,
+    }
+    with open(os.path.join(out_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    size = sum(os.path.getsize(os.path.join(out_dir, column_file_name(c))) for c in columns)
+    print("Đã build kho '{}': {} dòng, {:.2f} MB -> {}".format(source, start, size / 1e6, out_dir))
+    return out_dir
+
+
+class StationArchive:
+    """
+    Kho nhị phân đã mở bằng memory-map
+    """
+
+    def __init__(self, source='filtered', archive_dir=ARCHIVE_DIR):
+        self.source = source
+        self.path = os.path.join(archive_dir, source)
+        with open(os.path.join(self.path, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.columns = {
+            column: np.load(os.path.join(self.path, column_file_name(column)), mmap_mode='r')
+            for column in self.meta['columns']
+        }
+
+    def is_stale(self):
+        """Kho đã cũ nếu sai phiên bản hoặc file CSV nguồn đã thay đổi sau khi build"""
+        if self.meta.get('version') != ARCHIVE_VERSION:
+            return True
+        for station in self.meta['stations']:
+            csv_path = os.path.join(BASE_DIR, station['csv'])
+            if not os.path.exists(csv_path):
+                continue
+            fingerprint = file_fingerprint(csv_path)
+            if fingerprint['size'] != station['size'] or fingerprint['mtime_ns'] != station['mtime_ns']:
+                return True
+        return False
+
+    def station_slice(self, station_name):
+        """Đoạn dòng [start, stop) của một trạm"""
+        for station in self.meta['stations']:
+            if station['name'] == station_name:
+                return slice(station['start'], station['stop'])
+        raise KeyError(station_name)
+
+    def frame(self, station_name):
+        """
+        Dựng DataFrame của một trạm từ các cột memory-map (không sao chép dữ liệu số)
+        """
+        station = next(s for s in self.meta['stations'] if s['name'] == station_name)
+        rows = slice(station['start'], station['stop'])
+        n = rows.stop - rows.start
+
+        data = {
+            'NAME': pd.Categorical.from_codes(np.zeros(n, dtype=np.int8), categories=[station['code']]),
+            'LATITUDE': np.full(n, station['latitude']),
+            'LONGITUDE': np.full(n, station['longitude']),
+        }
+        for column in list(CALENDAR_COLUMNS) + self.meta['features']:
+            data[column] = self.columns[column][rows]
+
+        index = pd.DatetimeIndex(self.columns['DATE'][rows], name='DATE')
+        return pd.DataFrame(data, index=index, copy=False)
+
+    def as_dict(self):
+        """Trả về dict {tên trạm: DataFrame} theo thứ tự lưu trong kho"""
+        return {station['name']: self.frame(station['name']) for station in self.meta['stations']}
+
+
+def open_archive(source='filtered', archive_dir=ARCHIVE_DIR):
+    """Mở kho nhị phân, trả về None nếu chưa build hoặc đã cũ"""
+    if not os.path.exists(os.path.join(archive_dir, source, 'meta.json')):
+        return None
+    archive = StationArchive(source, archive_dir)
+    if archive.is_stale():
+        print("WARNING: Kho '{}' đã cũ so với CSV, hãy chạy lại: python -m core.data.archive build".format(source))
+        return None
+    return archive
+
+
+def load_station_frames(source='filtered', archive_dir=ARCHIVE_DIR):
+    """dict {tên trạm: DataFrame} đọc từ kho nhị phân, hoặc None nếu không dùng được kho"""
+    archive = open_archive(source, archive_dir)
+    if archive is None:
+        return None
+    return archive.as_dict()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build kho nhị phân dạng cột cho dữ liệu trạm')
+    parser.add_argument('command', choices=['build'])
+    parser.add_argument('--source', choices=SOURCES, action='append',
+                        help='Nguồn cần build (mặc định: tất cả)')
+    parser.add_argument('--out', default=ARCHIVE_DIR, help='Thư mục chứa kho')
+    args = parser.parse_args()
+
+    for source in args.source or SOURCES:
+        build_archive(source, args.out)
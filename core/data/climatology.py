@@ -0,0 +1,176 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from core.data.versions import get_registry
+
+'''
+KHÍ HẬU NỀN THEO NGÀY TRONG NĂM VÀ CHUẨN SAI (ANOMALY):
+- 366 ô ngày trong năm theo (tháng, ngày): 29/02 là ô 59, năm không nhuận bỏ qua ô này,
+  nên cùng một ngày lịch luôn rơi vào cùng một ô
+- Trung bình nhiều năm: tổng và số ngày của từng ô được làm trơn bằng tích chập vòng
+  (FFT trên 366 ô, cửa sổ SMOOTH_WINDOW ngày) rồi mới chia, ô 29/02 ít dữ liệu không bị lệch
+- Bao phân vị: gom giá trị trong cửa sổ ±PERCENTILE_HALF_WINDOW ngày quanh mỗi ô của mọi năm,
+  lấy phân vị bằng np.partition cho mọi trạm và đặc trưng cùng lúc
+- Chuẩn sai = giá trị ngày - trung bình nhiều năm của ô ngày đó
+- Kết quả được cache theo phiên bản dữ liệu
+'''
+
+N_BINS = 366
+SMOOTH_WINDOW = 31
+PERCENTILE_HALF_WINDOW = 7
+QUANTILES = (0.1, 0.9)
+
+# Số ngày tích lũy trước mỗi tháng của năm nhuận
+_MONTH_OFFSETS = np.array([0, 31, 60, 91, 121, 152, 182, 213, 244, 274, 305, 335])
+
+
+def day_bins(dates):
+    """Ô ngày trong năm (0 - 365) theo (tháng, ngày), 29/02 là ô 59"""
+    dates = pd.DatetimeIndex(dates)
+    return _MONTH_OFFSETS[dates.month.to_numpy() - 1] + dates.day.to_numpy() - 1
+
+
+def circular_smooth(values, window=SMOOTH_WINDOW, axis=-2):
+    """
+    Trung bình trượt vòng (ô cuối nối với ô đầu) theo một trục bằng FFT
+
+    Args:
+        values: Mảng có trục ô ngày dài N_BINS
+        window: Độ rộng cửa sổ (số lẻ)
+    """
+    values = np.moveaxis(np.asarray(values, dtype=np.float64), axis, -1)
+    n = values.shape[-1]
+    kernel = np.zeros(n)
+    half = window // 2
+    kernel[:half + 1] = 1.0
+    if half:
+        kernel[-half:] = 1.0
+    kernel /= kernel.sum()
+    smoothed = np.fft.irfft(np.fft.rfft(values, axis=-1) * np.fft.rfft(kernel), n=n, axis=-1)
+    return np.moveaxis(smoothed, -1, axis)
+
+
+def _partition_quantiles(pooled, quantiles):
+    """
+    Phân vị (nội suy tuyến tính) theo trục 1 của mảng (S, N, F) có NaN, dùng np.partition
+
+    Returns:
+        ndarray: (len(quantiles), S, F)
+    """
+    valid = ~np.isnan(pooled)
+    counts = valid.sum(axis=1)  # (S, F)
+    filled = np.where(valid, pooled, np.inf)
+
+    positions = [q * np.maximum(counts - 1, 0) for q in quantiles]
+    lower = [np.floor(p).astype(np.int64) for p in positions]
+    upper = [np.minimum(lo + 1, np.maximum(counts - 1, 0)) for lo in lower]
+    kth = np.unique(np.concatenate([np.ravel(k) for k in lower + upper]))
+    parted = np.partition(filled, kth, axis=1)
+
+    result = []
+    for p, lo, hi in zip(positions, lower, upper):
+        a = np.take_along_axis(parted, lo[:, None, :], axis=1)[:, 0, :]
+        b = np.take_along_axis(parted, hi[:, None, :], axis=1)[:, 0, :]
+        value = a + (b - a) * (p - lo)
+        value[counts == 0] = np.nan
+        result.append(value)
+    return np.stack(result)
+
+
+class Climatology:
+    """
+    mean, count: (stations, 366, features); bands: (quantiles, stations, 366, features)
+    """
+
+    def __init__(self, stations, features, mean, count, quantiles, bands):
+        self.stations = list(stations)
+        self.features = list(features)
+        self.mean = mean
+        self.count = count
+        self.quantiles = tuple(quantiles)
+        self.bands = bands
+
+    @classmethod
+    def from_panel(cls, panel, smooth_window=SMOOTH_WINDOW, half_window=PERCENTILE_HALF_WINDOW,
+                   quantiles=QUANTILES):
+        """Tính khí hậu nền cho mọi trạm và đặc trưng của StationPanel"""
+        values = np.asarray(panel.values, dtype=np.float64)  # (S, D, F)
+        bins = day_bins(panel.dates)
+        valid = ~np.isnan(values)
+
+        # Tổng / số ngày của từng ô rồi làm trơn vòng
+        sums = np.zeros((values.shape[0], N_BINS, values.shape[2]))
+        counts = np.zeros_like(sums)
+        np.add.at(sums, (slice(None), bins), np.where(valid, values, 0.0))
+        np.add.at(counts, (slice(None), bins), valid.astype(np.float64))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = circular_smooth(sums, smooth_window) / circular_smooth(counts, smooth_window)
+
+        # Vị trí các ngày theo từng ô để gom cửa sổ ±half_window ô cho phân vị
+        order = np.argsort(bins, kind='stable')
+        edges = np.searchsorted(bins[order], np.arange(N_BINS + 1))
+        bands = np.full((len(quantiles), values.shape[0], N_BINS, values.shape[2]), np.nan)
+        for b in range(N_BINS):
+            neighbours = np.arange(b - half_window, b + half_window + 1) % N_BINS
+            days = np.concatenate([order[edges[k]:edges[k + 1]] for k in neighbours])
+            if len(days):
+                bands[:, :, b, :] = _partition_quantiles(values[:, days, :], quantiles)
+
+        return cls(panel.stations, panel.features, mean, counts, quantiles, bands)
+
+    def baseline(self, station_name, feature, dates):
+        """Trung bình nhiều năm tại các ngày cho trước (mảng cùng độ dài dates)"""
+        s = self.stations.index(station_name)
+        f = self.features.index(feature)
+        return self.mean[s, day_bins(dates), f]
+
+    def band(self, station_name, feature, dates):
+        """(cận dưới, cận trên) của bao phân vị tại các ngày cho trước"""
+        s = self.stations.index(station_name)
+        f = self.features.index(feature)
+        bins = day_bins(dates)
+        return self.bands[0, s, bins, f], self.bands[-1, s, bins, f]
+
+    def anomalies(self, panel):
+        """Chuẩn sai (S, D, F) của panel so với khí hậu nền (panel cùng trạm và đặc trưng)"""
+        bins = day_bins(panel.dates)
+        return np.asarray(panel.values, dtype=np.float64) - self.mean[:, bins, :]
+
+    def station_frame(self, station_name, feature):
+        """DataFrame 366 ô của một trạm: mean và các phân vị"""
+        s = self.stations.index(station_name)
+        f = self.features.index(feature)
+        data = {'mean': self.mean[s, :, f]}
+        for i, q in enumerate(self.quantiles):
+            data['q{:g}'.format(q * 100)] = self.bands[i, s, :, f]
+        return pd.DataFrame(data, index=pd.RangeIndex(N_BINS, name='bin'))
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_climatology():
+    """
+    Khí hậu nền và panel của dữ liệu hiện tại, cache theo phiên bản dữ liệu
+
+    Returns:
+        tuple: (Climatology, StationPanel)
+    """
+    from core.data.panel import build_panel
+    from core.data.station_store import get_station_store
+
+    store = get_station_store()
+    key = get_registry().data_version()
+    cached = _cache.get(key)
+    if cached is None:
+        with _cache_lock:
+            cached = _cache.get(key)
+            if cached is None:
+                panel = build_panel(store.as_dict())
+                cached = (Climatology.from_panel(panel), panel)
+                _cache.clear()
+                _cache[key] = cached
+    return cached
@@ -0,0 +1,235 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from core.data.station_store import FEATURES, STATION_ORDER
+
+'''
+KHỐI TỔNG HỢP TRẠM x NĂM x THÁNG x ĐẶC TRƯNG:
+- Mỗi ô giữ sum / count / min / max của các ngày có dữ liệu, build một lần từ dữ liệu trạm
+- Trung bình năm, heatmap giai đoạn x tháng và mọi cách chia giai đoạn khác đều được cắt ra
+  từ khối (vài trăm ô) thay vì groupby lại cả chuỗi ngày
+- Thêm một ngày mới (append_observation) chỉ cập nhật đúng một ô, O(1)
+'''
+
+# Các thống kê cắt được từ khối
+STATS = ('mean', 'sum', 'count', 'min', 'max')
+
+
+class AggregateCube:
+    """
+    Các mảng sum, count, min, max có shape (stations, years, 12, features);
+    years là các năm liên tục từ năm đầu tiên đến năm cuối cùng có dữ liệu
+    """
+
+    def __init__(self, stations, years, features=FEATURES):
+        self.stations = list(stations)
+        self.features = list(features)
+        self.years = np.asarray(years, dtype=np.int64)
+        shape = (len(self.stations), len(self.years), 12, len(self.features))
+        self.sum = np.zeros(shape)
+        self.count = np.zeros(shape)
+        self.min = np.full(shape, np.nan)
+        self.max = np.full(shape, np.nan)
+
+    @classmethod
+    def from_frames(cls, station_df, features=FEATURES):
+        """
+        Build khối từ dict {tên trạm: DataFrame có YEAR, MONTH và các đặc trưng}
+        """
+        stations = [name for name in STATION_ORDER if name in station_df]
+        stations += [name for name in station_df if name not in stations]
+        first = min(int(df['YEAR'].min()) for df in station_df.values() if len(df))
+        last = max(int(df['YEAR'].max()) for df in station_df.values() if len(df))
+        cube = cls(stations, np.arange(first, last + 1), features)
+        for name in stations:
+            cube.load_station(name, station_df[name])
+        return cube
+
+    def _ensure_year(self, year):
+        """Mở rộng trục năm khi có năm nằm ngoài khoảng hiện tại, trả về vị trí của năm"""
+        first, last = int(self.years[0]), int(self.years[-1])
+        if year < first or year > last:
+            before = max(0, first - year)
+            after = max(0, year - last)
+            pad = ((0, 0), (before, after), (0, 0), (0, 0))
+            self.sum = np.pad(self.sum, pad)
+            self.count = np.pad(self.count, pad)
+            self.min = np.pad(self.min, pad, constant_values=np.nan)
+            self.max = np.pad(self.max, pad, constant_values=np.nan)
+            self.years = np.arange(min(first, year), max(last, year) + 1)
+        return year - int(self.years[0])
+
+    def load_station(self, station_name, df):
+        """Tính lại toàn bộ các ô của một trạm từ DataFrame (các trạm khác giữ nguyên)"""
+        s = self.stations.index(station_name)
+        if len(df):
+            self._ensure_year(int(df['YEAR'].min()))
+            self._ensure_year(int(df['YEAR'].max()))
+        self.sum[s] = 0.0
+        self.count[s] = 0.0
+        self.min[s] = np.nan
+        self.max[s] = np.nan
+        if not len(df):
+            return
+
+        n_years = len(self.years)
+        cells = (df['YEAR'].to_numpy(dtype=np.int64) - int(self.years[0])) * 12 \
+            + df['MONTH'].to_numpy(dtype=np.int64) - 1
+        values = df[self.features].to_numpy(dtype=np.float64)
+        size = n_years * 12
+        for f in range(len(self.features)):
+            column = values[:, f]
+            valid = ~np.isnan(column)
+            idx = cells[valid]
+            x = column[valid]
+            self.sum[s, :, :, f] = np.bincount(idx, weights=x, minlength=size).reshape(n_years, 12)
+            self.count[s, :, :, f] = np.bincount(idx, minlength=size).reshape(n_years, 12)
+            low = np.full(size, np.nan)
+            high = np.full(size, np.nan)
+            np.fmin.at(low, idx, x)
+            np.fmax.at(high, idx, x)
+            self.min[s, :, :, f] = low.reshape(n_years, 12)
+            self.max[s, :, :, f] = high.reshape(n_years, 12)
+
+    def add(self, station_name, year, month, values):
+        """
+        Cộng một ngày quan sát vào ô (trạm, năm, tháng), O(1)
+
+        Args:
+            values: Mảng (F,) theo thứ tự self.features, NaN nếu thiếu
+        """
+        s = self.stations.index(station_name)
+        y = self._ensure_year(int(year))
+        m = int(month) - 1
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        self.sum[s, y, m] += np.where(valid, values, 0.0)
+        self.count[s, y, m] += valid
+        self.min[s, y, m] = np.fmin(self.min[s, y, m], values)
+        self.max[s, y, m] = np.fmax(self.max[s, y, m], values)
+
+    def _cells(self, station_name, feature):
+        s = self.stations.index(station_name)
+        f = self.features.index(feature)
+        return self.sum[s, :, :, f], self.count[s, :, :, f], self.min[s, :, :, f], self.max[s, :, :, f]
+
+    @staticmethod
+    def _reduce(sums, counts, lows, highs, axis, stat):
+        """Gộp các ô theo một trục và trả về thống kê cần lấy"""
+        if stat == 'sum':
+            return sums.sum(axis=axis)
+        if stat == 'count':
+            return counts.sum(axis=axis)
+        with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+            # nanmin / nanmax của ô không có dữ liệu trả NaN kèm cảnh báo "All-NaN slice"
+            warnings.simplefilter('ignore', RuntimeWarning)
+            if stat == 'mean':
+                return sums.sum(axis=axis) / counts.sum(axis=axis)
+            if stat == 'min':
+                return np.nanmin(lows, axis=axis)
+            if stat == 'max':
+                return np.nanmax(highs, axis=axis)
+        raise ValueError("Thống kê {} không được hỗ trợ".format(stat))
+
+    def yearly(self, station_name, feature, stat='mean'):
+        """Series thống kê theo năm (chỉ các năm có dữ liệu), index là năm"""
+        sums, counts, lows, highs = self._cells(station_name, feature)
+        values = self._reduce(sums, counts, lows, highs, 1, stat)
+        has_data = counts.sum(axis=1) > 0
+        return pd.Series(values[has_data], index=pd.Index(self.years[has_data], name='YEAR'), name=feature)
+
+    def yearly_array(self):
+        """Trung bình theo năm của mọi trạm và đặc trưng: mảng (stations, years, features), NaN nếu thiếu"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.sum.sum(axis=2) / self.count.sum(axis=2)
+
+    def monthly(self, station_name, feature, stat='mean'):
+        """DataFrame năm x tháng của một thống kê"""
+        sums, counts, lows, highs = self._cells(station_name, feature)
+        if stat == 'sum':
+            values = sums
+        elif stat == 'count':
+            values = counts
+        elif stat == 'min':
+            values = lows
+        elif stat == 'max':
+            values = highs
+        else:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                values = sums / counts
+        return pd.DataFrame(values, index=pd.Index(self.years, name='YEAR'), columns=range(1, 13))
+
+    def period_month(self, station_name, feature, periods, stat='mean'):
+        """
+        Thống kê theo giai đoạn x tháng
+
+        Args:
+            periods: Danh sách (nhãn, năm bắt đầu, năm kết thúc), năm kết thúc được tính vào giai đoạn
+
+        Returns:
+            DataFrame: index là nhãn giai đoạn, cột là tháng 1..12
+        """
+        sums, counts, lows, highs = self._cells(station_name, feature)
+        first = int(self.years[0])
+        rows = []
+        for _, start, stop in periods:
+            i0 = max(0, int(start) - first)
+            i1 = max(i0, min(len(self.years), int(stop) - first + 1))
+            if i1 == i0:
+                rows.append(np.full(12, np.nan))
+                continue
+            rows.append(self._reduce(sums[i0:i1], counts[i0:i1], lows[i0:i1], highs[i0:i1], 0, stat))
+        return pd.DataFrame(np.vstack(rows) if rows else np.empty((0, 12)),
+                            index=[label for label, _, _ in periods], columns=range(1, 13))
+
+    def bucket_labels(self, breakpoints):
+        """Nhãn giai đoạn 'năm đầu - năm cuối' cho các mốc năm bắt đầu"""
+        last = int(self.years[-1])
+        stops = [int(b) - 1 for b in breakpoints[1:]] + [last]
+        return ['{} - {}'.format(int(start), stop) for start, stop in zip(breakpoints, stops)]
+
+    def bucket_month(self, station_name, feature, breakpoints, stat='mean'):
+        """
+        Thống kê giai đoạn x tháng với các giai đoạn cho bởi mốc năm bắt đầu:
+        giai đoạn k gồm các năm [breakpoints[k], breakpoints[k + 1]), giai đoạn cuối đến hết dữ liệu.
+        Mỗi ô (năm, tháng) được gán vào một ô (giai đoạn, tháng) bằng searchsorted rồi gộp bằng bincount.
+
+        Args:
+            breakpoints: Các năm bắt đầu giai đoạn, tăng dần; năm trước mốc đầu tiên bị bỏ qua
+
+        Returns:
+            DataFrame: index là nhãn giai đoạn, cột là tháng 1..12
+        """
+        breakpoints = np.unique(np.asarray(breakpoints, dtype=np.int64))
+        n_buckets = len(breakpoints)
+        sums, counts, lows, highs = self._cells(station_name, feature)
+
+        # Mã ô (giai đoạn, tháng) của từng ô (năm, tháng) của khối, -1 là năm nằm trước mốc đầu
+        bucket = np.searchsorted(breakpoints, self.years, side='right') - 1
+        codes = (bucket[:, None] * 12 + np.arange(12)[None, :]).ravel()
+        keep = np.repeat(bucket >= 0, 12)
+        codes = codes[keep]
+        size = n_buckets * 12
+
+        if stat in ('sum', 'count', 'mean'):
+            total = np.bincount(codes, weights=sums.ravel()[keep], minlength=size)
+            number = np.bincount(codes, weights=counts.ravel()[keep], minlength=size)
+            if stat == 'sum':
+                values = total
+            elif stat == 'count':
+                values = number
+            else:
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    values = total / number
+        elif stat in ('min', 'max'):
+            values = np.full(size, np.nan)
+            source = lows if stat == 'min' else highs
+            (np.fmin if stat == 'min' else np.fmax).at(values, codes, source.ravel()[keep])
+        else:
+            raise ValueError("Thống kê {} không được hỗ trợ".format(stat))
+
+        return pd.DataFrame(values.reshape(n_buckets, 12), index=self.bucket_labels(breakpoints),
+                            columns=range(1, 13))
+
@@ -0,0 +1,263 @@
+import argparse
+import csv
+import os
+
+import numpy as np
+import pandas as pd
+
+from core.data.apparent_temperature import apparent_temperature, saturation_vapour_pressure
+
+'''
+GỘP QUAN TRẮC THEO GIỜ -> DỮ LIỆU NGÀY (schema *_Final.csv):
+- Chạy: python -m core.data.daily_aggregator <file giờ> [<file giờ> ...] --out <file>_Final.csv
+- Đọc file theo từng khối (pd.read_csv chunksize), bộ nhớ chỉ phụ thuộc kích thước khối
+- Các hàm là generator nối tiếp nhau: đọc khối -> gộp theo (trạm, ngày) -> dòng ngày -> ghi CSV
+- Quan trắc của một ngày có thể nằm vắt qua hai khối: phần ngày cuối khối được giữ lại
+  và gộp cùng khối tiếp theo (yêu cầu file được sắp theo trạm rồi theo thời gian)
+- TMP_2, DEW_2, RH là trung bình các lần quan trắc trong ngày; AT mean / AT max là trung bình /
+  cực đại của nhiệt độ cảm nhận (có gió) tính cho từng lần quan trắc
+- Cột số có thể là số thường hoặc trường ghép của NOAA ISD (TMP/DEW '+0256,1' -> 25.6°C,
+  WND '090,1,N,0046,1' -> 4.6 m/s): giá trị / 10, bỏ giá trị thiếu (9999) và mã chất lượng xấu
+- AT không gió lệch 4-11°C so với các cột AT đang dùng, nên: file không có cột gió thì báo lỗi,
+  quan trắc thiếu giá trị gió có AT để trống (NaN), số quan trắc này được báo một lần cuối mỗi lần chạy
+- File có cột bắt buộc (thời gian, nhiệt độ, gió) không có giá trị nào đọc được thì báo lỗi;
+  file kết quả được ghi vào file tạm rồi mới đổi tên nên lỗi giữa chừng không để lại file ghi dở
+'''
+
+FINAL_COLUMNS = ['YMD', 'NAME', 'LATITUDE', 'LONGITUDE', 'YEAR', 'MONTH', 'DAY',
+                 'TMP_2', 'DEW_2', 'RH', 'AT mean', 'AT max']
+
+# Tên cột trong file quan trắc giờ
+RAW_COLUMNS = {
+    'time': 'DATE',
+    'name': 'NAME',
+    'latitude': 'LATITUDE',
+    'longitude': 'LONGITUDE',
+    'temperature': 'TMP',
+    'dew': 'DEW',
+    'rh': 'RH',
+    'wind': 'WND',
+}
+
+CHUNK_SIZE = 100000
+
+# Các cột phải có ít nhất một giá trị đọc được trong mỗi file
+REQUIRED = ('time', 'temperature', 'wind')
+
+# Trường ghép NOAA ISD: (vị trí giá trị, vị trí mã chất lượng, giá trị thiếu), giá trị được nhân 10
+ISD_FIELDS = {
+    'temperature': (0, 1, 9999),
+    'dew': (0, 1, 9999),
+    'wind': (3, 4, 9999),
+}
+ISD_SCALE = 10.0
+# Mã chất lượng ISD của giá trị nghi ngờ / sai
+ISD_BAD_QUALITY = ('2', '3', '6', '7')
+
+
+def parse_numeric(values, key):
+    """
+    Giá trị số của một cột quan trắc: số thường, hoặc trường ghép ISD nếu cột có dấu phẩy
+    (ví dụ TMP '+0256,1', WND '090,1,N,0046,1'); NaN nếu thiếu hoặc mã chất lượng xấu
+    """
+    if key not in ISD_FIELDS or pd.api.types.is_numeric_dtype(values):
+        return pd.to_numeric(values, errors='coerce')
+    text = values.astype(str)
+    if not text.str.contains(',', regex=False).any():
+        return pd.to_numeric(values, errors='coerce')
+
+    position, quality_position, missing = ISD_FIELDS[key]
+    parts = text.str.split(',', expand=True)
+    if parts.shape[1] <= max(position, quality_position):
+        return pd.Series(np.nan, index=values.index)
+    number = pd.to_numeric(parts[position], errors='coerce')
+    bad = (number.abs() == missing) | parts[quality_position].isin(ISD_BAD_QUALITY)
+    return (number / ISD_SCALE).mask(bad)
+
+
+def read_chunks(paths, columns=RAW_COLUMNS, chunksize=CHUNK_SIZE, stats=None):
+    """
+    Đọc lần lượt các file quan trắc giờ theo từng khối
+
+    Args:
+        stats: dict cộng dồn 'missing_wind' (số quan trắc thiếu gió), None = không đếm
+
+    Yields:
+        DataFrame với cột chuẩn: name, latitude, longitude, time, temperature, dew, rh, wind
+    """
+    for path in paths:
+        header = pd.read_csv(path, nrows=0).columns
+        if columns['wind'] not in header:
+            raise ValueError("File {} không có cột gió {}, không tính được AT".format(path, columns['wind']))
+        usecols = [column for column in columns.values() if column in header]
+        rename = {column: key for key, column in columns.items() if column in header}
+        rows = 0
+        valid = dict.fromkeys(REQUIRED, 0)
+        for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunksize):
+            chunk = chunk.rename(columns=rename)
+            chunk['time'] = pd.to_datetime(chunk['time'], errors='coerce')
+            for key in ('temperature', 'dew', 'rh', 'wind'):
+                if key in chunk:
+                    chunk[key] = parse_numeric(chunk[key], key)
+                else:
+                    chunk[key] = np.nan
+            rows += len(chunk)
+            for key in REQUIRED:
+                valid[key] += int(chunk[key].notna().sum())
+            chunk = chunk.dropna(subset=['time', 'temperature'])
+            if stats is not None:
+                stats['missing_wind'] = stats.get('missing_wind', 0) + int(chunk['wind'].isna().sum())
+            yield chunk
+
+        unusable = [columns[key] for key in REQUIRED if rows and not valid[key]]
+        if unusable:
+            raise ValueError("File {}: không đọc được giá trị nào của cột {}".format(path, ', '.join(unusable)))
+
+
+def _aggregate(chunk):
+    """Gộp một khối theo (trạm, ngày): trung bình TMP/DEW/RH, trung bình và cực đại AT"""
+    t = chunk['temperature'].to_numpy(dtype=np.float64)
+    dew = chunk['dew'].to_numpy(dtype=np.float64)
+    rh = chunk['rh'].to_numpy(dtype=np.float64)
+    # RH thiếu thì suy từ điểm sương
+    missing = np.isnan(rh)
+    if missing.any():
+        derived = 100.0 * saturation_vapour_pressure(dew) / saturation_vapour_pressure(t)
+        rh = np.where(missing, np.clip(derived, 0.0, 100.0), rh)
+    wind = chunk['wind'].to_numpy(dtype=np.float64)
+    # Thiếu gió: để AT trống thay vì dùng công thức không gió (lệch so với dữ liệu đang dùng)
+    at = apparent_temperature(t, rh=rh, wind=wind)
+
+    frame = pd.DataFrame({
+        'NAME': chunk['name'].to_numpy(),
+        'LATITUDE': chunk['latitude'].to_numpy(),
+        'LONGITUDE': chunk['longitude'].to_numpy(),
+        'DATE': chunk['time'].dt.normalize().to_numpy(),
+        'TMP_2': t,
+        'DEW_2': dew,
+        'RH': rh,
+        'AT_mean': at,
+        'AT_max': at,
+    })
+    daily = frame.groupby(['NAME', 'DATE'], sort=False).agg(
+        LATITUDE=('LATITUDE', 'first'),
+        LONGITUDE=('LONGITUDE', 'first'),
+        TMP_2=('TMP_2', 'mean'),
+        DEW_2=('DEW_2', 'mean'),
+        RH=('RH', 'mean'),
+        AT_mean=('AT_mean', 'mean'),
+        AT_max=('AT_max', 'max'),
+    )
+    return daily.rename(columns={'AT_mean': 'AT mean', 'AT_max': 'AT max'}).reset_index()
+
+
+def daily_frames(chunks):
+    """
+    Gộp các khối quan trắc thành các khối dữ liệu ngày đã hoàn chỉnh
+
+    Yields:
+        DataFrame các ngày đã đủ quan trắc (ngày cuối của khối được giữ lại chờ khối sau)
+    """
+    carry = None
+    for chunk in chunks:
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        if chunk.empty:
+            carry = None
+            continue
+        last = chunk.iloc[-1]
+        tail = (chunk['name'] == last['name']).to_numpy() & \
+               (chunk['time'].dt.normalize() == last['time'].normalize()).to_numpy()
+        carry = chunk[tail]
+        complete = chunk[~tail]
+        if not complete.empty:
+            yield _aggregate(complete)
+    if carry is not None and not carry.empty:
+        yield _aggregate(carry)
+
+
+def format_ymd(dates):
+    """Chuỗi YMD dạng m/d/YYYY như phần lớn các file DATA_SENT"""
+    return ['{}/{}/{}'.format(d.month, d.day, d.year) for d in dates]
+
+
+def daily_rows(frames):
+    """
+    Chuyển các khối dữ liệu ngày sang dòng theo schema *_Final.csv
+
+    Yields:
+        list: Giá trị theo thứ tự FINAL_COLUMNS
+    """
+    for daily in frames:
+        dates = pd.DatetimeIndex(daily['DATE'])
+        out = pd.DataFrame({
+            'YMD': format_ymd(dates),
+            'NAME': daily['NAME'].to_numpy(),
+            'LATITUDE': daily['LATITUDE'].to_numpy(),
+            'LONGITUDE': daily['LONGITUDE'].to_numpy(),
+            'YEAR': dates.year,
+            'MONTH': dates.month,
+            'DAY': dates.day,
+            'TMP_2': daily['TMP_2'].to_numpy(),
+            'DEW_2': daily['DEW_2'].to_numpy(),
+            'RH': daily['RH'].to_numpy(),
+            'AT mean': daily['AT mean'].to_numpy(),
+            'AT max': daily['AT max'].to_numpy(),
+        })
+        yield from out.itertuples(index=False, name=None)
+
+
+def write_final_csv(rows, out_path):
+    """Ghi dần các dòng ngày ra file tạm rồi đổi tên thành out_path, trả về số dòng đã ghi"""
+    count = 0
+    tmp_path = out_path + '.tmp'
+    try:
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(FINAL_COLUMNS)
+            for row in rows:
+                writer.writerow(['' if isinstance(v, float) and np.isnan(v) else v for v in row])
+                count += 1
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, out_path)
+    return count
+
+
+def aggregate_files(paths, out_path, columns=RAW_COLUMNS, chunksize=CHUNK_SIZE):
+    """
+    Gộp các file quan trắc giờ thành một file dữ liệu ngày
+
+    Args:
+        paths: Danh sách file quan trắc giờ (sắp theo trạm rồi theo thời gian)
+        out_path: File *_Final.csv cần ghi
+        columns: Ánh xạ tên cột chuẩn -> tên cột trong file giờ
+        chunksize: Số dòng mỗi khối đọc
+
+    Returns:
+        int: Số ngày đã ghi
+    """
+    stats = {'missing_wind': 0}
+    rows = daily_rows(daily_frames(read_chunks(paths, columns, chunksize, stats)))
+    count = write_final_csv(rows, out_path)
+    print("DEBUG: Wrote {} daily rows to {}".format(count, out_path))
+    if stats['missing_wind']:
+        print("WARNING: {} quan trắc thiếu gió, AT của các quan trắc này để trống".format(stats['missing_wind']))
+    return count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gộp quan trắc theo giờ thành dữ liệu ngày (*_Final.csv)')
+    parser.add_argument('paths', nargs='+', help='Các file quan trắc giờ')
+    parser.add_argument('--out', required=True, help='File kết quả')
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE, help='Số dòng mỗi khối đọc')
+    for key, column in RAW_COLUMNS.items():
+        parser.add_argument('--{}-column'.format(key), default=column,
+                            help='Tên cột {} trong file giờ (mặc định: {})'.format(key, column))
+    args = parser.parse_args()
+
+    columns = {key: getattr(args, '{}_column'.format(key)) for key in RAW_COLUMNS}
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    aggregate_files(args.paths, args.out, columns, args.chunksize)
@@ -0,0 +1,142 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from core.data.versions import get_registry
+
+'''
+PHÁT HIỆN ĐỢT NÓNG (HEATWAVE) TRÊN PANEL TRẠM x NGÀY:
+- Một đợt là chuỗi từ min_length ngày liên tiếp trở lên có AT max vượt ngưỡng
+- Ngưỡng tuyệt đối (°C) hoặc theo phân vị của từng trạm (ví dụ phân vị 95)
+- Mã hóa độ dài chuỗi (run-length encoding) trên mảng bool (trạm, ngày) cho mọi trạm cùng lúc:
+  thêm cột False hai đầu, np.diff cho vị trí bắt đầu (+1) và kết thúc (-1) của từng chuỗi
+- Ngày thiếu dữ liệu được coi là không vượt ngưỡng (cắt đợt)
+- Kết quả được cache theo (đặc trưng, ngưỡng, min_length) và phiên bản dữ liệu
+'''
+
+DEFAULT_FEATURE = 'AT max'
+DEFAULT_MIN_LENGTH = 3
+
+
+def hot_mask(values, threshold=None, percentile=None):
+    """
+    Mảng bool (trạm, ngày) những ngày vượt ngưỡng
+
+    Args:
+        values: Mảng (trạm, ngày) có NaN
+        threshold: Ngưỡng tuyệt đối (°C)
+        percentile: Phân vị của từng trạm (0 - 100), dùng khi không có threshold
+
+    Returns:
+        tuple: (mảng bool, ngưỡng của từng trạm (S,))
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if threshold is not None:
+        limits = np.full(values.shape[0], float(threshold))
+    elif percentile is not None:
+        limits = np.nanpercentile(values, percentile, axis=1)
+    else:
+        raise ValueError("Cần threshold hoặc percentile")
+    with np.errstate(invalid='ignore'):
+        return values > limits[:, None], limits
+
+
+def run_lengths(mask):
+    """
+    Các chuỗi True liên tiếp trên từng hàng của mảng bool (S, D)
+
+    Returns:
+        tuple: (hàng, vị trí bắt đầu, vị trí kết thúc không tính) của từng chuỗi, theo thứ tự hàng rồi ngày
+    """
+    mask = np.asarray(mask, dtype=bool)
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    change = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(change == 1)
+    _, stops = np.nonzero(change == -1)
+    return rows, starts, stops
+
+
+def detect_episodes(panel, feature=DEFAULT_FEATURE, threshold=None, percentile=None,
+                    min_length=DEFAULT_MIN_LENGTH):
+    """
+    Các đợt nóng của mọi trạm
+
+    Args:
+        panel: StationPanel
+        feature: Đặc trưng dùng để so ngưỡng
+        threshold: Ngưỡng tuyệt đối (°C)
+        percentile: Phân vị của từng trạm, dùng khi không có threshold
+        min_length: Số ngày liên tiếp tối thiểu của một đợt
+
+    Returns:
+        DataFrame: station, start, end, length, peak, mean, threshold (mỗi dòng một đợt)
+    """
+    values = panel.feature_values(feature).astype(np.float64)
+    mask, limits = hot_mask(values, threshold, percentile)
+    rows, starts, stops = run_lengths(mask)
+    keep = stops - starts >= int(min_length)
+    rows, starts, stops = rows[keep], starts[keep], stops[keep]
+
+    # Cực đại / trung bình của từng đợt bằng reduceat trên mảng đã làm phẳng
+    n_days = values.shape[1]
+    flat = np.nan_to_num(values.ravel(), nan=-np.inf)
+    if len(rows):
+        bounds = np.column_stack([rows * n_days + starts, rows * n_days + stops]).ravel()
+        peaks = np.maximum.reduceat(flat, bounds[:-1])[::2]
+        sums = np.add.reduceat(np.where(np.isinf(flat), 0.0, flat), bounds[:-1])[::2]
+    else:
+        peaks = sums = np.array([])
+    lengths = stops - starts
+
+    dates = panel.dates
+    return pd.DataFrame({
+        'station': [panel.stations[i] for i in rows],
+        'start': pd.DatetimeIndex(dates[starts]) if len(rows) else pd.DatetimeIndex([]),
+        'end': pd.DatetimeIndex(dates[stops - 1]) if len(rows) else pd.DatetimeIndex([]),
+        'length': lengths,
+        'peak': peaks,
+        'mean': sums / np.maximum(lengths, 1),
+        'threshold': limits[rows],
+    })
+
+
+def episodes_per_year(episodes, stations, years=None):
+    """
+    Số đợt nóng theo năm bắt đầu của đợt
+
+    Returns:
+        DataFrame: index là trạm (theo thứ tự stations), cột là năm
+    """
+    if years is None:
+        years = range(int(episodes['start'].dt.year.min()), int(episodes['start'].dt.year.max()) + 1) \
+            if len(episodes) else []
+    counts = episodes.groupby([episodes['station'], episodes['start'].dt.year]).size()
+    table = counts.unstack(fill_value=0) if len(counts) else pd.DataFrame()
+    return table.reindex(index=list(stations), columns=list(years), fill_value=0)
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_episodes(feature=DEFAULT_FEATURE, threshold=None, percentile=None, min_length=DEFAULT_MIN_LENGTH):
+    """Các đợt nóng của dữ liệu hiện tại, cache theo tham số và phiên bản dữ liệu"""
+    from core.data.panel import build_panel
+    from core.data.station_store import get_station_store
+
+    store = get_station_store()
+    key = (feature, threshold, percentile, int(min_length), get_registry().data_version())
+    episodes = _cache.get(key)
+    if episodes is None:
+        with _cache_lock:
+            episodes = _cache.get(key)
+            if episodes is None:
+                panel = build_panel(store.as_dict(), [feature])
+                episodes = detect_episodes(panel, feature, threshold, percentile, min_length)
+                # Bỏ kết quả của phiên bản dữ liệu cũ
+                for old in [k for k in _cache if k[-1] != key[-1]]:
+                    del _cache[old]
+                _cache[key] = episodes
+    return episodes
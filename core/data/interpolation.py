@@ -0,0 +1,201 @@
+import threading
+
+import numpy as np
+from scipy.interpolate import griddata
+from scipy.spatial import cKDTree
+
+from core.data.versions import get_registry
+
+'''
+BỀ MẶT NỘI SUY KHÔNG GIAN TRÊN LÃNH THỔ VIỆT NAM:
+- Giá trị tại trạm là trung bình của một đặc trưng trong một giai đoạn (cắt từ khối tổng hợp)
+- Lưới kinh độ / vĩ độ đều (GRID_BOUNDS, bước GRID_STEP độ)
+- IDW: tìm k trạm gần nhất của mọi điểm lưới bằng cKDTree (khoảng cách đã nhân cos(vĩ độ)
+  cho kinh độ), trọng số 1 / d^power
+- Linear: scipy.interpolate.griddata trên tam giác Delaunay, ngoài bao lồi của các trạm là NaN
+- Điểm lưới nằm ngoài đường biên quốc gia bị gán NaN (mặt nạ tính một lần cho mỗi lưới)
+- Bề mặt được cache theo (đặc trưng, giai đoạn, phương pháp, bước lưới) và phiên bản dữ liệu
+'''
+
+GRID_BOUNDS = (102.0, 110.0, 8.4, 23.5)  # (lon_min, lon_max, lat_min, lat_max)
+GRID_STEP = 0.05
+IDW_POWER = 2.0
+IDW_NEIGHBOURS = 8
+METHODS = ('idw', 'linear')
+
+
+class Surface:
+    """
+    Bề mặt nội suy: lon (X,), lat (Y,), values (Y, X) có NaN ngoài lãnh thổ
+    """
+
+    def __init__(self, feature, period, method, lon, lat, values, stations, station_values):
+        self.feature = feature
+        self.period = period
+        self.method = method
+        self.lon = lon
+        self.lat = lat
+        self.values = values
+        self.stations = stations
+        self.station_values = station_values
+
+    @property
+    def extent(self):
+        """(lon_min, lon_max, lat_min, lat_max) dùng cho imshow"""
+        return self.lon[0], self.lon[-1], self.lat[0], self.lat[-1]
+
+
+def make_grid(bounds=GRID_BOUNDS, step=GRID_STEP):
+    """Trục kinh độ, vĩ độ của lưới đều"""
+    lon_min, lon_max, lat_min, lat_max = bounds
+    lon = np.arange(lon_min, lon_max + step / 2, step)
+    lat = np.arange(lat_min, lat_max + step / 2, step)
+    return lon, lat
+
+
+def _project(lon, lat, reference_lat):
+    """Đổi (kinh độ, vĩ độ) sang tọa độ phẳng gần đúng (độ), kinh độ nhân cos(vĩ độ tham chiếu)"""
+    return np.column_stack([np.asarray(lon) * np.cos(np.radians(reference_lat)), np.asarray(lat)])
+
+
+def idw(station_lon, station_lat, values, lon, lat, power=IDW_POWER, k=IDW_NEIGHBOURS):
+    """
+    Nội suy IDW trên lưới
+
+    Returns:
+        ndarray: (len(lat), len(lon))
+    """
+    reference = float(np.mean(station_lat))
+    tree = cKDTree(_project(station_lon, station_lat, reference))
+    grid_lon, grid_lat = np.meshgrid(lon, lat)
+    points = _project(grid_lon.ravel(), grid_lat.ravel(), reference)
+
+    k = min(k, len(values))
+    distance, index = tree.query(points, k=k)
+    if k == 1:
+        distance, index = distance[:, None], index[:, None]
+    values = np.asarray(values, dtype=np.float64)
+    with np.errstate(divide='ignore'):
+        weights = 1.0 / distance ** power
+    # Điểm lưới trùng vị trí trạm lấy đúng giá trị của trạm
+    exact = distance[:, 0] == 0
+    weights[exact] = 0.0
+    weights[exact, 0] = 1.0
+    result = (weights * values[index]).sum(axis=1) / weights.sum(axis=1)
+    return result.reshape(grid_lat.shape)
+
+
+def linear(station_lon, station_lat, values, lon, lat):
+    """Nội suy tuyến tính trên tam giác Delaunay, NaN ngoài bao lồi các trạm"""
+    grid_lon, grid_lat = np.meshgrid(lon, lat)
+    points = np.column_stack([station_lon, station_lat])
+    return griddata(points, np.asarray(values, dtype=np.float64), (grid_lon, grid_lat), method='linear')
+
+
+def load_outline():
+    """Đường biên quốc gia (hợp của 8 vùng, core/data/regions.py), hoặc None nếu chưa có dữ liệu vùng"""
+    from core.data.regions import load_regions
+
+    regions = load_regions()
+    if regions is None:
+        return None
+    return regions.geometry.union_all()
+
+
+_masks = {}
+
+
+def outline_mask(lon, lat):
+    """
+    Mặt nạ bool (len(lat), len(lon)) các điểm lưới nằm trong lãnh thổ, tính một lần cho mỗi lưới;
+    None nếu không có đường biên (ghi nhận bằng regions.MISSING như load_regions: chỉ cảnh báo một lần
+    và tính lại khi dữ liệu vùng xuất hiện)
+    """
+    from core.data.regions import MISSING
+
+    key = (lon[0], lon[-1], len(lon), lat[0], lat[-1], len(lat))
+    mask = _masks.get(key)
+    if mask is None or mask is MISSING:
+        outline = load_outline()
+        if outline is None:
+            if not any(m is MISSING for m in _masks.values()):
+                print("WARNING: Không có dữ liệu vùng, bề mặt nội suy không được cắt theo đường biên")
+            _masks[key] = MISSING
+            return None
+        import shapely
+
+        grid_lon, grid_lat = np.meshgrid(lon, lat)
+        mask = _masks[key] = shapely.contains_xy(outline, grid_lon, grid_lat)
+    return mask
+
+
+def station_means(feature, period=None):
+    """
+    Trung bình một đặc trưng của từng trạm trong giai đoạn (năm đầu, năm cuối), None = toàn bộ
+
+    Returns:
+        tuple: (tên trạm, kinh độ, vĩ độ, giá trị)
+    """
+    from core.data.station_store import get_station_store
+
+    store = get_station_store()
+    cube = store.cube()
+    f = cube.features.index(feature)
+    years = cube.years
+    selected = np.ones(len(years), dtype=bool)
+    if period is not None:
+        selected = (years >= int(period[0])) & (years <= int(period[1]))
+    sums = cube.sum[..., f][:, selected].sum(axis=(1, 2))
+    counts = cube.count[..., f][:, selected].sum(axis=(1, 2))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+
+    lon = np.array([float(store.get(name)['LONGITUDE'].iloc[0]) for name in cube.stations])
+    lat = np.array([float(store.get(name)['LATITUDE'].iloc[0]) for name in cube.stations])
+    valid = ~np.isnan(means)
+    return [s for s, v in zip(cube.stations, valid) if v], lon[valid], lat[valid], means[valid]
+
+
+def build_surface(feature, period=None, method='idw', step=GRID_STEP):
+    """Tính bề mặt nội suy của một đặc trưng trong một giai đoạn"""
+    if method not in METHODS:
+        raise ValueError("Phương pháp nội suy {} không được hỗ trợ".format(method))
+    stations, station_lon, station_lat, values = station_means(feature, period)
+    lon, lat = make_grid(step=step)
+    if method == 'idw':
+        surface = idw(station_lon, station_lat, values, lon, lat)
+    else:
+        surface = linear(station_lon, station_lat, values, lon, lat)
+
+    mask = outline_mask(lon, lat)
+    if mask is not None:
+        surface = np.where(mask, surface, np.nan)
+    return Surface(feature, period, method, lon, lat, surface, stations, values)
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_surface(feature, period=None, method='idw', step=GRID_STEP):
+    """Bề mặt nội suy đã cache theo (đặc trưng, giai đoạn, phương pháp, bước lưới) và phiên bản dữ liệu"""
+    from core.data.regions import load_regions
+    from core.data.station_store import get_station_store
+
+    # Lấy store và dữ liệu vùng trước để các file đã được đăng ký khi lấy phiên bản
+    get_station_store()
+    load_regions()
+    period = None if period is None else (int(period[0]), int(period[1]))
+    version = get_registry().data_version()
+    key = (feature, period, method, step, version)
+    surface = _cache.get(key)
+    if surface is None:
+        with _cache_lock:
+            surface = _cache.get(key)
+            if surface is None:
+                surface = build_surface(feature, period, method, step)
+                # Bỏ các bề mặt của phiên bản dữ liệu cũ
+                for old in [k for k in _cache if k[-1] != version]:
+                    del _cache[old]
+                _cache[key] = surface
+    return surface
@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+
+from core.data.station_store import FEATURES, STATION_ORDER
+
+'''
+MẢNG PANEL TRẠM x NGÀY x ĐẶC TRƯNG:
+- Các trạm được căn theo ngày lịch thực tế (không giả định các file khớp nhau theo dòng)
+- Ngày thiếu dữ liệu của một trạm được điền NaN
+- Tương quan / hiệp phương sai tính cho mọi đặc trưng cùng lúc, theo từng cặp ngày
+  cùng có dữ liệu (pairwise complete) giống DataFrame.corr()
+'''
+
+
+class StationPanel:
+    """
+    values có shape (stations, days, features), dates là lịch ngày liên tục datetime64[D]
+    """
+
+    def __init__(self, stations, dates, features, values):
+        self.stations = stations
+        self.dates = dates
+        self.features = features
+        self.values = values
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def feature_index(self, feature):
+        return self.features.index(feature)
+
+    def station_index(self, station_name):
+        return self.stations.index(station_name)
+
+    def feature_values(self, feature):
+        """Ma trận (stations, days) của một đặc trưng"""
+        return self.values[:, :, self.feature_index(feature)]
+
+
+def build_panel(station_df, features=FEATURES):
+    """
+    Dựng panel từ dict {tên trạm: DataFrame có index DATE}
+
+    Args:
+        station_df: dict DataFrame các trạm (ví dụ StationStore.as_dict())
+        features: Danh sách đặc trưng cần đưa vào panel
+
+    Returns:
+        StationPanel
+    """
+    stations = [name for name in STATION_ORDER if name in station_df]
+    stations += [name for name in station_df if name not in stations]
+
+    station_dates = [station_df[name].index.values.astype('datetime64[D]') for name in stations]
+    first = min(d.min() for d in station_dates)
+    last = max(d.max() for d in station_dates)
+    dates = np.arange(first, last + np.timedelta64(1, 'D'), dtype='datetime64[D]')
+
+    values = np.full((len(stations), len(dates), len(features)), np.nan, dtype=np.float32)
+    for i, name in enumerate(stations):
+        positions = (station_dates[i] - first).astype(np.int64)
+        values[i, positions, :] = station_df[name][features].to_numpy(dtype=np.float32)
+
+    return StationPanel(stations, dates, list(features), values)
+
+
+def pairwise_moments(values, per_day=False):
+    """
+    Các tổng cần cho hiệp phương sai / tương quan theo cặp trạm, tính cho mọi đặc trưng cùng lúc.
+    Dùng chung cho heatmap tĩnh (nan_corr) và các tổng cập nhật tăng dần (core/data/aggregates.py).
+
+    Args:
+        values: Mảng (stations, days, features) có NaN
+        per_day: Giữ trục ngày (tổng của từng ngày, dùng cho tổng tích lũy)
+
+    Returns:
+        tuple: ((n, sum_x, sum_xx, sum_xy), shift); các tổng có shape (features, stations, stations)
+               hoặc (days, features, stations, stations) nếu per_day, sum_x[f, i, j] là tổng của
+               trạm i trên các ngày cả i và j đều có dữ liệu; shift (stations, features) là trung bình
+               từng trạm đã trừ trước khi cộng (giảm sai số khi trừ các tổng lớn)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    shift = np.nan_to_num(np.nanmean(values, axis=1))
+    x = np.moveaxis(values - shift[:, None, :], 0, -1)  # (days, features, stations)
+    mask = ~np.isnan(x)
+    x = np.where(mask, x, 0.0)
+    m = mask.astype(np.float64)
+
+    subscripts = 'dfi,dfj->dfij' if per_day else 'dfi,dfj->fij'
+    n = np.einsum(subscripts, m, m)
+    sum_x = np.einsum(subscripts, x, m)
+    sum_xx = np.einsum(subscripts, x * x, m)
+    sum_xy = np.einsum(subscripts, x, x)
+    return (n, sum_x, sum_xx, sum_xy), shift
+
+
+def pearson_from_sums(n, sum_x, sum_xx, sum_xy, min_periods=2):
+    """
+    Tương quan Pearson từ các tổng theo cặp; hai trục cuối là (trạm i, trạm j),
+    sum_x[..., i, j] là tổng của trạm i trên các ngày cả i và j đều có dữ liệu
+    """
+    sum_y = np.swapaxes(sum_x, -1, -2)
+    sum_yy = np.swapaxes(sum_xx, -1, -2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = sum_xy - sum_x * sum_y / n
+        var_x = sum_xx - sum_x * sum_x / n
+        var_y = sum_yy - sum_y * sum_y / n
+        corr = cov / np.sqrt(var_x * var_y)
+    corr[n < min_periods] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+
+def nan_cov(values, min_periods=2):
+    """
+    Ma trận hiệp phương sai giữa các trạm (mẫu, chia n - 1) với mặt nạ theo cặp
+
+    Returns:
+        ndarray: (features, stations, stations)
+    """
+    (n, sum_x, _, sum_xy), _ = pairwise_moments(values)
+    sum_y = np.swapaxes(sum_x, 1, 2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = (sum_xy - sum_x * sum_y / n) / (n - 1)
+    cov[n < min_periods] = np.nan
+    return cov
+
+
+def nan_corr(values, min_periods=2):
+    """
+    Ma trận tương quan Pearson giữa các trạm với mặt nạ theo cặp
+
+    Returns:
+        ndarray: (features, stations, stations)
+    """
+    sums, _ = pairwise_moments(values)
+    return pearson_from_sums(*sums, min_periods=min_periods)
+
+
+def corr_frame(panel, feature):
+    """Ma trận tương quan của một đặc trưng dưới dạng DataFrame (index/columns là tên trạm)"""
+    corr = nan_corr(panel.values[:, :, [panel.feature_index(feature)]])[0]
+    return pd.DataFrame(corr, index=panel.stations, columns=panel.stations)
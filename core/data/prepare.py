@@ -0,0 +1,131 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from core.data.station_store import FILTERED_DIR, SENT_DIR, SENT_FILES, STATIONS
+
+'''
+CHUẨN BỊ DỮ LIỆU: DATA_SENT/*_Final.csv -> Data_AT_FilteredDate/*_FilteredDate.csv
+- Chạy: python -m core.data.prepare [--src DATA_SENT] [--out Data_AT_FilteredDate] [--workers N]
+- Các trạm là mọi file *_Final.csv trong thư mục nguồn (station_files): file đã biết dùng tên
+  trong STATIONS, file mới dùng tên file bỏ khoảng trắng (ví dụ 'Da Nang_Final.csv' -> DaNang)
+- Mỗi file gốc được parse trong một process riêng (ProcessPoolExecutor)
+- Ngày được đổi sang mã số nguyên (số ngày từ 1970-01-01) dựng từ YEAR/MONTH/DAY
+- Tập ngày chung của mọi trạm tính bằng một lần np.unique trên mảng mã ngày đã ghép:
+  một ngày được giữ khi nó xuất hiện ở đủ số trạm, O(N log N) theo tổng số dòng,
+  không merge từng cặp trạm
+- Mỗi file kết quả được ghi một lần (giữ nguyên thứ tự cột và chuỗi YMD của file gốc)
+'''
+
+
+SOURCE_SUFFIX = '_Final.csv'
+
+
+def station_files(src_dir):
+    """
+    Các file trạm trong thư mục nguồn
+
+    Returns:
+        list: (tên file kết quả, đường dẫn), các trạm trong STATIONS trước theo thứ tự đó,
+              trạm mới sau theo tên file
+    """
+    known = {SENT_FILES[name]: file_key for name, file_key, _ in STATIONS}
+    order = {SENT_FILES[name]: i for i, (name, _, _) in enumerate(STATIONS)}
+    files = sorted((f for f in os.listdir(src_dir) if f.endswith(SOURCE_SUFFIX)),
+                   key=lambda f: (order.get(f, len(order)), f))
+    stations = []
+    for file_name in files:
+        file_key = known.get(file_name)
+        if file_key is None:
+            file_key = file_name[:-len(SOURCE_SUFFIX)].replace(' ', '')
+            print("DEBUG: New station file {} -> {}_FilteredDate.csv".format(file_name, file_key))
+        stations.append((file_key, os.path.join(src_dir, file_name)))
+    return stations
+
+
+def read_raw_station(csv_path):
+    """
+    Đọc một file gốc và tính mã ngày cho từng dòng (chạy trong process con)
+
+    Returns:
+        tuple: (DataFrame giữ nguyên các cột của file, mảng mã ngày int64)
+    """
+    df = pd.read_csv(csv_path, dtype={'YMD': str, 'NAME': str})
+    dates = pd.to_datetime(pd.DataFrame({
+        'year': df['YEAR'],
+        'month': df['MONTH'],
+        'day': df['DAY'],
+    }), errors='coerce')
+    codes = dates.to_numpy(dtype='datetime64[D]').astype(np.int64)
+    codes[dates.isna().to_numpy()] = np.iinfo(np.int64).min
+    return df, codes
+
+
+def common_dates(station_codes):
+    """
+    Các mã ngày có mặt ở mọi trạm
+
+    Args:
+        station_codes: Danh sách mảng mã ngày, mỗi trạm một mảng
+
+    Returns:
+        ndarray: Mã ngày chung, đã sắp xếp tăng dần
+    """
+    unique = [np.unique(codes[codes != np.iinfo(np.int64).min]) for codes in station_codes]
+    values, counts = np.unique(np.concatenate(unique), return_counts=True)
+    return values[counts == len(station_codes)]
+
+
+def select_rows(df, codes, keep):
+    """Các dòng có ngày thuộc keep, bỏ dòng trùng ngày (giữ dòng đầu tiên), theo thứ tự ngày"""
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    first = np.ones(len(sorted_codes), dtype=bool)
+    first[1:] = sorted_codes[1:] != sorted_codes[:-1]
+    rows = order[first & np.isin(sorted_codes, keep)]
+    return df.iloc[rows]
+
+
+def prepare(src_dir=SENT_DIR, out_dir=FILTERED_DIR, workers=None):
+    """
+    Lọc các file gốc về tập ngày chung của mọi trạm và ghi ra thư mục kết quả
+
+    Args:
+        src_dir: Thư mục chứa *_Final.csv
+        out_dir: Thư mục ghi *_FilteredDate.csv
+        workers: Số process parse file (None = số CPU)
+
+    Returns:
+        dict: {tên file: số dòng đã ghi}
+    """
+    stations = station_files(src_dir)
+    if not stations:
+        raise ValueError("Không có file *{} trong {}".format(SOURCE_SUFFIX, src_dir))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parsed = list(pool.map(read_raw_station, [path for _, path in stations]))
+
+    keep = common_dates([codes for _, codes in parsed])
+    print("DEBUG: {} common dates across {} stations".format(len(keep), len(stations)))
+
+    os.makedirs(out_dir, exist_ok=True)
+    written = {}
+    for (file_key, _), (df, codes) in zip(stations, parsed):
+        out_path = os.path.join(out_dir, '{}_FilteredDate.csv'.format(file_key))
+        selected = select_rows(df, codes, keep)
+        selected.to_csv(out_path, index=False)
+        written[os.path.basename(out_path)] = len(selected)
+        print("DEBUG: Wrote {} rows to {}".format(len(selected), out_path))
+    return written
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Lọc dữ liệu DATA_SENT về tập ngày chung của các trạm')
+    parser.add_argument('--src', default=SENT_DIR, help='Thư mục chứa *_Final.csv')
+    parser.add_argument('--out', default=FILTERED_DIR, help='Thư mục ghi *_FilteredDate.csv')
+    parser.add_argument('--workers', type=int, default=None, help='Số process parse file')
+    args = parser.parse_args()
+
+    prepare(args.src, args.out, args.workers)
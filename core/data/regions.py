@@ -0,0 +1,295 @@
+import argparse
+import json
+import os
+import threading
+
+import numpy as np
+
+from core.data.station_store import BASE_DIR
+from core.data.versions import get_registry
+
+'''
+HÌNH HỌC 8 VÙNG KHÍ HẬU TỪ SHAPEFILE GADM CẤP TỈNH:
+- Chạy một lần: python -m core.data.regions [--src gadm41_VNM_shp] [--out Data_geo/vietnam_regions.npz]
+- Tỉnh (NAME_1) được gán vùng theo REGION_DICT rồi gộp (dissolve) thành 8 đa giác vùng
+- Mỗi mức đơn giản hóa (TOLERANCES, đơn vị độ) dùng shapely.coverage_simplify để các vùng
+  kề nhau vẫn chung đúng một đường biên (không hở, không chồng)
+- Kết quả lưu trong một file .npz: WKB của các vùng ghép thành một mảng uint8 kèm mảng offset,
+  đọc lại không cần pickle và không cần đọc shapefile
+- Mỗi mức có ngân sách số đỉnh (VERTEX_BUDGETS): nếu vượt, tolerance được nhân đôi đến khi vừa
+- Vẽ bản đồ chỉ cần vài trăm đỉnh thay vì toàn bộ đa giác tỉnh
+- File .npz được đăng ký với registry (nhóm 'regions') để cache figure bản đồ đổi theo dữ liệu vùng
+- GeoJSON cho Plotly của từng mức (tọa độ làm tròn theo mức) được cache trong bộ nhớ;
+  bản đồ tương tác chọn mức theo tỉ lệ phóng (ZOOM_LEVELS)
+'''
+
+# Shapefile GADM cấp tỉnh (không có trong repo, tải riêng về thư mục gốc)
+GADM_DIR = os.path.join(BASE_DIR, 'gadm41_VNM_shp')
+GADM_LAYER = 'gadm41_VNM_1'
+REGIONS_PATH = os.path.join(BASE_DIR, 'Data_geo', 'vietnam_regions.npz')
+
+# Các mức đơn giản hóa (độ) từ chi tiết đến thô, mức đầu tiên là mức mặc định khi vẽ bằng matplotlib
+TOLERANCES = (0.01, 0.03, 0.1)
+# Số đỉnh tối đa của cả 8 vùng ở từng mức
+VERTEX_BUDGETS = (20000, 6000, 1500)
+# Số chữ số thập phân của tọa độ GeoJSON ở từng mức
+GEOJSON_DECIMALS = (3, 3, 2)
+# (tỉ lệ phóng geo.projection.scale tối thiểu, mức): phóng càng lớn càng dùng mức chi tiết
+ZOOM_LEVELS = ((4.0, 0), (2.0, 1), (0.0, 2))
+
+# Mapping tỉnh thành với vùng
+REGION_DICT = {
+    # Tây Bắc
+    'Sơn La': 'Tây Bắc', 'Điện Biên': 'Tây Bắc', 'Lai Châu': 'Tây Bắc',
+    'Lào Cai': 'Tây Bắc', 'Yên Bái': 'Tây Bắc', 'Hoà Bình': 'Tây Bắc',
+
+    # Đông Bắc
+    'Lạng Sơn': 'Đông Bắc', 'Cao Bằng': 'Đông Bắc', 'Bắc Kạn': 'Đông Bắc',
+    'Thái Nguyên': 'Đông Bắc', 'Quảng Ninh': 'Đông Bắc', 'Bắc Giang': 'Đông Bắc',
+    'Phú Thọ': 'Đông Bắc', 'Tuyên Quang': 'Đông Bắc', 'Hà Giang': 'Đông Bắc',
+
+    # Đồng bằng sông Hồng
+    'Hà Nội': 'Đồng bằng sông Hồng', 'Hải Phòng': 'Đồng bằng sông Hồng',
+    'Hải Dương': 'Đồng bằng sông Hồng', 'Hưng Yên': 'Đồng bằng sông Hồng',
+    'Thái Bình': 'Đồng bằng sông Hồng', 'Hà Nam': 'Đồng bằng sông Hồng',
+    'Nam Định': 'Đồng bằng sông Hồng', 'Ninh Bình': 'Đồng bằng sông Hồng',
+    'Vĩnh Phúc': 'Đồng bằng sông Hồng', 'Bắc Ninh': 'Đồng bằng sông Hồng',
+
+    # Bắc Trung Bộ
+    'Thanh Hóa': 'Bắc Trung Bộ', 'Nghệ An': 'Bắc Trung Bộ',
+    'Hà Tĩnh': 'Bắc Trung Bộ', 'Quảng Bình': 'Bắc Trung Bộ',
+    'Quảng Trị': 'Bắc Trung Bộ', 'Thừa Thiên Huế': 'Bắc Trung Bộ',
+
+    # Duyên hải Nam Trung Bộ
+    'Đà Nẵng': 'Duyên hải Nam Trung Bộ', 'Quảng Nam': 'Duyên hải Nam Trung Bộ',
+    'Quảng Ngãi': 'Duyên hải Nam Trung Bộ', 'Bình Định': 'Duyên hải Nam Trung Bộ',
+    'Phú Yên': 'Duyên hải Nam Trung Bộ', 'Khánh Hòa': 'Duyên hải Nam Trung Bộ',
+    'Ninh Thuận': 'Duyên hải Nam Trung Bộ', 'Bình Thuận': 'Duyên hải Nam Trung Bộ',
+
+    # Tây Nguyên
+    'Kon Tum': 'Tây Nguyên', 'Gia Lai': 'Tây Nguyên',
+    'Đắk Lắk': 'Tây Nguyên', 'Đắk Nông': 'Tây Nguyên',
+    'Lâm Đồng': 'Tây Nguyên',
+
+    # Đông Nam Bộ
+    'Bình Phước': 'Đông Nam Bộ', 'Tây Ninh': 'Đông Nam Bộ',
+    'Bình Dương': 'Đông Nam Bộ', 'Đồng Nai': 'Đông Nam Bộ',
+    'Bà Rịa - Vũng Tàu': 'Đông Nam Bộ', 'Hồ Chí Minh': 'Đông Nam Bộ',
+
+    # Đồng bằng sông Cửu Long
+    'Long An': 'Đồng bằng sông Cửu Long', 'Tiền Giang': 'Đồng bằng sông Cửu Long',
+    'Bến Tre': 'Đồng bằng sông Cửu Long', 'Trà Vinh': 'Đồng bằng sông Cửu Long',
+    'Vĩnh Long': 'Đồng bằng sông Cửu Long', 'Đồng Tháp': 'Đồng bằng sông Cửu Long',
+    'An Giang': 'Đồng bằng sông Cửu Long', 'Kiên Giang': 'Đồng bằng sông Cửu Long',
+    'Cần Thơ': 'Đồng bằng sông Cửu Long', 'Hậu Giang': 'Đồng bằng sông Cửu Long',
+    'Sóc Trăng': 'Đồng bằng sông Cửu Long', 'Bạc Liêu': 'Đồng bằng sông Cửu Long',
+    'Cà Mau': 'Đồng bằng sông Cửu Long'
+}
+
+REGION_ORDER = ['Tây Bắc', 'Đông Bắc', 'Đồng bằng sông Hồng', 'Bắc Trung Bộ', 'Duyên hải Nam Trung Bộ',
+                'Tây Nguyên', 'Đông Nam Bộ', 'Đồng bằng sông Cửu Long']
+
+# Vùng của từng trạm (theo tên hiển thị)
+STATION_REGIONS = {
+    'Nội Bài': 'Đồng bằng sông Hồng',
+    'Lạng Sơn': 'Đông Bắc',
+    'Lào Cai': 'Tây Bắc',
+    'Vinh': 'Bắc Trung Bộ',
+    'Phú Bài': 'Bắc Trung Bộ',
+    'Quy Nhơn': 'Duyên hải Nam Trung Bộ',
+    'TPHCM': 'Đông Nam Bộ',
+    'Cà Mau': 'Đồng bằng sông Cửu Long',
+}
+
+
+def dissolve_regions(provinces, region_dict=REGION_DICT):
+    """
+    Gộp các tỉnh thành đa giác vùng
+
+    Args:
+        provinces: GeoDataFrame cấp tỉnh có cột NAME_1
+
+    Returns:
+        list: Đa giác (shapely) theo thứ tự REGION_ORDER, None nếu vùng không có tỉnh nào
+    """
+    import shapely
+
+    region = provinces['NAME_1'].map(region_dict)
+    unmapped = sorted(provinces.loc[region.isna(), 'NAME_1'].unique())
+    if unmapped:
+        print("WARNING: Các tỉnh chưa được gán vùng: {}".format(', '.join(unmapped)))
+    geometries = []
+    for name in REGION_ORDER:
+        parts = provinces.geometry[(region == name).to_numpy()]
+        geometries.append(shapely.union_all(parts.to_numpy()) if len(parts) else None)
+    return geometries
+
+
+def simplify_regions(geometries, tolerance):
+    """Đơn giản hóa các vùng như một lớp phủ (giữ chung đường biên giữa các vùng kề nhau)"""
+    import shapely
+
+    present = [g for g in geometries if g is not None]
+    simplified = iter(shapely.coverage_simplify(np.array(present, dtype=object), tolerance))
+    return [next(simplified) if g is not None else None for g in geometries]
+
+
+def simplify_to_budget(geometries, tolerance, budget, max_steps=8):
+    """Đơn giản hóa với tolerance tăng gấp đôi đến khi tổng số đỉnh không vượt ngân sách"""
+    import shapely
+
+    for _ in range(max_steps):
+        simplified = simplify_regions(geometries, tolerance)
+        vertices = int(sum(shapely.get_num_coordinates(g) for g in simplified if g is not None))
+        if vertices <= budget:
+            break
+        tolerance *= 2
+    return simplified, tolerance
+
+
+def _pack(geometries):
+    """WKB của các đa giác ghép thành (buffer uint8, offsets int64), vùng rỗng có độ dài 0"""
+    import shapely
+
+    blobs = [shapely.to_wkb(g) if g is not None else b'' for g in geometries]
+    offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in blobs])
+    return np.frombuffer(b''.join(blobs), dtype=np.uint8), offsets
+
+
+def _unpack(buffer, offsets):
+    import shapely
+
+    data = buffer.tobytes()
+    return [shapely.from_wkb(data[a:b]) if b > a else None for a, b in zip(offsets[:-1], offsets[1:])]
+
+
+def build_regions(src=GADM_DIR, out=REGIONS_PATH, layer=GADM_LAYER, tolerances=TOLERANCES,
+                  budgets=VERTEX_BUDGETS):
+    """Đọc shapefile, gộp vùng, đơn giản hóa theo từng mức (trong ngân sách số đỉnh) và lưu file .npz"""
+    import geopandas as gpd
+
+    provinces = gpd.read_file(src, layer=layer)
+    if provinces.crs is not None:
+        provinces = provinces.to_crs('EPSG:4326')
+    geometries = dissolve_regions(provinces)
+
+    arrays = {'regions': np.array(REGION_ORDER)}
+    used = []
+    for level, (tolerance, budget) in enumerate(zip(tolerances, budgets)):
+        simplified, tolerance = simplify_to_budget(geometries, tolerance, budget)
+        used.append(tolerance)
+        arrays['wkb_{}'.format(level)], arrays['offsets_{}'.format(level)] = _pack(simplified)
+    arrays['tolerances'] = np.asarray(used, dtype=np.float64)
+
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    np.savez_compressed(out, **arrays)
+    return out
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+# Đánh dấu trong cache: dữ liệu chưa có (chỉ cảnh báo một lần, vẫn kiểm tra lại file mỗi lần gọi
+# để dùng ngay khi dữ liệu xuất hiện)
+MISSING = object()
+
+
+def load_regions(level=0, path=REGIONS_PATH):
+    """
+    GeoDataFrame 8 vùng (cột region, geometry, EPSG:4326) ở một mức đơn giản hóa.
+    Tự build file .npz từ shapefile nếu chưa có; None nếu không có cả hai.
+    """
+    import geopandas as gpd
+
+    if not os.path.exists(path):
+        if not os.path.exists(GADM_DIR):
+            if _cache.get((path, None)) is not MISSING:
+                print("WARNING: Không tìm thấy {} và {}".format(path, GADM_DIR))
+                _cache[(path, None)] = MISSING
+            return None
+        with _cache_lock:
+            if not os.path.exists(path):
+                build_regions(out=path)
+
+    _cache.pop((path, None), None)
+    registry = get_registry()
+    if os.path.abspath(path) not in registry.files:
+        registry.watch('regions', os.path.basename(path), path)
+
+    key = (path, os.path.getmtime(path), level)
+    regions = _cache.get(key)
+    if regions is None:
+        with np.load(path) as data:
+            names = [str(name) for name in data['regions']]
+            geometries = _unpack(data['wkb_{}'.format(level)], data['offsets_{}'.format(level)])
+        keep = [g is not None for g in geometries]
+        regions = gpd.GeoDataFrame({'region': [n for n, k in zip(names, keep) if k]},
+                                   geometry=[g for g in geometries if g is not None], crs='EPSG:4326')
+        _cache[key] = regions
+    return regions
+
+
+def region_levels(path=REGIONS_PATH):
+    """Các mức đơn giản hóa (độ) có trong file .npz"""
+    with np.load(path) as data:
+        return [float(t) for t in data['tolerances']]
+
+
+def level_for_scale(scale):
+    """Mức đơn giản hóa dùng cho tỉ lệ phóng của bản đồ Plotly (None = toàn cảnh)"""
+    scale = 1.0 if scale is None else float(scale)
+    for min_scale, level in ZOOM_LEVELS:
+        if scale >= min_scale:
+            return level
+    return ZOOM_LEVELS[-1][1]
+
+
+_geojson_cache = {}
+
+
+def region_geojson(level=ZOOM_LEVELS[-1][1], path=REGIONS_PATH):
+    """
+    FeatureCollection GeoJSON của 8 vùng ở một mức (id của feature là tên vùng), tọa độ đã làm tròn.
+    None nếu chưa có dữ liệu vùng.
+    """
+    import shapely
+
+    regions = load_regions(level, path)
+    if regions is None:
+        return None
+    key = (path, os.path.getmtime(path), level)
+    geojson = _geojson_cache.get(key)
+    if geojson is None:
+        decimals = GEOJSON_DECIMALS[min(level, len(GEOJSON_DECIMALS) - 1)]
+        features = []
+        for name, geometry in zip(regions['region'], regions.geometry):
+            rounded = shapely.transform(geometry, lambda coords: np.round(coords, decimals))
+            features.append({
+                'type': 'Feature',
+                'id': name,
+                'properties': {'region': name},
+                'geometry': json.loads(shapely.to_geojson(rounded)),
+            })
+        geojson = {'type': 'FeatureCollection', 'features': features}
+        _geojson_cache[key] = geojson
+    return geojson
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gộp shapefile GADM cấp tỉnh thành 8 vùng đã đơn giản hóa')
+    parser.add_argument('--src', default=GADM_DIR, help='Thư mục shapefile GADM')
+    parser.add_argument('--out', default=REGIONS_PATH, help='File .npz kết quả')
+    parser.add_argument('--layer', default=GADM_LAYER, help='Layer cấp tỉnh')
+    parser.add_argument('--tolerances', type=float, nargs='+', default=list(TOLERANCES),
+                        help='Các mức đơn giản hóa (độ)')
+    parser.add_argument('--budgets', type=int, nargs='+', default=list(VERTEX_BUDGETS),
+                        help='Số đỉnh tối đa ở từng mức')
+    args = parser.parse_args()
+
+    out = build_regions(args.src, args.out, args.layer, args.tolerances, args.budgets)
+    print("Đã lưu {}".format(out))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+import glob
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+from core.data.station_store import BASE_DIR, STATIONS
+from core.data.versions import get_registry
+
+'''
+KHO KẾT QUẢ DỰ ĐOÁN (Data_compare):
+- Build một lần, giữ mảng (thực tế, dự đoán) trong bộ nhớ
+- Khóa tra cứu: (model, trạm, đặc trưng, horizon), ví dụ ('GCN_LSTM', 'TPHCM', 'AT max', 1)
+- Khi build lại một trạm chỉ đọc đúng các cột cần thiết (usecols)
+'''
+
+COMPARE_DIR = os.path.join(BASE_DIR, 'Data_compare')
+
+# Model trên dropdown -> (thư mục, tiền tố tên file, file theo trạm hay file gộp)
+MODELS = {
+    'LSTM': ('LSTM', 'LSTM', 'station'),
+    'BiLSTM': ('BiLSTM', 'BiLSTM', 'station'),
+    'GCN_LSTM': ('GCN_LSTM_baseline', 'GCN_LSTM_baseline', 'combined'),
+    'GCN_BiLSTM': ('GCN_BiLSTM_baseline', 'GCN_BiLSTM_baseline', 'combined'),
+    'Enhanced_GCN_LSTM': ('GCN_LSTM_Attention', 'GCN_LSTM_Attention', 'combined'),
+    'Enhanced_GCN_BiLSTM': ('GCN_BiLSTM_Attention', 'GCN_BiLSTM_Attention', 'combined'),
+}
+
+TARGETS = ['AT mean', 'AT max']
+DEFAULT_HORIZON = 1
+
+# Tên trạm dùng trong tên file / tên cột của Data_compare (ví dụ 'TPHCM', 'NoiBai')
+STATION_KEYS = [file_key for _, file_key, _ in STATIONS]
+
+_STATION_FILE = re.compile(r'Result_(?P<prefix>.+)_(?P<horizon>\d+)_(?P<station>[A-Za-z]+)\.csv$')
+_COMBINED_FILE = re.compile(r'Result_(?P<prefix>.+)_(?P<horizon>\d+)_AT(?P<target>mean|max)_new\.csv$')
+
+
+def _target_suffix(target):
+    """'AT mean' -> 'mean'"""
+    return target.split(' ')[1]
+
+
+class ResultsStore:
+    """
+    Kết quả dự đoán của tất cả các model, tra cứu trực tiếp theo khóa
+    """
+
+    def __init__(self, compare_dir=COMPARE_DIR):
+        self.compare_dir = compare_dir
+        self.series = {}
+
+    def model_files(self, model):
+        """Liệt kê file kết quả của một model: [(đường dẫn, horizon, trạm hoặc đặc trưng)]"""
+        folder, prefix, layout = MODELS[model]
+        pattern = _STATION_FILE if layout == 'station' else _COMBINED_FILE
+        files = []
+        for path in sorted(glob.glob(os.path.join(self.compare_dir, folder, 'Result_*.csv'))):
+            match = pattern.search(os.path.basename(path))
+            if match is None or match.group('prefix') != prefix:
+                continue
+            key = match.group('station') if layout == 'station' else 'AT ' + match.group('target')
+            files.append((path, int(match.group('horizon')), key))
+        return files
+
+    def _load_station_file(self, model, path, horizon, station, targets=TARGETS):
+        """File LSTM/BiLSTM: một trạm, cột Real_AT_mean, Predicted_AT_mean, ..."""
+        columns = {}
+        for target in targets:
+            suffix = _target_suffix(target)
+            columns[target] = ('Real_AT_{}'.format(suffix), 'Predicted_AT_{}'.format(suffix))
+        usecols = [c for pair in columns.values() for c in pair]
+        df = pd.read_csv(path, usecols=usecols, dtype=np.float32)
+        for target, (real_col, pred_col) in columns.items():
+            self.series[(model, station, target, horizon)] = (df[real_col].to_numpy(), df[pred_col].to_numpy())
+
+    def _load_combined_file(self, model, path, horizon, target, stations=STATION_KEYS):
+        """File GCN: một đặc trưng, cột Real_AT_<trạm>, Predicted_AT_<trạm> cho mọi trạm"""
+        usecols = [c for s in stations for c in ('Real_AT_{}'.format(s), 'Predicted_AT_{}'.format(s))]
+        df = pd.read_csv(path, usecols=usecols, dtype=np.float32)
+        for station in stations:
+            self.series[(model, station, target, horizon)] = (
+                df['Real_AT_{}'.format(station)].to_numpy(),
+                df['Predicted_AT_{}'.format(station)].to_numpy(),
+            )
+
+    def rebuild(self, model, station=None):
+        """
+        Đọc lại kết quả của một model (hoặc chỉ một trạm của model đó)
+
+        Args:
+            model: Tên model trên dropdown
+            station: Tên trạm trong Data_compare (None = tất cả các trạm)
+        """
+        layout = MODELS[model][2]
+        for path, horizon, key in self.model_files(model):
+            if layout == 'station':
+                if station is None or key == station:
+                    self._load_station_file(model, path, horizon, key)
+            else:
+                self._load_combined_file(model, path, horizon, key, STATION_KEYS if station is None else [station])
+        return self
+
+    def build(self):
+        """Đọc kết quả của tất cả các model"""
+        self.series = {}
+        for model in MODELS:
+            self.rebuild(model)
+        print("DEBUG: ResultsStore loaded {} series from {}".format(len(self.series), self.compare_dir))
+        return self
+
+    def get(self, model, station, target, horizon=DEFAULT_HORIZON):
+        """(thực tế, dự đoán) của một khóa, hoặc None nếu không có"""
+        return self.series.get((model, station, target, horizon))
+
+    def comparison_frame(self, model, station, horizon=DEFAULT_HORIZON):
+        """
+        DataFrame 4 cột Real_AT_mean, Real_AT_max, Predicted_AT_mean, Predicted_AT_max
+        dùng cho create_comparison_chart, hoặc None nếu thiếu dữ liệu
+        """
+        mean = self.get(model, station, 'AT mean', horizon)
+        maximum = self.get(model, station, 'AT max', horizon)
+        if mean is None or maximum is None:
+            return None
+
+        n = min(len(mean[0]), len(maximum[0]))
+        return pd.DataFrame({
+            'Real_AT_mean': mean[0][:n],
+            'Real_AT_max': maximum[0][:n],
+            'Predicted_AT_mean': mean[1][:n],
+            'Predicted_AT_max': maximum[1][:n],
+        }, copy=False)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_results_store():
+    """ResultsStore dùng chung cho cả process, build ở lần gọi đầu tiên"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = ResultsStore().build()
+                registry = get_registry()
+                for model in MODELS:
+                    for path, _, _ in store.model_files(model):
+                        registry.watch('results', model, path)
+                registry.subscribe('results', store.rebuild)
+                _store = store
+    return _store
@@ -0,0 +1,110 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from core.data.station_store import BASE_DIR
+from core.data.versions import get_registry
+
+'''
+BẢNG ĐIỂM ĐÁNH GIÁ MÔ HÌNH (DATA_Score/AT_ThucNghiemMoHinh.csv):
+- Parse một lần sang cột số (file trộn dấu phẩy và dấu chấm thập phân: "91,287", 91.5232)
+- Index dạng dict theo (model, trạm) nên mỗi lần tra cứu là O(1)
+- Tự đọc lại khi file trên đĩa thay đổi (qua sổ đăng ký phiên bản dữ liệu)
+'''
+
+SCORE_PATH = os.path.join(BASE_DIR, 'DATA_Score', 'AT_ThucNghiemMoHinh.csv')
+
+METRIC_COLUMNS = {
+    'mean': {'r2': 'R2 mean', 'mse': 'MSE mean', 'rmse': 'RMSE mean', 'mae': 'MAE mean'},
+    'max': {'r2': 'R2 max', 'mse': 'MSE max', 'rmse': 'RMSE max', 'mae': 'MAE max'},
+}
+
+
+def read_score_csv(csv_file_path):
+    """Đọc file điểm với cột số float64 và tên model/trạm đã bỏ khoảng trắng"""
+    df = pd.read_csv(csv_file_path, dtype=str)
+    df['Model'] = df['Model'].astype(str).str.strip()
+    df['Station'] = df['Station'].astype(str).str.strip()
+    df['Day'] = pd.to_numeric(df['Day'], errors='coerce')
+    for columns in METRIC_COLUMNS.values():
+        for column in columns.values():
+            values = df[column].str.strip().str.replace(',', '.', regex=False)
+            df[column] = pd.to_numeric(values, errors='coerce').astype(np.float64)
+    return df
+
+
+def build_index(df):
+    """
+    dict {(model, trạm): {'mean': {...}, 'max': {...}}}, dòng đầu tiên được giữ nếu trùng khóa
+    """
+    index = {}
+    records = df.to_dict('records')
+    for row in records:
+        key = (row['Model'], row['Station'])
+        if key in index:
+            continue
+        index[key] = {
+            card_type: {name: row.get(column, 0) for name, column in columns.items()}
+            for card_type, columns in METRIC_COLUMNS.items()
+        }
+    return index
+
+
+class ScoreTable:
+    """
+    Bảng điểm đã parse kèm index (model, trạm)
+    """
+
+    def __init__(self, csv_file_path=SCORE_PATH):
+        self.csv_file_path = csv_file_path
+        self.df = None
+        self.index = {}
+
+    def load(self):
+        df = read_score_csv(self.csv_file_path)
+        self.df = df
+        self.index = build_index(df)
+        print("DEBUG: ScoreTable loaded {} rows from {}".format(len(df), self.csv_file_path))
+        return self
+
+    def lookup(self, model_name, station_name):
+        """Metrics của một (model, trạm) hoặc None"""
+        return self.index.get((model_name, station_name))
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def get_score_table(csv_file_path=SCORE_PATH):
+    """ScoreTable dùng chung theo đường dẫn file, đọc lại khi file thay đổi"""
+    key = os.path.abspath(csv_file_path)
+    table = _tables.get(key)
+    if table is None:
+        with _tables_lock:
+            table = _tables.get(key)
+            if table is None:
+                table = ScoreTable(key).load()
+                registry = get_registry()
+                registry.watch('scores', key, key)
+                registry.subscribe('scores', _reload_table)
+                _tables[key] = table
+    # Một lần stat file: đọc lại bảng nếu nội dung file đã đổi
+    get_registry().refresh('scores')
+    return table
+
+
+def _reload_table(key):
+    """Listener của registry: đọc lại bảng điểm có đường dẫn key"""
+    table = _tables.get(key)
+    if table is not None:
+        table.load()
+
+
+def format_score(value):
+    """Hiển thị điểm với dấu phẩy thập phân giống file gốc (91.287 -> '91,287')"""
+    if value is None or pd.isna(value):
+        return "-"
+    return "{:g}".format(value).replace('.', ',')
@@ -0,0 +1,389 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from core.data.versions import get_registry
+
+'''
+KHO DỮ LIỆU TRẠM KHÍ TƯỢNG:
+- Đọc mỗi file Data_AT_FilteredDate/*_FilteredDate.csv đúng một lần cho cả process
+- Mỗi trạm là một DataFrame có index ngày (DATE) và kiểu dữ liệu cố định
+- Các hàm vẽ biểu đồ chỉ đọc từ kho, không tự gọi pd.read_csv nữa
+- Nếu đã build kho nhị phân (core/data/archive.py) thì mở bằng memory-map thay cho CSV
+- Ngày quan sát mới được thêm bằng append_observation: khối tổng hợp năm/tháng (core/data/cube.py)
+  và tổng tương quan được cộng dồn O(1), chỉ tính lại toàn bộ khi gọi rebuild_aggregates
+'''
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+FILTERED_DIR = os.path.join(BASE_DIR, 'Data_AT_FilteredDate')
+SENT_DIR = os.path.join(BASE_DIR, 'DATA_SENT')
+
+# Thứ tự Bắc - Nam: (tên hiển thị, tên file, NAME trong CSV)
+STATIONS = [
+    ('Nội Bài', 'NoiBai', 'NOI BAI'),
+    ('Lạng Sơn', 'LangSon', 'LANG SON'),
+    ('Lào Cai', 'LaoCai', 'LAO CAI'),
+    ('Vinh', 'Vinh', 'VINH'),
+    ('Phú Bài', 'PhuBai', 'PHU BAI'),
+    ('Quy Nhơn', 'QuyNhon', 'QUY NHON'),
+    ('TPHCM', 'TPHCM', 'HCM'),
+    ('Cà Mau', 'CaMau', 'CA MAU'),
+]
+
+STATION_ORDER = [name for name, _, _ in STATIONS]
+
+# NAME trong CSV (ví dụ 'HCM', 'NOI BAI') -> tên hiển thị
+STATION_BY_CODE = {code: name for name, _, code in STATIONS}
+
+# Tên hiển thị -> NAME trong CSV
+CODE_BY_STATION = {name: code for name, _, code in STATIONS}
+
+# Giá trị của các dropdown trạm trên dashboard (file_key, riêng TPHCM là 'HCM') -> tên hiển thị
+STATION_BY_VALUE = {('HCM' if key == 'TPHCM' else key): name for name, key, _ in STATIONS}
+
+# Tên file dữ liệu gốc trong DATA_SENT
+SENT_FILES = {
+    'Nội Bài': 'NoiBai_Final.csv',
+    'Lạng Sơn': 'Lang Son_Final.csv',
+    'Lào Cai': 'Lao Cai_Final.csv',
+    'Vinh': 'Vinh_Final.csv',
+    'Phú Bài': 'Phu Bai_Final.csv',
+    'Quy Nhơn': 'Quy Nhon_Final.csv',
+    'TPHCM': 'TPHCM_Final.csv',
+    'Cà Mau': 'Ca Mau_Final.csv',
+}
+
+FEATURES = ['DEW_2', 'TMP_2', 'RH', 'AT mean', 'AT max']
+
+# Cột YMD bị bỏ qua: ngày được lưu ở index DATE
+COLUMN_DTYPES = {
+    'NAME': 'category',
+    'LATITUDE': np.float64,
+    'LONGITUDE': np.float64,
+    'YEAR': np.int16,
+    'MONTH': np.int8,
+    'DAY': np.int8,
+    'DEW_2': np.float32,
+    'TMP_2': np.float32,
+    'RH': np.float32,
+    'AT mean': np.float32,
+    'AT max': np.float32,
+}
+
+
+def station_file_path(file_key, data_dir=FILTERED_DIR):
+    """Đường dẫn file CSV đã lọc ngày của một trạm"""
+    return os.path.join(data_dir, '{}_FilteredDate.csv'.format(file_key))
+
+
+def source_paths(source='filtered'):
+    """
+    Danh sách (tên trạm, đường dẫn CSV) của một nguồn dữ liệu
+
+    Args:
+        source: 'filtered' (Data_AT_FilteredDate) hoặc 'sent' (DATA_SENT)
+    """
+    if source == 'filtered':
+        return [(name, station_file_path(file_key)) for name, file_key, _ in STATIONS]
+    elif source == 'sent':
+        return [(name, os.path.join(SENT_DIR, SENT_FILES[name])) for name in STATION_ORDER]
+    raise ValueError("Nguồn dữ liệu {} không được hỗ trợ".format(source))
+
+
+def read_station_csv(csv_path):
+    """
+    Đọc một file CSV trạm thành DataFrame có kiểu cố định và index theo ngày.
+    Ngày được dựng từ YEAR/MONTH/DAY vì cột YMD không cùng định dạng giữa các file.
+    """
+    df = pd.read_csv(csv_path, usecols=list(COLUMN_DTYPES), dtype=COLUMN_DTYPES)[list(COLUMN_DTYPES)]
+    dates = pd.to_datetime(pd.DataFrame({
+        'year': df['YEAR'],
+        'month': df['MONTH'],
+        'day': df['DAY'],
+    }))
+    df.index = pd.DatetimeIndex(dates, name='DATE')
+    return df
+
+
+def format_ymd_like(reference, row):
+    """
+    Format YMD cho dòng mới theo cùng kiểu với dòng tham chiếu của file
+    (Vinh dùng 'dd/mm/YYYY', các trạm khác dùng 'm/d/YYYY')
+    """
+    parts = reference.get('YMD', '').split('/')
+    day_first = False
+    padded = False
+    if len(parts) == 3:
+        day_first = parts[0].isdigit() and int(parts[0]) == int(float(reference.get('DAY', 0))) \
+            and int(parts[0]) != int(float(reference.get('MONTH', 0)))
+        padded = parts[0].startswith('0') or parts[1].startswith('0')
+
+    first, second = (row['DAY'], row['MONTH']) if day_first else (row['MONTH'], row['DAY'])
+    if padded:
+        return '{:02d}/{:02d}/{}'.format(first, second, row['YEAR'])
+    return '{}/{}/{}'.format(first, second, row['YEAR'])
+
+
+class StationStore:
+    """
+    Giữ DataFrame của tất cả các trạm trong bộ nhớ
+    """
+
+    def __init__(self, source='filtered'):
+        self.source = source
+        self.frames = {}
+        self._dates = {}
+        self._date_labels = {}
+        self._pending = {}     # tên trạm -> các dòng mới chưa ghép vào DataFrame
+        self._appended = {}    # tên trạm -> {ngày: mảng (F,)} các ngày thêm qua append_observation
+        self._cube = None      # AggregateCube của tất cả các trạm
+        self._pair_sums = None
+        self._pair_prefix = None  # PairPrefixSums: tổng tích lũy theo ngày cho tương quan theo khoảng ngày
+        self._lock = threading.RLock()
+
+    def load(self):
+        """Đọc toàn bộ các trạm (gọi một lần khi khởi động)"""
+        from core.data import archive
+
+        frames = archive.load_station_frames(self.source)
+        if frames is not None:
+            print("DEBUG: StationStore mapped {} stations from archive '{}'".format(len(frames), self.source))
+        else:
+            frames = {name: read_station_csv(path) for name, path in source_paths(self.source)}
+            print("DEBUG: StationStore loaded {} stations from CSV '{}'".format(len(frames), self.source))
+        self.frames = frames
+        self._dates = {}
+        self._date_labels = {}
+        self._pending = {}
+        self._appended = {}
+        self.rebuild_aggregates()
+        return self
+
+    def reload_station(self, station_name):
+        """Đọc lại CSV của một trạm (khi file trên đĩa thay đổi), các trạm khác giữ nguyên"""
+        path = dict(source_paths(self.source))[station_name]
+        with self._lock:
+            self.frames[station_name] = read_station_csv(path)
+            self._dates.pop(station_name, None)
+            self._date_labels.pop(station_name, None)
+            self._pending.pop(station_name, None)
+            self._appended.pop(station_name, None)
+            if self._cube is not None:
+                self._cube.load_station(station_name, self.frames[station_name])
+            self._pair_sums = None
+            self._pair_prefix = None
+        print("DEBUG: StationStore reloaded {}".format(station_name))
+
+    def get(self, station_name):
+        """Lấy DataFrame của một trạm theo tên hiển thị"""
+        if self._pending.get(station_name):
+            self._flush(station_name)
+        return self.frames[station_name]
+
+    def _flush(self, station_name):
+        """Ghép các dòng mới (append_observation) vào DataFrame của trạm, một lần cho cả lô"""
+        with self._lock:
+            rows = self._pending.pop(station_name, None)
+            if not rows:
+                return
+            new = pd.DataFrame(rows).astype(COLUMN_DTYPES)
+            new.index = pd.DatetimeIndex(
+                pd.to_datetime(pd.DataFrame({'year': new['YEAR'], 'month': new['MONTH'], 'day': new['DAY']})),
+                name='DATE')
+            frame = self.frames[station_name]
+            combined = pd.concat([frame, new])
+            combined['NAME'] = combined['NAME'].astype('category')
+            self.frames[station_name] = combined
+
+    def _last_date(self, station_name):
+        rows = self._pending.get(station_name)
+        if rows:
+            return pd.Timestamp(year=int(rows[-1]['YEAR']), month=int(rows[-1]['MONTH']), day=int(rows[-1]['DAY']))
+        index = self.frames[station_name].index
+        return index[-1] if len(index) else None
+
+    def _values_on(self, station_name, date):
+        """Mảng (F,) của một trạm tại một ngày, hoặc None nếu trạm chưa có ngày đó"""
+        appended = self._appended.get(station_name, {})
+        if date in appended:
+            return appended[date]
+        frame = self.frames[station_name]
+        if date in frame.index:
+            return frame.loc[date, FEATURES].to_numpy(dtype=np.float64)
+        return None
+
+    def append_observation(self, station_name, date, values, persist=True):
+        """
+        Thêm một ngày quan sát mới cho một trạm
+
+        Args:
+            station_name: Tên hiển thị của trạm
+            date: Ngày quan sát (phải sau ngày cuối cùng đang có của trạm)
+            values: dict {đặc trưng: giá trị}, đặc trưng thiếu được coi là NaN
+            persist: Ghi thêm một dòng vào cuối file CSV của trạm
+        """
+        date = pd.Timestamp(date).normalize()
+        vector = np.array([values.get(feature, np.nan) for feature in FEATURES], dtype=np.float64)
+
+        with self._lock:
+            last = self._last_date(station_name)
+            if last is not None and date <= last:
+                raise ValueError("Ngày {} không sau ngày cuối cùng ({}) của trạm {}".format(
+                    date.date(), last.date(), station_name))
+
+            frame = self.frames[station_name]
+            code = CODE_BY_STATION.get(station_name, station_name)
+            row = {
+                'NAME': code,
+                'LATITUDE': float(frame['LATITUDE'].iloc[-1]) if len(frame) else np.nan,
+                'LONGITUDE': float(frame['LONGITUDE'].iloc[-1]) if len(frame) else np.nan,
+                'YEAR': date.year,
+                'MONTH': date.month,
+                'DAY': date.day,
+            }
+            row.update(zip(FEATURES, vector))
+
+            self._pending.setdefault(station_name, []).append(row)
+            self._appended.setdefault(station_name, {})[date] = vector
+            self._dates.pop(station_name, None)
+            self._date_labels.pop(station_name, None)
+
+            # Cộng dồn vào ô (trạm, năm, tháng) của khối tổng hợp (chỉ khi đã được tính)
+            if self._cube is not None and station_name in self._cube.stations:
+                self._cube.add(station_name, date.year, date.month, vector)
+
+            # Cộng dồn vào tổng tương quan với các trạm đã có cùng ngày
+            for sums in (self._pair_sums, self._pair_prefix):
+                if sums is None or station_name not in sums.stations:
+                    continue
+                columns = [FEATURES.index(feature) for feature in sums.features]
+                partners = {}
+                for j, other in enumerate(sums.stations):
+                    if other == station_name or other not in self.frames:
+                        continue
+                    other_values = self._values_on(other, date)
+                    if other_values is not None:
+                        partners[j] = other_values[columns]
+                i = sums.stations.index(station_name)
+                if sums is self._pair_prefix:
+                    sums.add(date.to_datetime64(), i, vector[columns], partners)
+                else:
+                    sums.add(i, vector[columns], partners)
+
+        # Dữ liệu trong bộ nhớ đã được cập nhật: chỉ tăng phiên bản, không đọc lại file
+        # (kể cả khi không ghi file, để các cache theo data_version / fingerprint không dùng dữ liệu cũ)
+        path = self._persist_row(station_name, row) if persist else None
+        get_registry().mark_changed('stations', station_name, path)
+
+    def _persist_row(self, station_name, row):
+        """Ghi thêm một dòng vào cuối file CSV của trạm (không ghi lại cả file), trả về đường dẫn file"""
+        path = dict(source_paths(self.source))[station_name]
+        with open(path, 'rb') as f:
+            header = f.readline().decode('utf-8').strip().split(',')
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - 512))
+            tail = f.read().decode('utf-8').rstrip('\r\n')
+        ymd = format_ymd_like(dict(zip(header, tail.rsplit('\n', 1)[-1].split(','))), row)
+
+        fields = []
+        for column in header:
+            if column == 'YMD':
+                fields.append(ymd)
+                continue
+            value = row.get(column, np.nan)
+            if isinstance(value, float) and np.isnan(value):
+                fields.append('')
+            else:
+                fields.append(str(value))
+        with open(path, 'a', encoding='utf-8', newline='') as f:
+            f.write(','.join(fields) + '\n')
+        return path
+
+    def cube(self):
+        """AggregateCube của tất cả các trạm (build ở lần dùng đầu tiên)"""
+        from core.data.cube import AggregateCube
+
+        if self._cube is None:
+            with self._lock:
+                if self._cube is None:
+                    self._cube = AggregateCube.from_frames(self.as_dict())
+        return self._cube
+
+    def pair_sums(self):
+        """PairSums của tất cả các trạm (tính từ panel ở lần dùng đầu tiên)"""
+        from core.data.aggregates import PairSums
+        from core.data.panel import build_panel
+
+        if self._pair_sums is None:
+            with self._lock:
+                if self._pair_sums is None:
+                    self._pair_sums = PairSums.from_panel(build_panel(self.as_dict()))
+        return self._pair_sums
+
+    def pair_prefix(self):
+        """PairPrefixSums của tất cả các trạm (tương quan theo khoảng ngày / cửa sổ trượt)"""
+        from core.data.aggregates import PairPrefixSums
+        from core.data.panel import build_panel
+
+        if self._pair_prefix is None:
+            with self._lock:
+                if self._pair_prefix is None:
+                    self._pair_prefix = PairPrefixSums.from_panel(build_panel(self.as_dict()))
+        return self._pair_prefix
+
+    def rebuild_aggregates(self):
+        """Bỏ các tổng đã cộng dồn, lần dùng tiếp theo sẽ tính lại toàn bộ từ dữ liệu"""
+        with self._lock:
+            self._cube = None
+            self._pair_sums = None
+            self._pair_prefix = None
+
+    def dates(self, station_name):
+        """Mảng ngày datetime64[D] của một trạm (tính một lần rồi giữ lại)"""
+        dates = self._dates.get(station_name)
+        if dates is None:
+            dates = self.get(station_name).index.values.astype('datetime64[D]')
+            self._dates[station_name] = dates
+        return dates
+
+    def date_labels(self, station_name, start=None, stop=None):
+        """
+        Nhãn ngày dạng dd/mm/YYYY của một trạm.
+        Nhãn được format vectorized một lần, các lần sau chỉ cắt view [start:stop] nên O(1).
+        """
+        labels = self._date_labels.get(station_name)
+        if labels is None:
+            labels = self.get(station_name).index.strftime('%d/%m/%Y').to_numpy(dtype=object)
+            self._date_labels[station_name] = labels
+        return labels[start:stop]
+
+    def as_dict(self):
+        """Trả về dict {tên trạm: DataFrame} theo thứ tự Bắc - Nam (dùng cho station_df)"""
+        return {name: self.get(name) for name in STATION_ORDER if name in self.frames}
+
+    def __contains__(self, station_name):
+        return station_name in self.frames
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_station_store():
+    """
+    Trả về StationStore dùng chung cho cả process, tải dữ liệu ở lần gọi đầu tiên
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = StationStore().load()
+                registry = get_registry()
+                for station_name, path in source_paths(store.source):
+                    registry.watch('stations', station_name, path)
+                registry.subscribe('stations', store.reload_station)
+                _store = store
+    return _store
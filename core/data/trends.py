@@ -0,0 +1,293 @@
+import math
+import threading
+
+import numpy as np
+import pandas as pd
+
+from core.data.versions import get_registry
+
+'''
+XU HƯỚNG THEO NĂM CHO MỌI TRẠM VÀ ĐẶC TRƯNG:
+- Chuỗi trung bình năm lấy từ khối tổng hợp (core/data/cube.py), năm thiếu dữ liệu bị bỏ qua
+- OLS: hệ phương trình chuẩn 2x2 của mọi chuỗi được giải trong một lần np.linalg.solve
+- Kiểm định Mann-Kendall: thống kê S = (số cặp tăng) - (số cặp giảm), đếm bằng merge sort O(n log n),
+  phương sai có hiệu chỉnh cho các giá trị bằng nhau
+- Độ dốc Sen (trung vị độ dốc của mọi cặp năm, chính xác): chia đôi trên độ dốc b, mỗi bước đếm số cặp
+  có độ dốc <= b bằng cách đếm nghịch thế của x - b * t (O(n log n)), đến khi khoảng còn <= n cặp thì
+  liệt kê các cặp đó (merge sort) và chọn đúng trung vị, không liệt kê n² cặp
+- Bảng kết quả được cache theo phiên bản dữ liệu
+'''
+
+DECADE = 10
+
+
+def count_inversions(values):
+    """
+    Số cặp i < j có values[i] > values[j] (merge sort, O(n log n))
+    """
+    values = list(values)
+    n = len(values)
+    inversions = 0
+    width = 1
+    buffer = values[:]
+    while width < n:
+        for lo in range(0, n, 2 * width):
+            mid = min(lo + width, n)
+            hi = min(lo + 2 * width, n)
+            i, j, k = lo, mid, lo
+            while i < mid and j < hi:
+                if values[i] <= values[j]:
+                    buffer[k] = values[i]
+                    i += 1
+                else:
+                    buffer[k] = values[j]
+                    inversions += mid - i
+                    j += 1
+                k += 1
+            buffer[k:hi] = values[i:mid] if i < mid else values[j:hi]
+        values, buffer = buffer, values
+        width *= 2
+    return inversions
+
+
+def _tie_groups(values):
+    """Kích thước các nhóm giá trị bằng nhau (chỉ nhóm có từ 2 phần tử)"""
+    _, counts = np.unique(values, return_counts=True)
+    return counts[counts > 1]
+
+
+def mann_kendall(values):
+    """
+    Kiểm định Mann-Kendall cho một chuỗi đã sắp theo thời gian (không có NaN)
+
+    Returns:
+        tuple: (S, Z, p-value hai phía)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n < 3:
+        return 0.0, np.nan, np.nan
+
+    ties = _tie_groups(values)
+    pairs = n * (n - 1) // 2
+    tied_pairs = int((ties * (ties - 1) // 2).sum())
+    decreasing = count_inversions(values)
+    increasing = pairs - decreasing - tied_pairs
+    s = float(increasing - decreasing)
+
+    var_s = (n * (n - 1) * (2 * n + 5) - float((ties * (ties - 1) * (2 * ties + 5)).sum())) / 18.0
+    if var_s <= 0:
+        return s, np.nan, np.nan
+    if s > 0:
+        z = (s - 1) / math.sqrt(var_s)
+    elif s < 0:
+        z = (s + 1) / math.sqrt(var_s)
+    else:
+        z = 0.0
+    p = math.erfc(abs(z) / math.sqrt(2))
+    return s, z, p
+
+
+def _count_slopes_at_most(t, x, b):
+    """Số cặp i < j (t tăng dần) có (x[j] - x[i]) / (t[j] - t[i]) <= b"""
+    # độ dốc <= b  <=>  x[j] - b t[j] <= x[i] - b t[i]: đếm cặp không tăng của z = x - b t
+    z = x - b * t
+    pairs = len(z) * (len(z) - 1) // 2
+    # cặp z[i] < z[j] là cặp có độ dốc > b; đếm bằng nghịch thế của -z (không tính bằng nhau)
+    return pairs - count_inversions(-z)
+
+
+def _slopes_between(t, x, lo, hi):
+    """
+    Độ dốc của các cặp có lo < độ dốc <= hi (cùng phép so sánh z = x - b t như _count_slopes_at_most),
+    liệt kê bằng merge sort, O(n log n + số cặp)
+    """
+    # Sắp theo z(lo) tăng dần, bằng nhau thì t giảm dần (cặp có độ dốc đúng bằng lo không được tính);
+    # cặp nằm trong khoảng là cặp đứng trước - đứng sau theo thứ tự này mà z(hi) không tăng
+    order = np.lexsort((-t, x - lo * t))
+    values = list((x - hi * t)[order])
+    index = list(order)
+    n = len(values)
+    firsts, seconds = [], []
+    width = 1
+    value_buffer, index_buffer = values[:], index[:]
+    while width < n:
+        for start in range(0, n, 2 * width):
+            mid = min(start + width, n)
+            end = min(start + 2 * width, n)
+            i, j, k = start, mid, start
+            while i < mid and j < end:
+                if values[i] < values[j]:
+                    value_buffer[k], index_buffer[k] = values[i], index[i]
+                    i += 1
+                else:
+                    # Mọi phần tử còn lại bên trái đều >= values[j]
+                    firsts.extend(index[i:mid])
+                    seconds.extend([index[j]] * (mid - i))
+                    value_buffer[k], index_buffer[k] = values[j], index[j]
+                    j += 1
+                k += 1
+            if i < mid:
+                value_buffer[k:end], index_buffer[k:end] = values[i:mid], index[i:mid]
+            else:
+                value_buffer[k:end], index_buffer[k:end] = values[j:end], index[j:end]
+        values, value_buffer = value_buffer, values
+        index, index_buffer = index_buffer, index
+        width *= 2
+    firsts = np.asarray(firsts, dtype=np.int64)
+    seconds = np.asarray(seconds, dtype=np.int64)
+    return (x[seconds] - x[firsts]) / (t[seconds] - t[firsts])
+
+
+def sens_slope(t, x):
+    """
+    Độ dốc Sen: trung vị độ dốc (x[j] - x[i]) / (t[j] - t[i]) của mọi cặp i < j (chính xác)
+
+    Chia đôi khoảng (lo, hi] chứa độ dốc cần tìm cho đến khi khoảng chỉ còn không quá n cặp
+    (mỗi bước đếm O(n log n)), sau đó liệt kê các cặp đó và chọn đúng phần tử cần tìm.
+
+    Args:
+        t: Thời điểm tăng dần (ví dụ năm), không trùng nhau
+        x: Giá trị tương ứng, không có NaN
+    """
+    t = np.asarray(t, dtype=np.float64)
+    x = np.asarray(x, dtype=np.float64)
+    n = len(t)
+    if n < 2:
+        return np.nan
+    pairs = n * (n - 1) // 2
+
+    # Độ dốc lớn nhất có thể bị chặn bởi (max x - min x) / (khoảng cách nhỏ nhất giữa hai thời điểm)
+    bound = (x.max() - x.min()) / np.diff(t).min() + 1.0
+
+    def kth_slope(k):
+        """Độ dốc nhỏ thứ k (k tính từ 1)"""
+        lo, hi = -bound, bound
+        below, inside = 0, pairs  # số cặp có độ dốc <= lo và trong (lo, hi]
+        while inside > n:
+            mid = (lo + hi) / 2
+            if not lo < mid < hi:
+                # Nhiều cặp cùng một độ dốc: không chia nhỏ được nữa, liệt kê hết
+                break
+            at_most = _count_slopes_at_most(t, x, mid)
+            if at_most >= k:
+                hi, inside = mid, at_most - below
+            else:
+                lo, inside, below = mid, inside - (at_most - below), at_most
+        slopes = np.sort(_slopes_between(t, x, lo, hi))
+        return slopes[min(max(k - below - 1, 0), len(slopes) - 1)]
+
+    if pairs % 2 == 1:
+        return kth_slope(pairs // 2 + 1)
+    return (kth_slope(pairs // 2) + kth_slope(pairs // 2 + 1)) / 2
+
+
+def ols_batch(years, values):
+    """
+    Hồi quy tuyến tính cho nhiều chuỗi cùng lúc, bỏ qua NaN theo từng chuỗi
+
+    Args:
+        years: Mảng (Y,) năm
+        values: Mảng (..., Y) các chuỗi
+
+    Returns:
+        tuple: slope, intercept, r2 có shape (...)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    t = np.asarray(years, dtype=np.float64)
+    # Trừ năm giữa để hệ phương trình chuẩn không bị điều kiện xấu
+    center = t.mean()
+    tc = t - center
+    mask = ~np.isnan(values)
+    y = np.where(mask, values, 0.0)
+    m = mask.astype(np.float64)
+
+    n = m.sum(axis=-1)
+    st = (m * tc).sum(axis=-1)
+    stt = (m * tc * tc).sum(axis=-1)
+    sy = y.sum(axis=-1)
+    sty = (y * tc).sum(axis=-1)
+
+    a = np.stack([np.stack([n, st], axis=-1), np.stack([st, stt], axis=-1)], axis=-2)  # (..., 2, 2)
+    b = np.stack([sy, sty], axis=-1)[..., None]
+    singular = np.abs(np.linalg.det(a)) < 1e-12
+    a[singular] = np.eye(2)
+    coef = np.linalg.solve(a, b)[..., 0]
+    intercept_c, slope = coef[..., 0], coef[..., 1]
+    slope[singular] = np.nan
+    intercept_c[singular] = np.nan
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fitted = intercept_c[..., None] + slope[..., None] * tc
+        mean_y = sy / n
+        ss_res = (m * (y - fitted) ** 2).sum(axis=-1)
+        ss_tot = (m * (y - mean_y[..., None]) ** 2).sum(axis=-1)
+        r2 = 1 - ss_res / ss_tot
+    return slope, intercept_c - slope * center, r2
+
+
+def trend_table(cube, features=None):
+    """
+    Bảng xu hướng của mọi (trạm, đặc trưng) từ khối tổng hợp
+
+    Returns:
+        DataFrame index (trạm, đặc trưng), các cột:
+        ols_slope, ols_intercept, r2, sen_slope (°C/năm), mk_s, mk_z, p_value,
+        first_year, last_year, n_years
+    """
+    features = list(features or cube.features)
+    columns = [cube.features.index(f) for f in features]
+    yearly = np.moveaxis(cube.yearly_array()[:, :, columns], 1, -1)  # (S, F, Y)
+    years = cube.years
+    slope, intercept, r2 = ols_batch(years, yearly)
+
+    rows = []
+    for i, station in enumerate(cube.stations):
+        for j, feature in enumerate(features):
+            series = yearly[i, j]
+            valid = ~np.isnan(series)
+            t, x = years[valid], series[valid]
+            s, z, p = mann_kendall(x)
+            rows.append({
+                'station': station,
+                'feature': feature,
+                'ols_slope': slope[i, j],
+                'ols_intercept': intercept[i, j],
+                'r2': r2[i, j],
+                'sen_slope': sens_slope(t, x),
+                'mk_s': s,
+                'mk_z': z,
+                'p_value': p,
+                'first_year': int(t[0]) if len(t) else np.nan,
+                'last_year': int(t[-1]) if len(t) else np.nan,
+                'n_years': int(valid.sum()),
+            })
+    return pd.DataFrame(rows).set_index(['station', 'feature'])
+
+
+def trend_label(row, alpha=0.05):
+    """Nhận xét xu hướng: tăng / giảm có ý nghĩa thống kê hoặc không rõ"""
+    if pd.isna(row['p_value']) or row['p_value'] >= alpha:
+        return 'Không rõ'
+    return 'Tăng' if row['mk_s'] > 0 else 'Giảm'
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_trend_table():
+    """Bảng xu hướng của dữ liệu hiện tại, tính lại khi phiên bản dữ liệu thay đổi"""
+    from core.data.station_store import get_station_store
+
+    cube = get_station_store().cube()
+    key = (get_registry().data_version(), id(cube))
+    table = _cache.get(key)
+    if table is None:
+        with _cache_lock:
+            table = _cache.get(key)
+            if table is None:
+                table = trend_table(cube)
+                _cache.clear()
+                _cache[key] = table
+    return table
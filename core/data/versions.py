@@ -0,0 +1,179 @@
+import hashlib
+import os
+import threading
+import time
+
+'''
+SỔ ĐĂNG KÝ PHIÊN BẢN DỮ LIỆU:
+- Mỗi file dữ liệu được theo dõi bằng dấu vân tay (kích thước, mtime, hash nội dung)
+- File thuộc một nhóm ('stations', 'results', 'scores') và một khóa (tên trạm, tên model, ...)
+- Khi file đổi: tăng phiên bản của (nhóm, khóa) và gọi các hàm đã subscribe để
+  chỉ build lại đúng trạm / model bị ảnh hưởng
+- Hash nội dung chỉ được tính khi mtime/kích thước đổi, nên "touch" file không làm mất cache
+'''
+
+CHECK_INTERVAL = 1.0
+
+
+def content_hash(path, chunk_size=1 << 20):
+    """Hash blake2b của nội dung file"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stat_fingerprint(path):
+    """(kích thước, mtime_ns) của file, hoặc None nếu file không tồn tại"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class DataVersionRegistry:
+    """
+    Theo dõi các file dữ liệu và phiên bản của từng (nhóm, khóa)
+    """
+
+    def __init__(self, check_interval=CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self.files = {}        # path -> (nhóm, khóa)
+        self.stats = {}        # path -> (kích thước, mtime_ns)
+        self.hashes = {}       # path -> hash nội dung
+        self.versions = {}     # (nhóm, khóa) -> int
+        self.group_versions = {}  # nhóm -> int
+        self.unsaved = {}      # (nhóm, khóa) -> số lần dữ liệu trong bộ nhớ đổi mà file không đổi
+        self.listeners = {}    # nhóm -> [callback(khóa)]
+        self._last_check = 0.0
+        self._lock = threading.RLock()
+
+    def watch(self, group, key, path):
+        """Đăng ký một file thuộc (nhóm, khóa), lấy dấu vân tay hiện tại làm mốc"""
+        path = os.path.abspath(path)
+        with self._lock:
+            self.files[path] = (group, key)
+            self.stats[path] = stat_fingerprint(path)
+            self.hashes[path] = content_hash(path) if self.stats[path] is not None else None
+            self.versions.setdefault((group, key), 0)
+            self.group_versions.setdefault(group, 0)
+
+    def subscribe(self, group, callback):
+        """callback(khóa) được gọi khi một file của nhóm thay đổi"""
+        with self._lock:
+            callbacks = self.listeners.setdefault(group, [])
+            if callback not in callbacks:
+                callbacks.append(callback)
+
+    def _changed(self, path):
+        """Kiểm tra một file: so mtime/kích thước trước, xác nhận bằng hash nội dung"""
+        current = stat_fingerprint(path)
+        previous = self.stats[path]
+        if current == previous:
+            return False
+        self.stats[path] = current
+        if current is None:
+            self.hashes[path] = None
+            return True
+
+        new_hash = content_hash(path)
+        old_hash = self.hashes[path]
+        self.hashes[path] = new_hash
+        return new_hash != old_hash
+
+    def refresh(self, group=None, force=False):
+        """
+        Kiểm tra các file đang theo dõi, build lại phần bị ảnh hưởng
+
+        Args:
+            group: Chỉ kiểm tra một nhóm (None = tất cả)
+            force: Bỏ qua giới hạn CHECK_INTERVAL giữa hai lần kiểm tra
+
+        Returns:
+            list: Các (nhóm, khóa) vừa thay đổi
+        """
+        now = time.monotonic()
+        if not force and group is None and now - self._last_check < self.check_interval:
+            return []
+
+        changed = []
+        with self._lock:
+            if group is None:
+                self._last_check = now
+            for path, (file_group, key) in list(self.files.items()):
+                if group is not None and file_group != group:
+                    continue
+                if self._changed(path) and (file_group, key) not in changed:
+                    changed.append((file_group, key))
+            listeners = {g: list(callbacks) for g, callbacks in self.listeners.items()}
+
+        # Build lại trước rồi mới tăng phiên bản, để cache không gắn dữ liệu cũ với phiên bản mới
+        for file_group, key in changed:
+            for callback in listeners.get(file_group, []):
+                try:
+                    callback(key)
+                except Exception as e:
+                    print("ERROR rebuilding {} / {}: {}".format(file_group, key, str(e)))
+
+        with self._lock:
+            for file_group, key in changed:
+                # Đã build lại từ file: dữ liệu trong bộ nhớ khớp với file
+                self.unsaved.pop((file_group, key), None)
+                self.versions[(file_group, key)] += 1
+                self.group_versions[file_group] += 1
+                print("DEBUG: Data changed: {} / {} -> version {}".format(
+                    file_group, key, self.versions[(file_group, key)]))
+        return changed
+
+    def mark_changed(self, group, key, path=None):
+        """
+        Tăng phiên bản khi dữ liệu trong bộ nhớ đã được cập nhật trực tiếp (ví dụ ghi thêm dòng),
+        lấy lại dấu vân tay của file để lần refresh sau không build lại.
+        Không có path (file không đổi): ghi nhận vào unsaved để fingerprint cũng đổi theo
+        """
+        with self._lock:
+            if path is not None:
+                self.watch(group, key, path)
+            else:
+                self.unsaved[(group, key)] = self.unsaved.get((group, key), 0) + 1
+            self.versions[(group, key)] = self.versions.get((group, key), 0) + 1
+            self.group_versions[group] = self.group_versions.get(group, 0) + 1
+
+    def version(self, group, key=None):
+        """Phiên bản của (nhóm, khóa), hoặc của cả nhóm nếu key là None"""
+        if key is None:
+            return self.group_versions.get(group, 0)
+        return self.versions.get((group, key), 0)
+
+    def data_version(self):
+        """Phiên bản tổng hợp của mọi nhóm, dùng làm khóa cache"""
+        return tuple(sorted(self.group_versions.items()))
+
+    def fingerprint(self, group=None):
+        """
+        Hash nội dung của các file đang theo dõi (một nhóm hoặc tất cả).
+        Khác data_version, giá trị này giữ nguyên giữa các lần khởi động lại nếu dữ liệu không đổi,
+        dùng làm khóa cho cache lưu trên đĩa. Thay đổi chỉ có trong bộ nhớ (unsaved) cũng được tính.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        with self._lock:
+            entries = sorted((file_group, str(key), os.path.basename(path), self.hashes.get(path) or '')
+                             for path, (file_group, key) in self.files.items()
+                             if group is None or file_group == group)
+            entries += sorted((file_group, str(key), 'unsaved', str(count))
+                              for (file_group, key), count in self.unsaved.items()
+                              if group is None or file_group == group)
+        for entry in entries:
+            digest.update('\x1f'.join(entry).encode('utf-8'))
+            digest.update(b'\x1e')
+        return digest.hexdigest()
+
+
+_registry = DataVersionRegistry()
+
+
+def get_registry():
+    """Registry dùng chung cho cả process"""
+    return _registry
@@ -0,0 +1,82 @@
+import numpy as np
+
+'''
+GIẢM SỐ ĐIỂM CỦA CHUỖI THỜI GIAN TRƯỚC KHI GỬI CHO TRÌNH DUYỆT:
+- Largest-Triangle-Three-Buckets (LTTB): chia chuỗi thành n_out - 2 nhóm liên tiếp, mỗi nhóm giữ
+  điểm tạo tam giác lớn nhất với điểm đã chọn của nhóm trước và trung bình của nhóm sau,
+  giữ nguyên điểm đầu / cuối và các đỉnh, đáy của đường
+- Điểm NaN bị bỏ qua khi chọn (không vẽ được)
+- Chỉ cắt theo cửa sổ đang xem (visible_window) rồi mới giảm điểm, phóng to càng hẹp càng chi tiết
+'''
+
+MAX_POINTS = 500
+
+
+def lttb_indices(x, y, n_out=MAX_POINTS):
+    """
+    Vị trí các điểm được giữ lại theo LTTB (tăng dần)
+
+    Args:
+        x: Hoành độ tăng dần
+        y: Tung độ (có thể có NaN)
+        n_out: Số điểm tối đa giữ lại
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.flatnonzero(np.isfinite(y))
+    n = len(valid)
+    if n_out >= n or n_out < 3:
+        return valid
+    xv, yv = x[valid], y[valid]
+
+    # Biên các nhóm (không tính điểm đầu và cuối)
+    edges = (np.floor(np.arange(n_out - 1) * (n - 2) / (n_out - 2)) + 1).astype(np.int64)
+    edges[-1] = n - 1
+    # Trung bình của từng nhóm, dùng làm đỉnh thứ ba cho nhóm đứng trước
+    sums_x = np.add.reduceat(xv[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(yv[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, xv[-1])
+    avg_y = np.append(sums_y / counts, yv[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        area = np.abs((xv[a] - avg_x[i + 1]) * (yv[start:stop] - yv[a])
+                      - (xv[a] - xv[start:stop]) * (avg_y[i + 1] - yv[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return valid[selected]
+
+
+def visible_window(length, x_range=None):
+    """
+    (đầu, cuối) của các vị trí 0..length-1 nằm trong khoảng x_range đang xem, None = toàn bộ
+    """
+    if x_range is None:
+        return 0, length
+    start = max(0, int(np.floor(min(x_range))))
+    stop = min(length, int(np.ceil(max(x_range))) + 1)
+    if stop <= start:
+        return 0, length
+    return start, stop
+
+
+def parse_x_range(relayout_data):
+    """
+    Khoảng trục x từ relayoutData của dcc.Graph: (đầu, cuối), None khi về toàn cảnh,
+    hoặc False nếu sự kiện không liên quan đến trục x
+    """
+    if not relayout_data:
+        return False
+    if relayout_data.get('xaxis.autorange') or relayout_data.get('autosize'):
+        return None
+    if 'xaxis.range[0]' in relayout_data and 'xaxis.range[1]' in relayout_data:
+        return float(relayout_data['xaxis.range[0]']), float(relayout_data['xaxis.range[1]'])
+    if 'xaxis.range' in relayout_data:
+        start, stop = relayout_data['xaxis.range']
+        return float(start), float(stop)
+    return False
@@ -0,0 +1,195 @@
+import atexit
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from core.data.station_store import BASE_DIR
+from core.data.versions import get_registry
+
+'''
+CACHE LRU CHO FIGURE CỦA graph.update_chart:
+- Khóa: (trạm, loại biểu đồ, tham số) + dấu vân tay nội dung các nhóm dữ liệu mà biểu đồ dùng
+  (registry.fingerprint, mặc định chỉ dữ liệu trạm), dấu vân tay không đổi giữa các lần khởi động lại
+  nên cache trên đĩa dùng lại được
+- Khóa còn gồm phiên bản code (CACHE_VERSION + hash mã nguồn các module dựng figure, code_version):
+  sửa hàm vẽ thì figure cũ trên đĩa không còn được dùng
+- Giá trị: JSON của figure (chuỗi), trả về dạng dict cho dcc.Graph, không dựng lại go.Figure
+- Giới hạn theo số figure và tổng số byte, bỏ figure ít dùng gần đây nhất khi vượt
+- Đếm số lần hit / miss
+- Lưu xuống đĩa (Data_cache/figures.jsonl) khi thoát process hoặc khi gọi save(),
+  mỗi figure hai dòng: dòng khóa và dòng JSON gốc của figure (không encode lại)
+- Figure lỗi (tiêu đề bắt đầu bằng 'Lỗi') không được cache
+'''
+
+CACHE_PATH = os.path.join(BASE_DIR, 'Data_cache', 'figures.jsonl')
+MAX_ENTRIES = 512
+MAX_BYTES = 256 * 1024 * 1024
+DATA_GROUPS = ('stations',)
+# Tăng khi đổi định dạng figure / khóa mà mã nguồn các module bên dưới không đổi
+CACHE_VERSION = 1
+# Các thư mục chứa code dựng figure (hàm vẽ và dữ liệu tổng hợp mà chúng dùng)
+SOURCE_DIRS = ('graphs', 'data', 'components')
+CORE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_code_version = None
+
+
+def code_version():
+    """CACHE_VERSION kèm hash mã nguồn các module trong SOURCE_DIRS (tính một lần mỗi process)"""
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.blake2b(digest_size=8)
+        for directory in SOURCE_DIRS:
+            folder = os.path.join(CORE_DIR, directory)
+            for name in sorted(os.listdir(folder)):
+                if name.endswith('.py'):
+                    digest.update(name.encode('utf-8'))
+                    with open(os.path.join(folder, name), 'rb') as f:
+                        digest.update(f.read())
+        _code_version = 'v{}.{}'.format(CACHE_VERSION, digest.hexdigest())
+    return _code_version
+
+
+def _is_error_figure(figure):
+    """Figure lỗi của các hàm vẽ có tiêu đề 'Lỗi khi ...'"""
+    title = figure.get('layout', {}).get('title', {})
+    text = title.get('text', '') if isinstance(title, dict) else str(title)
+    return text.startswith('Lỗi')
+
+
+class FigureCache:
+    """
+    Cache LRU các figure đã serialize, khóa là tuple các chuỗi
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # (khóa, dấu vân tay) -> JSON
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _put(self, full_key, figure_json):
+        old = self.entries.pop(full_key, None)
+        if old is not None:
+            self.bytes -= len(old)
+        self.entries[full_key] = figure_json
+        self.bytes += len(figure_json)
+        while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes -= len(evicted)
+
+    def get_or_build(self, key, build, groups=DATA_GROUPS):
+        """
+        Figure (dict) của khóa, build() chỉ được gọi khi chưa có trong cache
+
+        Args:
+            key: Tuple các chuỗi mô tả biểu đồ, ví dụ ('TPHCM', 'annual', '')
+            build: Hàm không tham số trả về go.Figure
+            groups: Các nhóm dữ liệu của registry mà biểu đồ phụ thuộc (các store tương ứng
+                    phải được tạo trước để file đã được đăng ký, ví dụ load_regions() cho 'regions')
+        """
+        from core.data.station_store import get_station_store
+
+        # Lấy store trước để các file dữ liệu đã được đăng ký khi tính dấu vân tay
+        get_station_store()
+        registry = get_registry()
+        full_key = (key, '-'.join([code_version()] + [registry.fingerprint(group) for group in groups]))
+        with self._lock:
+            figure_json = self.entries.get(full_key)
+            if figure_json is not None:
+                self.entries.move_to_end(full_key)
+                self.hits += 1
+        if figure_json is not None:
+            print(f"DEBUG: Figure cache hit: {key}")
+            return json.loads(figure_json)
+
+        figure_json = build().to_json()
+        figure = json.loads(figure_json)
+        with self._lock:
+            self.misses += 1
+            if not _is_error_figure(figure):
+                self._put(full_key, figure_json)
+                self._dirty = True
+        return figure
+
+    def stats(self):
+        """Số lần hit / miss, số figure và tổng số byte đang giữ"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.bytes = 0
+            self._dirty = True
+
+    def save(self):
+        """Ghi cache xuống đĩa (ghi file tạm rồi đổi tên), theo thứ tự cũ -> mới"""
+        with self._lock:
+            if not self._dirty:
+                return
+            items = list(self.entries.items())
+            self._dirty = False
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for (key, fingerprint), figure_json in items:
+                f.write(json.dumps({'key': list(key), 'fingerprint': fingerprint}, ensure_ascii=False))
+                f.write('\n')
+                f.write(figure_json)
+                f.write('\n')
+        os.replace(tmp_path, self.path)
+        print(f"DEBUG: Saved {len(items)} figures to {self.path}")
+
+    def load(self):
+        """Đọc cache từ đĩa, figure của dữ liệu cũ vẫn được đọc nhưng sẽ không bao giờ trùng khóa"""
+        if not os.path.exists(self.path):
+            return 0
+        loaded = 0
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                while True:
+                    header = f.readline()
+                    figure_json = f.readline().rstrip('\n')
+                    if not header or not figure_json:
+                        break
+                    meta = json.loads(header)
+                    key = tuple(meta['key'])
+                    with self._lock:
+                        self._put((key, meta['fingerprint']), figure_json)
+                    loaded += 1
+        except (OSError, ValueError) as e:
+            print(f"ERROR in FigureCache.load: {str(e)}")
+        print(f"DEBUG: Loaded {loaded} figures from {self.path}")
+        return loaded
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_figure_cache():
+    """Cache dùng chung cho cả process, đọc từ đĩa lần đầu và ghi lại khi thoát"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                cache = FigureCache()
+                cache.load()
+                atexit.register(cache.save)
+                _cache = cache
+    return _cache
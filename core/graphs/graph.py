@@ -7,6 +7,22 @@ import pandas as pd
 import numpy as np
 import geopandas as gpd
 import json
+import re
+
+from core.data.station_store import STATION_ORDER, get_station_store
+from core.data.climatology import day_bins, get_climatology
+from core.data.heatwaves import DEFAULT_MIN_LENGTH, episodes_per_year, get_episodes
+from core.data.interpolation import station_means
+from core.data.regions import STATION_REGIONS, ZOOM_LEVELS, level_for_scale, load_regions, region_geojson
+from core.graphs.figure_cache import get_figure_cache
+from core.data.trends import DECADE, get_trend_table, trend_label
+
+
+def trend_summary(trend, feature):
+    """Một dòng mô tả xu hướng: độ dốc OLS / Sen theo thập kỷ và p-value Mann-Kendall"""
+    return (f"{feature}: OLS {trend['ols_slope'] * DECADE:+.2f} °C/thập kỷ, "
+            f"Sen {trend['sen_slope'] * DECADE:+.2f} °C/thập kỷ, "
+            f"MK p = {trend['p_value']:.3f} ({trend_label(trend)})")
 
 
 def create_annual_trend_chart(feature, station_df, station_name, feature_name, unit):
@@ -14,11 +30,11 @@ def create_annual_trend_chart(feature, station_df, station_name, feature_name, u
     Tạo biểu đồ xu hướng hàng năm cho Dash
     """
     try:
-        df = station_df[station_name]
-
-        mean_at = df.groupby('YEAR')[feature].mean()
-        mean_at_max = df.groupby('YEAR')['AT max'].mean()
-        years = np.arange(1992, 2025)
+        # Trung bình theo năm cắt từ khối tổng hợp của StationStore (không groupby lại)
+        cube = get_station_store().cube()
+        mean_at = cube.yearly(station_name, feature)
+        mean_at_max = cube.yearly(station_name, 'AT max')
+        years = mean_at.index.to_numpy()
 
         fig = go.Figure()
 
@@ -43,11 +59,13 @@ def create_annual_trend_chart(feature, station_df, station_name, feature_name, u
             marker=dict(symbol='triangle-up', size=8)
         ))
 
-        # Tính toán và thêm đường xu hướng cho feature chính
-        z = np.polyfit(years, mean_at, 1)
-        p = np.poly1d(z)
-        trend_line = p(years)
-        trend_value = f"{z[0] * 10:+.2f}"
+        # Hệ số xu hướng của mọi trạm được tính sẵn một lần (OLS, Sen, Mann-Kendall)
+        trends = get_trend_table()
+        trend = trends.loc[(station_name, feature)]
+        trend_max = trends.loc[(station_name, 'AT max')]
+
+        # Đường xu hướng cho feature chính
+        trend_line = trend['ols_intercept'] + trend['ols_slope'] * years
 
         # Xu hướng tuyến tính
         fig.add_trace(go.Scatter(
@@ -58,10 +76,8 @@ def create_annual_trend_chart(feature, station_df, station_name, feature_name, u
             line=dict(color='#9d4edd', width=2.5, dash='solid')
         ))
 
-        # Tính toán và thêm đường xu hướng cho AT max
-        z_2 = np.polyfit(years, mean_at_max, 1)
-        p_2 = np.poly1d(z_2)
-        trend_line_2 = p_2(years)
+        # Đường xu hướng cho AT max
+        trend_line_2 = trend_max['ols_intercept'] + trend_max['ols_slope'] * years
 
         fig.add_trace(go.Scatter(
             x=years,
@@ -79,7 +95,7 @@ def create_annual_trend_chart(feature, station_df, station_name, feature_name, u
             line_dash="dash",
             line_color="#cccccc",
             line_width=1.5,
-            annotation_text=f'Trung bình nhiệt độ cảm nhận 1992-2024',
+            annotation_text=f'Trung bình nhiệt độ cảm nhận {years[0]}-{years[-1]}',
             annotation_position="top left"
         )
 
@@ -91,6 +107,17 @@ def create_annual_trend_chart(feature, station_df, station_name, feature_name, u
             line_width=1.5
         )
 
+        # Ghi chú hệ số xu hướng (°C/thập kỷ) và kiểm định Mann-Kendall
+        fig.add_annotation(
+            text=f"{trend_summary(trend, feature)}<br>{trend_summary(trend_max, 'AT max')}",
+            xref='paper', yref='paper',
+            x=1.0, y=1.02,
+            xanchor='right', yanchor='bottom',
+            align='right',
+            showarrow=False,
+            font=dict(family='Times New Roman', size=11, color='#161b33')
+        )
+
         # Cập nhật layout
         fig.update_layout(
             title={
@@ -103,7 +130,7 @@ def create_annual_trend_chart(feature, station_df, station_name, feature_name, u
                 title='Năm',
                 tickfont=dict(family='Times New Roman', size=12),
                 tickmode='array',
-                tickvals=list(range(1992, 2025, 2)) + [2024],
+                tickvals=sorted({int(y) for y in years[::2]} | {int(years[-1])}),
                 tickangle=45,
                 showgrid=True,
                 gridcolor='lightgray',
@@ -153,39 +180,94 @@ def create_annual_trend_chart(feature, station_df, station_name, feature_name, u
         return fig
 
 
-def create_monthly_heatmap(station_name, station_df, feature):
+def create_trend_table(station_name, features=('AT mean', 'AT max')):
     """
-    Tạo biểu đồ heatmap cho xu hướng theo tháng
+    Bảng xu hướng theo năm của tất cả các trạm (°C/thập kỷ), trạm đang chọn được tô màu
     """
     try:
-        print(f"DEBUG: Creating heatmap for station: {station_name}, feature: {feature}")
+        trends = get_trend_table()
+        rows = [(station, feature) for station in STATION_ORDER for feature in features
+                if (station, feature) in trends.index]
+        table = trends.loc[rows]
+        fill = ['#dbe7f0' if station == station_name else 'white' for station, _ in rows]
 
-        df = station_df[station_name].copy()
+        fig = go.Figure(data=go.Table(
+            header=dict(
+                values=['Trạm', 'Đặc trưng', 'OLS (°C/thập kỷ)', 'Sen (°C/thập kỷ)',
+                        'Mann-Kendall Z', 'p-value', 'Xu hướng', 'Giai đoạn'],
+                fill_color='#5D7F99',
+                font=dict(family='Times New Roman', size=12, color='white'),
+                align='center'
+            ),
+            cells=dict(
+                values=[
+                    [station for station, _ in rows],
+                    [feature for _, feature in rows],
+                    [f'{v * DECADE:+.2f}' for v in table['ols_slope']],
+                    [f'{v * DECADE:+.2f}' for v in table['sen_slope']],
+                    [f'{v:.2f}' for v in table['mk_z']],
+                    [f'{v:.3f}' for v in table['p_value']],
+                    [trend_label(row) for _, row in table.iterrows()],
+                    [f"{int(a)} - {int(b)}" for a, b in zip(table['first_year'], table['last_year'])],
+                ],
+                fill_color=[fill],
+                font=dict(family='Times New Roman', size=12),
+                align='center'
+            )
+        ))
+        fig.update_layout(
+            title={
+                'text': 'XU HƯỚNG THEO NĂM CỦA NHIỆT ĐỘ CẢM NHẬN TẠI CÁC TRẠM KHÍ TƯỢNG',
+                'x': 0.5,
+                'xanchor': 'center',
+                'font': {'family': 'Times New Roman', 'size': 14, 'color': '#161b33'}
+            },
+            margin=dict(l=40, r=40, t=80, b=20),
+            height=600
+        )
+        return fig
+    except Exception as e:
+        print(f"ERROR in create_trend_table: {str(e)}")
+        fig = go.Figure()
+        fig.update_layout(title="Lỗi khi tạo bảng xu hướng")
+        return fig
 
-        conditions = [
-            (df['YEAR'] >= 1992) & (df['YEAR'] <= 2002),
-            (df['YEAR'] >= 2003) & (df['YEAR'] <= 2013),
-            (df['YEAR'] >= 2014) & (df['YEAR'] <= 2018),
-            (df['YEAR'] >= 2019) & (df['YEAR'] <= 2024),
-        ]
-        choices = ['1992 - 2002', '2003 - 2013', '2014 - 2018', '2019 - 2024']
-        df['period'] = np.select(conditions, choices, default='Other')
 
-        # Tính giá trị trung bình cho từng giai đoạn
-        mean_at = df.groupby(['period', 'MONTH'])[feature].mean().unstack('MONTH')
+# Năm bắt đầu các giai đoạn mặc định của heatmap theo tháng:
+# 1992 - 2002, 2003 - 2013, 2014 - 2018, 2019 - 2024
+HEATMAP_BREAKPOINTS = [1992, 2003, 2014, 2019]
+
+
+def parse_breakpoints(text, default=HEATMAP_BREAKPOINTS):
+    """
+    Đọc các mốc năm người dùng nhập (ví dụ "1992, 2003, 2014, 2019"),
+    trả về danh sách mặc định nếu không đọc được năm nào
+    """
+    if not text:
+        return list(default)
+    years = sorted({int(token) for token in re.findall(r'\d{4}', str(text)) if 1800 <= int(token) <= 2200})
+    return years or list(default)
+
 
-        # Tính giá trị cho giai đoạn tổng
-        total_df = df[(df['YEAR'] >= 1992) & (df['YEAR'] <= 2024)]
-        mean_total = total_df.groupby('MONTH')[feature].mean()
+def create_monthly_heatmap(station_name, station_df, feature, breakpoints=None):
+    """
+    Tạo biểu đồ heatmap cho xu hướng theo tháng
 
-        # Thêm giai đoạn tổng vào kết quả
-        mean_at.loc['1992 - 2024'] = mean_total
-        choices.append('1992 - 2024')
-        mean_at = mean_at.reindex(choices)
+    Args:
+        breakpoints: Các năm bắt đầu giai đoạn (None = HEATMAP_BREAKPOINTS)
+    """
+    try:
+        print(f"DEBUG: Creating heatmap for station: {station_name}, feature: {feature}")
+        breakpoints = list(breakpoints or HEATMAP_BREAKPOINTS)
 
-        # Đổi thứ tự các hàng để '1992 - 2024' lên đầu
-        choices = ['1992 - 2024'] + choices[:-1]
-        mean_at = mean_at.reindex(choices)
+        # Trung bình giai đoạn x tháng gộp từ khối tổng hợp bằng searchsorted + bincount,
+        # giai đoạn tổng (từ mốc đầu đến hết dữ liệu) ở hàng đầu, các giai đoạn con bên dưới
+        cube = get_station_store().cube()
+        total = cube.bucket_month(station_name, feature, breakpoints[:1])
+        mean_at = cube.bucket_month(station_name, feature, breakpoints)
+        if len(breakpoints) > 1:
+            mean_at = pd.concat([total, mean_at])
+        choices = list(mean_at.index)
 
         mean_at_values = mean_at.values
 
@@ -231,7 +313,7 @@ def create_monthly_heatmap(station_name, station_df, feature):
             plot_bgcolor='white',
             paper_bgcolor='white',
             margin=dict(l=100, r=100, t=120, b=80),
-            height=400
+            height=max(400, 200 + 40 * len(choices))
         )
 
         print(f"DEBUG: Heatmap created successfully for {station_name}")
@@ -251,26 +333,30 @@ def create_monthly_heatmap(station_name, station_df, feature):
         )
         return fig
 
-def get_corr(station_df, feature):
-    data = {
-        'Nội Bài': list(station_df['Nội Bài'][feature]),
-        'Lạng Sơn': list(station_df['Lạng Sơn'][feature]),
-        'Lào Cai': list(station_df['Lào Cai'][feature]),
-        'Vinh': list(station_df['Vinh'][feature]),
-        'Phú Bài': list(station_df['Phú Bài'][feature]),
-        'Quy Nhơn': list(station_df['Quy Nhơn'][feature]),
-        'TPHCM': list(station_df['TPHCM'][feature]),
-        'Cà Mau': list(station_df['Cà Mau'][feature]),
-    }
-    data = pd.DataFrame(data)
-    corr = data.corr(method='pearson')
+def get_corr(station_df, feature, window=None):
+    # Tương quan đọc từ các tổng theo cặp trạm của StationStore (cộng dồn khi có ngày mới);
+    # window = (ngày đầu, ngày cuối) thì lấy hiệu hai dòng tổng tích lũy theo ngày
+    if window is None:
+        corr = get_station_store().pair_sums().corr_frame(feature)
+    else:
+        start, stop = window
+        corr = get_station_store().pair_prefix().window_frame(feature, start, stop)
+    stations = [station for station in corr.index if station in station_df]
+    corr = corr.loc[stations, stations]
 
     return round(corr, 2)
 
 
-def create_corr_heatmap(station_df, feature, feature_name):
+def create_corr_heatmap(station_df, feature, feature_name, window=None):
+    """
+    Heatmap tương quan giữa các trạm
+
+    Args:
+        window: (ngày đầu, ngày cuối) để chỉ tính tương quan trong khoảng ngày đó,
+                None = toàn bộ chuỗi
+    """
     try:
-        corr_feature = get_corr(station_df, feature)
+        corr_feature = get_corr(station_df, feature, window)
 
         # Định nghĩa thứ tự hiển thị từ Bắc xuống Nam
         station_order = [
@@ -298,9 +384,14 @@ def create_corr_heatmap(station_df, feature, feature_name):
             zmax=1
         ))
 
+        title_text = 'Ma trận tương quan <br>Các trạm khí tượng (Bắc - Nam)'
+        if window is not None:
+            start, stop = (pd.Timestamp(d).strftime('%d/%m/%Y') if d is not None else '...' for d in window)
+            title_text += f'<br>Giai đoạn {start} - {stop}'
+
         fig.update_layout(
             title={
-                'text': f'Ma trận tương quan <br>Các trạm khí tượng (Bắc - Nam)',
+                'text': title_text,
                 'x': 0.5,
                 'xanchor': 'center',
                 'font': {'family': 'Times New Roman', 'size': 14, 'color': '#161b33'}
@@ -329,6 +420,408 @@ def create_corr_heatmap(station_df, feature, feature_name):
         return fig
 
 
+def create_anomaly_chart(station_name, features=('AT mean', 'AT max'), smooth_days=365):
+    """
+    Chuẩn sai ngày so với khí hậu nền (trung bình nhiều năm theo ngày trong năm),
+    kèm đường trung bình trượt smooth_days ngày
+    """
+    try:
+        clim, panel = get_climatology()
+        anomalies = clim.anomalies(panel)
+        s = panel.station_index(station_name)
+        dates = pd.DatetimeIndex(panel.dates)
+        colors = {'AT mean': '#5D7F99', 'AT max': '#c0392b'}
+
+        fig = go.Figure()
+        for feature in features:
+            series = anomalies[s, :, panel.feature_index(feature)]
+            fig.add_trace(go.Scattergl(
+                x=dates,
+                y=series,
+                mode='lines',
+                name=f'Chuẩn sai {feature}',
+                line=dict(color=colors.get(feature), width=0.6),
+                opacity=0.35
+            ))
+            # Trung bình trượt từ tổng tích lũy (bỏ qua ngày thiếu dữ liệu)
+            valid = ~np.isnan(series)
+            csum = np.concatenate([[0.0], np.cumsum(np.where(valid, series, 0.0))])
+            ccount = np.concatenate([[0], np.cumsum(valid)])
+            with np.errstate(invalid='ignore', divide='ignore'):
+                rolling = (csum[smooth_days:] - csum[:-smooth_days]) / (ccount[smooth_days:] - ccount[:-smooth_days])
+            fig.add_trace(go.Scattergl(
+                x=dates[smooth_days - 1:],
+                y=rolling,
+                mode='lines',
+                name=f'{feature} (trung bình trượt {smooth_days} ngày)',
+                line=dict(color=colors.get(feature), width=2.5)
+            ))
+
+        fig.add_hline(y=0, line_dash='dash', line_color='#999999', line_width=1)
+        fig.update_layout(
+            title={
+                'text': f'CHUẨN SAI NHIỆT ĐỘ CẢM NHẬN SO VỚI TRUNG BÌNH NHIỀU NĂM<br>TẠI TRẠM KHÍ TƯỢNG {station_name.upper()}',
+                'x': 0.5,
+                'xanchor': 'center',
+                'font': {'family': 'Times New Roman', 'size': 14, 'color': '#161b33'}
+            },
+            xaxis=dict(title='Ngày', tickfont=dict(family='Times New Roman', size=12),
+                       showgrid=True, gridcolor='lightgray', gridwidth=0.5),
+            yaxis=dict(title='Chuẩn sai (°C)', tickfont=dict(family='Times New Roman', size=12),
+                       showgrid=True, gridcolor='lightgray', gridwidth=0.5),
+            legend=dict(orientation="h", yanchor="top", y=-0.2, xanchor="center", x=0.5,
+                        font=dict(family='Times New Roman', size=11)),
+            plot_bgcolor='white',
+            paper_bgcolor='white',
+            margin=dict(l=60, r=40, t=100, b=120),
+            height=450
+        )
+        return fig
+    except Exception as e:
+        print(f"ERROR in create_anomaly_chart: {str(e)}")
+        fig = go.Figure()
+        fig.update_layout(title="Lỗi khi tạo biểu đồ chuẩn sai")
+        return fig
+
+
+def create_climatology_chart(station_name, feature='AT max'):
+    """
+    Trung bình nhiều năm theo ngày trong năm và bao phân vị 10 - 90 của một trạm,
+    kèm giá trị của năm gần nhất
+    """
+    try:
+        clim, panel = get_climatology()
+        frame = clim.station_frame(station_name, feature)
+        # Trục x dùng một năm nhuận để 366 ô hiển thị theo ngày / tháng
+        axis_dates = pd.date_range('2000-01-01', periods=len(frame), freq='D')
+        low, high = frame.columns[1], frame.columns[-1]
+
+        s = panel.station_index(station_name)
+        values = panel.feature_values(feature)[s]
+        dates = pd.DatetimeIndex(panel.dates)
+        last_year = int(dates[~np.isnan(values)][-1].year)
+        in_year = dates.year == last_year
+        year_x = axis_dates[day_bins(dates[in_year])]
+
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=axis_dates, y=frame[high], mode='lines', line=dict(width=0),
+            name=f'Phân vị {high[1:]}', showlegend=False, hoverinfo='skip'
+        ))
+        fig.add_trace(go.Scatter(
+            x=axis_dates, y=frame[low], mode='lines', line=dict(width=0),
+            fill='tonexty', fillcolor='rgba(93, 127, 153, 0.25)',
+            name=f'Phân vị {low[1:]} - {high[1:]}'
+        ))
+        fig.add_trace(go.Scatter(
+            x=axis_dates, y=frame['mean'], mode='lines',
+            line=dict(color='#5D7F99', width=2.5),
+            name='Trung bình nhiều năm'
+        ))
+        fig.add_trace(go.Scatter(
+            x=year_x, y=values[in_year], mode='lines',
+            line=dict(color='#c0392b', width=1.2),
+            name=f'Năm {last_year}'
+        ))
+
+        fig.update_layout(
+            title={
+                'text': f'KHÍ HẬU NỀN THEO NGÀY TRONG NĂM CỦA {feature.upper()}<br>TẠI TRẠM KHÍ TƯỢNG {station_name.upper()}',
+                'x': 0.5,
+                'xanchor': 'center',
+                'font': {'family': 'Times New Roman', 'size': 14, 'color': '#161b33'}
+            },
+            xaxis=dict(title='Ngày trong năm', tickformat='%d/%m', dtick='M1',
+                       tickfont=dict(family='Times New Roman', size=12),
+                       showgrid=True, gridcolor='lightgray', gridwidth=0.5),
+            yaxis=dict(title='Nhiệt độ cảm nhận (°C)', tickfont=dict(family='Times New Roman', size=12),
+                       showgrid=True, gridcolor='lightgray', gridwidth=0.5),
+            legend=dict(orientation="h", yanchor="top", y=-0.2, xanchor="center", x=0.5,
+                        font=dict(family='Times New Roman', size=11)),
+            plot_bgcolor='white',
+            paper_bgcolor='white',
+            margin=dict(l=60, r=40, t=100, b=120),
+            height=450
+        )
+        return fig
+    except Exception as e:
+        print(f"ERROR in create_climatology_chart: {str(e)}")
+        fig = go.Figure()
+        fig.update_layout(title="Lỗi khi tạo biểu đồ khí hậu nền")
+        return fig
+
+
+# Các lựa chọn ngưỡng đợt nóng: 'p95' = phân vị 95 của từng trạm, '38' = 38 °C
+HEATWAVE_THRESHOLDS = {
+    'p90': 'Phân vị 90 của trạm',
+    'p95': 'Phân vị 95 của trạm',
+    'p99': 'Phân vị 99 của trạm',
+    '35': '35 °C',
+    '38': '38 °C',
+    '40': '40 °C',
+}
+DEFAULT_HEATWAVE_THRESHOLD = 'p95'
+
+
+def parse_heatwave_threshold(value):
+    """'p95' -> (None, 95.0), '38' -> (38.0, None): (ngưỡng tuyệt đối, phân vị)"""
+    value = str(value or DEFAULT_HEATWAVE_THRESHOLD).strip()
+    if value.startswith('p'):
+        return None, float(value[1:])
+    return float(value), None
+
+
+def create_heatwave_chart(station_name, threshold=DEFAULT_HEATWAVE_THRESHOLD, min_length=DEFAULT_MIN_LENGTH):
+    """
+    Heatmap số đợt nóng (AT max vượt ngưỡng từ min_length ngày liên tiếp) theo năm của từng trạm,
+    hàng của trạm đang chọn được đóng khung
+    """
+    try:
+        absolute, percentile = parse_heatwave_threshold(threshold)
+        min_length = max(1, int(min_length or DEFAULT_MIN_LENGTH))
+        episodes = get_episodes('AT max', absolute, percentile, min_length)
+        cube = get_station_store().cube()
+        counts = episodes_per_year(episodes, cube.stations, cube.years)
+
+        fig = go.Figure(data=go.Heatmap(
+            z=counts.values,
+            x=counts.columns,
+            y=counts.index,
+            colorscale='YlOrRd',
+            showscale=True,
+            colorbar=dict(title='Số đợt'),
+            hovertemplate='%{y} - %{x}: %{z} đợt<extra></extra>'
+        ))
+        if station_name in counts.index:
+            row = list(counts.index).index(station_name)
+            fig.add_shape(
+                type='rect', xref='paper', yref='y',
+                x0=0, x1=1, y0=row - 0.5, y1=row + 0.5,
+                line=dict(color='#161b33', width=2)
+            )
+
+        label = HEATWAVE_THRESHOLDS.get(str(threshold), str(threshold))
+        fig.update_layout(
+            title={
+                'text': f'SỐ ĐỢT NÓNG THEO NĂM (AT MAX > {label.upper()}, TỪ {min_length} NGÀY LIÊN TIẾP)'
+                        f'<br>Tổng số đợt của trạm {station_name}: {int(counts.loc[station_name].sum()) if station_name in counts.index else 0}',
+                'x': 0.5,
+                'xanchor': 'center',
+                'font': {'family': 'Times New Roman', 'size': 14, 'color': '#161b33'}
+            },
+            xaxis=dict(
+                title='Năm',
+                tickfont=dict(family='Times New Roman', size=12),
+                tickangle=45
+            ),
+            yaxis=dict(
+                title='Trạm khí tượng',
+                tickfont=dict(family='Times New Roman', size=12),
+                autorange='reversed'
+            ),
+            plot_bgcolor='white',
+            paper_bgcolor='white',
+            margin=dict(l=100, r=60, t=100, b=80),
+            height=450
+        )
+        return fig
+    except Exception as e:
+        print(f"ERROR in create_heatwave_chart: {str(e)}")
+        fig = go.Figure()
+        fig.update_layout(title="Lỗi khi tạo biểu đồ đợt nóng")
+        return fig
+
+
+# Kết quả tương quan cửa sổ trượt gần nhất: (cửa sổ, phiên bản dữ liệu, số ngày) -> (ngày, mảng)
+_rolling_cache = {}
+
+
+def get_rolling_corr(window=365):
+    """
+    Tương quan cửa sổ trượt của mọi cặp trạm cho cả AT mean và AT max,
+    tính một lần từ tổng tích lũy theo ngày (không rolling().corr() theo từng cặp)
+
+    Returns:
+        tuple: (PairPrefixSums, ngày cuối mỗi cửa sổ, mảng (cửa sổ, features, stations, stations))
+    """
+    from core.data.versions import get_registry
+
+    prefix = get_station_store().pair_prefix()
+    key = (window, get_registry().data_version(), id(prefix), prefix.length)
+    cached = _rolling_cache.get(key)
+    if cached is None:
+        dates, corr = prefix.rolling_corr(window)
+        _rolling_cache.clear()
+        _rolling_cache[key] = cached = (dates, corr)
+    return (prefix,) + cached
+
+
+def create_rolling_corr_chart(station_name, feature, feature_name, window=365):
+    """
+    Biểu đồ tương quan cửa sổ trượt giữa các cặp trạm theo thời gian,
+    các cặp có trạm đang chọn được tô đậm, các cặp còn lại để mờ
+    """
+    try:
+        prefix, dates, corr = get_rolling_corr(window)
+        f = prefix.features.index(feature)
+        stations = prefix.stations
+        x = pd.DatetimeIndex(dates)
+
+        fig = go.Figure()
+        highlighted = []
+        for i in range(len(stations)):
+            for j in range(i + 1, len(stations)):
+                selected = station_name in (stations[i], stations[j])
+                trace = go.Scattergl(
+                    x=x,
+                    y=corr[:, f, i, j],
+                    mode='lines',
+                    name=f'{stations[i]} - {stations[j]}',
+                    line=dict(width=1.8 if selected else 0.8, color=None if selected else '#cccccc'),
+                    opacity=1.0 if selected else 0.6,
+                    showlegend=selected,
+                    hovertemplate='%{x|%d/%m/%Y}: %{y:.2f}<extra>' + f'{stations[i]} - {stations[j]}' + '</extra>'
+                )
+                # Vẽ các cặp được chọn sau cùng để nằm trên các đường mờ
+                if selected:
+                    highlighted.append(trace)
+                else:
+                    fig.add_trace(trace)
+        for trace in highlighted:
+            fig.add_trace(trace)
+
+        fig.update_layout(
+            title={
+                'text': f'TƯƠNG QUAN CỬA SỔ TRƯỢT {window} NGÀY CỦA {feature_name[feature].upper()}'
+                        f'<br>GIỮA TRẠM {station_name.upper()} VÀ CÁC TRẠM KHÁC',
+                'x': 0.5,
+                'xanchor': 'center',
+                'font': {'family': 'Times New Roman', 'size': 14, 'color': '#161b33'}
+            },
+            xaxis=dict(
+                title='Ngày cuối cửa sổ',
+                tickfont=dict(family='Times New Roman', size=12),
+                showgrid=True,
+                gridcolor='lightgray',
+                gridwidth=0.5
+            ),
+            yaxis=dict(
+                title='Hệ số tương quan',
+                tickfont=dict(family='Times New Roman', size=12),
+                range=[-1, 1],
+                showgrid=True,
+                gridcolor='lightgray',
+                gridwidth=0.5
+            ),
+            legend=dict(
+                orientation="h",
+                yanchor="top",
+                y=-0.2,
+                xanchor="center",
+                x=0.5,
+                font=dict(family='Times New Roman', size=11)
+            ),
+            plot_bgcolor='white',
+            paper_bgcolor='white',
+            margin=dict(l=60, r=40, t=100, b=120),
+            height=450
+        )
+        return fig
+    except Exception as e:
+        print(f"ERROR in create_rolling_corr_chart: {str(e)}")
+        fig = go.Figure()
+        fig.update_layout(title="Lỗi khi tạo biểu đồ tương quan cửa sổ trượt")
+        return fig
+
+
+# Tỉ lệ phóng đại diện cho từng mức chi tiết của bản đồ vùng
+ZOOM_SCALES = {level: min_scale for min_scale, level in ZOOM_LEVELS}
+
+
+def region_map_available():
+    """Có dữ liệu vùng (Data_geo/vietnam_regions.npz hoặc shapefile GADM) để vẽ bản đồ tương tác không"""
+    return load_regions() is not None
+
+
+def create_region_choropleth(station_name, feature, feature_name, unit, geo_scale=None):
+    """
+    Bản đồ 8 vùng tô màu theo trung bình đặc trưng của các trạm trong vùng.
+    GeoJSON lấy từ cache đã đơn giản hóa, mức chi tiết chọn theo tỉ lệ phóng geo_scale.
+    """
+    try:
+        level = level_for_scale(geo_scale)
+        geojson = region_geojson(level)
+        if geojson is None:
+            raise ValueError("Không có dữ liệu vùng")
+
+        stations, lon, lat, values = station_means(feature)
+        station_values = pd.Series(values, index=stations)
+        region_values = station_values.groupby(station_values.index.map(STATION_REGIONS)).mean()
+        regions = [f['id'] for f in geojson['features']]
+
+        with_data = [r for r in regions if r in region_values.index]
+        no_data = [f for f in geojson['features'] if f['id'] not in region_values.index]
+
+        fig = go.Figure()
+        # Vùng không có trạm tô xám, GeoJSON riêng chỉ gồm các vùng này để không gửi lặp lại cả bản đồ
+        if no_data:
+            fig.add_trace(go.Choropleth(
+                geojson={'type': 'FeatureCollection', 'features': no_data},
+                locations=[f['id'] for f in no_data],
+                z=[0] * len(no_data),
+                colorscale=[[0, 'lightgrey'], [1, 'lightgrey']],
+                showscale=False,
+                marker_line_color='white',
+                marker_line_width=0.5,
+                hovertemplate='%{location}: không có trạm<extra></extra>'
+            ))
+        fig.add_trace(go.Choropleth(
+            geojson=geojson,
+            locations=with_data,
+            z=[region_values[r] for r in with_data],
+            colorscale='Reds' if feature == 'RH' else 'RdBu_r',
+            marker_line_color='white',
+            marker_line_width=0.5,
+            colorbar=dict(title=unit[feature], len=0.8, thickness=12),
+            hovertemplate='%{location}: %{z:.2f}' + unit[feature] + '<extra></extra>'
+        ))
+        fig.add_trace(go.Scattergeo(
+            lon=lon,
+            lat=lat,
+            text=[f'{name}: {value:.2f}{unit[feature]}' for name, value in zip(stations, values)],
+            mode='markers',
+            marker=dict(
+                size=[12 if name == station_name else 8 for name in stations],
+                color=['#161b33' if name == station_name else 'green' for name in stations],
+                line=dict(color='white', width=1)
+            ),
+            hoverinfo='text',
+            showlegend=False
+        ))
+
+        fig.update_geos(fitbounds='locations', visible=False)
+        fig.update_layout(
+            title={
+                'text': f'{feature_name[feature].upper()}<br>THEO VÙNG KHÍ HẬU',
+                'x': 0.5,
+                'xanchor': 'center',
+                'font': {'family': 'Times New Roman', 'size': 14, 'color': '#161b33'}
+            },
+            # Giữ nguyên vị trí phóng to khi đổi mức chi tiết
+            uirevision=feature,
+            meta={'level': level},
+            paper_bgcolor='white',
+            margin=dict(l=10, r=10, t=60, b=10),
+            height=600
+        )
+        return fig
+    except Exception as e:
+        print(f"ERROR in create_region_choropleth: {str(e)}")
+        fig = go.Figure()
+        fig.update_layout(title="Lỗi khi tạo bản đồ vùng")
+        return fig
+
+
 
 # Tạo Dash app
 # app = dash.Dash(__name__)
@@ -384,40 +877,50 @@ def create_corr_heatmap(station_df, feature, feature_name):
 #     [Input('station-dropdown', 'value'),
 #      Input('chart-type-radio', 'value')]
 # )
-def update_chart(selected_station, chart_type):
+def update_chart(selected_station, chart_type, window=None, breakpoints=None,
+                 heatwave_threshold=DEFAULT_HEATWAVE_THRESHOLD, heatwave_min_length=DEFAULT_MIN_LENGTH,
+                 geo_scale=None):
     """
-    Callback để cập nhật biểu đồ khi chọn trạm hoặc loại biểu đồ khác
+    Figure (dict) của một biểu đồ, lấy từ cache LRU (core/graphs/figure_cache.py) nếu đã build
+    với cùng trạm, loại biểu đồ, tham số và dữ liệu. Tham số giống build_chart.
     """
-    print(f"DEBUG: Selected station: {selected_station}, Chart type: {chart_type}")
-    print(f"Current working directory: {os.getcwd()}")
-    print(f"File location: {os.path.abspath(__file__)}")
+    groups = ('stations',)
+    if chart_type in ('geo_mean', 'geo_max'):
+        # Các tỉ lệ phóng cùng một mức chi tiết cho cùng một figure
+        geo_scale = ZOOM_SCALES[level_for_scale(geo_scale)]
+        # Đọc dữ liệu vùng trước để file vùng đã được đăng ký khi tính dấu vân tay
+        load_regions()
+        groups = ('stations', 'regions')
+    params = (
+        'window={}'.format(None if window is None else [str(pd.Timestamp(d)) if d is not None else None
+                                                        for d in window]),
+        'breakpoints={}'.format(None if breakpoints is None else [int(b) for b in breakpoints]),
+        'heatwave={}/{}'.format(heatwave_threshold, heatwave_min_length),
+        'geo_scale={}'.format(geo_scale),
+    )
+    key = (str(selected_station), str(chart_type), ';'.join(params))
+    return get_figure_cache().get_or_build(key, lambda: build_chart(
+        selected_station, chart_type, window, breakpoints, heatwave_threshold, heatwave_min_length, geo_scale),
+        groups=groups)
+
 
-    # Test đường dẫn
-    test_path = '../Data_AT_FilteredDate/CaMau_FilteredDate.csv'
-    print(f"Trying to access: {os.path.abspath(test_path)}")
-    print(f"File exists: {os.path.exists(test_path)}")
+def build_chart(selected_station, chart_type, window=None, breakpoints=None,
+                heatwave_threshold=DEFAULT_HEATWAVE_THRESHOLD, heatwave_min_length=DEFAULT_MIN_LENGTH,
+                geo_scale=None):
+    """
+    Dựng biểu đồ khi chọn trạm hoặc loại biểu đồ khác (không qua cache)
+
+    Args:
+        window: (ngày đầu, ngày cuối) cho heatmap tương quan, None = toàn bộ chuỗi
+        breakpoints: Các năm bắt đầu giai đoạn cho heatmap theo tháng, None = mặc định
+        heatwave_threshold: Ngưỡng đợt nóng (khóa của HEATWAVE_THRESHOLDS)
+        heatwave_min_length: Số ngày liên tiếp tối thiểu của một đợt nóng
+        geo_scale: Tỉ lệ phóng của bản đồ vùng (geo.projection.scale), None = toàn cảnh
+    """
+    print(f"DEBUG: Selected station: {selected_station}, Chart type: {chart_type}")
     try:
-        # Đọc dữ liệu từ các file CSV
-        df_CaMau = pd.read_csv('../Data_AT_FilteredDate/CaMau_FilteredDate.csv')
-        df_LangSon = pd.read_csv('../Data_AT_FilteredDate/LangSon_FilteredDate.csv')
-        df_LaoCai = pd.read_csv('../Data_AT_FilteredDate/LaoCai_FilteredDate.csv')
-        df_NoiBai = pd.read_csv('../Data_AT_FilteredDate/NoiBai_FilteredDate.csv')
-        df_PhuBai = pd.read_csv('../Data_AT_FilteredDate/PhuBai_FilteredDate.csv')
-        df_QuyNhon = pd.read_csv('../Data_AT_FilteredDate/QuyNhon_FilteredDate.csv')
-        df_TPHCM = pd.read_csv('../Data_AT_FilteredDate/TPHCM_FilteredDate.csv')
-        df_Vinh = pd.read_csv('../Data_AT_FilteredDate/Vinh_FilteredDate.csv')
-
-        # Tạo dictionary cho station_df
-        station_df = {
-            'Nội Bài': df_NoiBai,
-            'Lạng Sơn': df_LangSon,
-            'Lào Cai': df_LaoCai,
-            'Vinh': df_Vinh,
-            'Phú Bài': df_PhuBai,
-            'Quy Nhơn': df_QuyNhon,
-            'TPHCM': df_TPHCM,
-            'Cà Mau': df_CaMau,
-        }
+        # Lấy dữ liệu các trạm từ StationStore (đã đọc một lần khi khởi động)
+        station_df = get_station_store().as_dict()
 
         # Kiểm tra xem selected_station có trong dictionary không
         if selected_station not in station_df:
@@ -442,16 +945,29 @@ def update_chart(selected_station, chart_type):
         if chart_type == 'annual':
             fig = create_annual_trend_chart('AT mean', station_df, selected_station, feature_name, unit)
         elif chart_type == 'monthly_mean':
-            fig = create_monthly_heatmap(selected_station, station_df, 'AT mean')
+            fig = create_monthly_heatmap(selected_station, station_df, 'AT mean', breakpoints)
         elif chart_type == 'monthly_max':
-            fig = create_monthly_heatmap(selected_station, station_df, 'AT max')
+            fig = create_monthly_heatmap(selected_station, station_df, 'AT max', breakpoints)
         elif chart_type == 'corr_mean':
-            fig = create_corr_heatmap(station_df, 'AT mean', feature_name)
+            fig = create_corr_heatmap(station_df, 'AT mean', feature_name, window)
         elif chart_type == 'corr_max':
-            fig = create_corr_heatmap(station_df, 'AT max', feature_name)
-        # elif chart_type == 'lat_mean':
-        #     station_order = ['Nội Bài', 'Lạng Sơn', 'Lào Cai', 'Vinh', 'Phú Bài', 'Quy Nhơn', 'TPHCM', 'Cà Mau']
-        #     fig = create_vietnam_choropleth_with_local_geojson(station_df, station_info, station_order, 'AT mean', feature_name)
+            fig = create_corr_heatmap(station_df, 'AT max', feature_name, window)
+        elif chart_type == 'anomaly':
+            fig = create_anomaly_chart(selected_station)
+        elif chart_type == 'climatology':
+            fig = create_climatology_chart(selected_station)
+        elif chart_type == 'heatwave':
+            fig = create_heatwave_chart(selected_station, heatwave_threshold, heatwave_min_length)
+        elif chart_type == 'trend_table':
+            fig = create_trend_table(selected_station)
+        elif chart_type == 'rolling_corr_mean':
+            fig = create_rolling_corr_chart(selected_station, 'AT mean', feature_name)
+        elif chart_type == 'rolling_corr_max':
+            fig = create_rolling_corr_chart(selected_station, 'AT max', feature_name)
+        elif chart_type == 'geo_mean':
+            fig = create_region_choropleth(selected_station, 'AT mean', feature_name, unit, geo_scale)
+        elif chart_type == 'geo_max':
+            fig = create_region_choropleth(selected_station, 'AT max', feature_name, unit, geo_scale)
         else:
             # Default fallback
             fig = create_annual_trend_chart('AT mean', station_df, selected_station, feature_name, unit)
@@ -460,7 +976,7 @@ def update_chart(selected_station, chart_type):
         return fig
 
     except Exception as e:
-        print(f"ERROR in update_chart: {str(e)}")
+        print(f"ERROR in build_chart: {str(e)}")
         import traceback
         traceback.print_exc()
 
@@ -474,4 +990,51 @@ def update_chart(selected_station, chart_type):
         return fig
 
 # if __name__ == '__main__':
-#     app.run(debug=True)
\ No newline at end of file
+#     app.run(debug=True)
+
+
+def figure_patch(template, figure, path=()):
+    """
+    Các thay đổi [(đường dẫn, giá trị), ...] để biến figure dict template thành figure,
+    khóa bị bỏ được ghi là (đường dẫn,). Dict và danh sách dict cùng độ dài được so sánh
+    từng phần tử, các giá trị khác (mảng số, chuỗi, mảng base64 của Plotly) được thay nguyên khối.
+    """
+    if isinstance(template, dict) and isinstance(figure, dict) and 'bdata' not in figure:
+        patch = []
+        for key in figure:
+            if key not in template:
+                patch.append((list(path) + [key], figure[key]))
+            else:
+                patch.extend(figure_patch(template[key], figure[key], path + (key,)))
+        for key in template:
+            if key not in figure:
+                patch.append((list(path) + [key],))
+        return patch
+    if (isinstance(template, list) and isinstance(figure, list) and len(template) == len(figure)
+            and all(isinstance(item, dict) for item in figure)):
+        patch = []
+        for i, (old, new) in enumerate(zip(template, figure)):
+            patch.extend(figure_patch(old, new, path + (i,)))
+        return patch
+    return [] if template == figure else [(list(path), figure)]
+
+
+def station_switch_payload(chart_types, stations=STATION_ORDER, template_station='TPHCM', **chart_kwargs):
+    """
+    Dữ liệu gửi một lần cho trình duyệt để đổi trạm không cần gọi server:
+    với mỗi loại biểu đồ, figure của template_station và bản vá (chỉ các giá trị khác:
+    trung bình năm, đường xu hướng, lưới giai đoạn x tháng, tiêu đề, ...) cho từng trạm
+
+    Returns:
+        dict: {'default': trạm mẫu, 'charts': [{'template': figure, 'patches': {trạm: bản vá}}, ...]}
+    """
+    charts = []
+    for chart_type in chart_types:
+        template = update_chart(template_station, chart_type, **chart_kwargs)
+        patches = {}
+        for station_name in stations:
+            figure = template if station_name == template_station \
+                else update_chart(station_name, chart_type, **chart_kwargs)
+            patches[station_name] = figure_patch(template, figure)
+        charts.append({'type': chart_type, 'template': template, 'patches': patches})
+    return {'default': template_station, 'charts': charts}
@@ -2,64 +2,50 @@ import pandas as pd
 import dash_bootstrap_components as dbc
 from dash import html, dcc, Input, Output, callback
 
+from core.data.score_table import get_score_table
+from core.data.station_store import CODE_BY_STATION, STATION_BY_VALUE
+
 
 def load_model_metrics(csv_file_path):
     """
-    Đọc file CSV chứa metrics của các model
+    Đọc file CSV chứa metrics của các model (dùng chung ScoreTable đã parse sẵn)
 
     Args:
         csv_file_path: Đường dẫn đến file CSV
 
     Returns:
-        DataFrame: Dữ liệu metrics
+        ScoreTable: Bảng metrics kèm index (model, station)
     """
     try:
-        df = pd.read_csv(csv_file_path)
-        return df
+        return get_score_table(csv_file_path)
     except Exception as e:
         print(f"Lỗi đọc file CSV: {e}")
         return None
 
 
-def get_metrics_for_model_station(df, model_name, station_name):
+def get_metrics_for_model_station(table, model_name, station_name):
     """
     Lấy metrics cho model và station cụ thể
 
     Args:
-        df: DataFrame chứa dữ liệu
+        table: ScoreTable chứa dữ liệu
         model_name: Tên model
         station_name: Tên station
 
     Returns:
         dict: Metrics cho model và station đó
     """
-    if df is None:
+    if table is None:
         return None
 
-    # Filter data cho model và station cụ thể
-    filtered_df = df[(df['Model'] == model_name) & (df['Station'] == station_name)]
+    # Tra cứu trực tiếp trong index (model, station)
+    metrics = table.lookup(model_name, station_name)
 
-    if filtered_df.empty:
+    if metrics is None:
         print(f"Không tìm thấy dữ liệu cho Model: {model_name}, Station: {station_name}")
         return None
 
-    # Lấy row đầu tiên (giả sử mỗi model-station có 1 row)
-    row = filtered_df.iloc[0]
-
-    return {
-        'mean': {
-            'r2': row.get('R2 mean', 0),
-            'mse': row.get('MSE mean', 0),
-            'rmse': row.get('RMSE mean', 0),
-            'mae': row.get('MAE mean', 0)
-        },
-        'max': {
-            'r2': row.get('R2 max', 0),
-            'mse': row.get('MSE max', 0),
-            'rmse': row.get('RMSE max', 0),
-            'mae': row.get('MAE max', 0)
-        }
-    }
+    return metrics
 
 
 def create_metric_card_item(value, label, color_class, border_class):
@@ -150,10 +136,10 @@ def create_dual_metrics_cards(csv_file_path, model_name, station_name):
         dbc.Row: Container chứa 2 cards
     """
     # Load data từ CSV
-    df = load_model_metrics(csv_file_path)
+    table = load_model_metrics(csv_file_path)
 
     # Lấy metrics cho model và station
-    metrics_data = get_metrics_for_model_station(df, model_name, station_name)
+    metrics_data = get_metrics_for_model_station(table, model_name, station_name)
 
     # Tạo 2 cards
     mean_card = create_metrics_card(metrics_data, "mean")
@@ -182,24 +168,12 @@ def update_metrics_cards_from_csv(csv_file_path, selected_model, selected_statio
             'Enhanced_GCN_BiLSTM': 'Enhanced_GCN_BiLSTM'
         }
 
-        # Mapping tên station nếu cần
-        station_mapping = {
-            "NoiBai": "NOI BAI",
-            "LangSon": "LANG SON",
-            "LaoCai": "LAO CAI",
-            "Vinh": "VINH",
-            "PhuBai": "PHU BAI",
-            "QuyNhon": "QUY NHON",
-            "HCM": "HCM",
-            "CaMau": "CA MAU"
-        }
-
         actual_model = model_mapping.get(selected_model, selected_model)
-        actual_station = station_mapping.get(selected_station, selected_station)
+        actual_station = CODE_BY_STATION.get(STATION_BY_VALUE.get(selected_station), selected_station)
 
         # Load và process data
-        df = load_model_metrics(csv_file_path)
-        metrics_data = get_metrics_for_model_station(df, actual_model, actual_station)
+        table = load_model_metrics(csv_file_path)
+        metrics_data = get_metrics_for_model_station(table, actual_model, actual_station)
 
         # Tạo 2 cards riêng biệt
         mean_card = create_metrics_card(metrics_data, "mean")